@@ -0,0 +1,118 @@
+# This script benchmarks the PDF exporter on a synthetic report.
+# It builds fake research data (detailed Wikipedia extracts, five books and five articles
+# per keyword), renders it, and prints the total time and the cost per page.
+# The defaults produce a report of roughly 1,000 pages.
+#
+# Usage (from the repository root):
+#   python benchmarks/pdf_render.py                 # ~1,000 pages, one process
+#   python benchmarks/pdf_render.py --keywords 20   # a quick run
+#   python benchmarks/pdf_render.py --workers 8     # parallel rendering
+#   python benchmarks/pdf_render.py --json          # print the results as JSON
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processing import pdf_exporter  # noqa: E402
+from processing.models import load_data  # noqa: E402
+
+# A paragraph of filler text with the kind of characters real extracts contain.
+PARAGRAPH = (
+    "The region's economy grew by 4.5% between 1990 & 2000, according to the "
+    "ministry's report <published in 2003>. Lorem ipsum dolor sit amet, consectetur "
+    "adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. "
+    "Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip "
+    "ex ea commodo consequat. Duis aute irure dolor in reprehenderit in voluptate velit "
+    "esse cillum dolore eu fugiat nulla pariatur.\nExcepteur sint occaecat cupidatat non "
+    "proident, sunt in culpa qui officia deserunt mollit anim id est laborum."
+)
+
+# With these sizes, one keyword comes out at about four pages.
+PARAGRAPHS_PER_KEYWORD = 36
+DEFAULT_KEYWORDS = 250
+
+
+# This function builds the synthetic research data, in the JSON shape, and loads it into records.
+def make_data(keywords):
+    data = {}
+    for i in range(keywords):
+        content = "\n\n".join(f"{PARAGRAPH} ({i}.{j})" for j in range(PARAGRAPHS_PER_KEYWORD))
+        data[f"Topic {i}"] = {
+            "wiki": {
+                "is_detailed": True,
+                "data": {
+                    "title": f"Topic {i} & friends",
+                    "content": content,
+                    "url": f"https://en.wikipedia.org/wiki/Topic_{i}",
+                },
+            },
+            "olib": [
+                {
+                    "title": f"A history of topic {i}, volume {j}",
+                    "author": ["Jane Doe", "John Roe"],
+                    "first_publish_year": 1990 + j,
+                    "link": f"https://openlibrary.org/works/OL{i}{j}W",
+                }
+                for j in range(5)
+            ],
+            "news": [
+                {
+                    "title": f"Topic {i} makes headlines <again> ({j})",
+                    "source": "Example News",
+                    "description": "Researchers & officials said the findings were significant.",
+                    "url": f"https://news.example.com/{i}/{j}?a=1&b=2",
+                }
+                for j in range(5)
+            ],
+        }
+    return load_data(data)
+
+
+# This function returns the number of pages of a finished PDF.
+def count_pages(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return len(PdfReader(path).pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF exporter.")
+    parser.add_argument("--keywords", type=int, default=DEFAULT_KEYWORDS)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    data = make_data(args.keywords)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "benchmark.pdf")
+        start = time.perf_counter()
+        pdf_exporter.export_to_pdf(data, path, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        pages = count_pages(path)
+
+    results = {
+        "keywords": args.keywords,
+        "workers": args.workers,
+        "pages": pages,
+        "seconds": round(elapsed, 2),
+        "ms_per_page": round(elapsed * 1000 / pages, 2) if pages else None,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"{results['pages']} pages in {results['seconds']} s "
+            f"({results['ms_per_page']} ms/page, {args.keywords} keywords, {args.workers} worker(s))"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# This script measures how much memory the research data takes as records
+# (processing/models.py) compared to the plain dicts it used to be.
+# It loads the same JSON twice, once as dicts and once as records, and reports what each
+# copy keeps alive. The text itself is the same in both, so the difference is all the
+# per-object overhead the records save.
+#
+# With --detailed, every keyword gets a full-length article, and the records are also
+# loaded a third time with the articles spilled to an article store (as in detailed mode),
+# to show how much of the memory the article text itself was.
+#
+# Usage (from the repository root):
+#   python benchmarks/records_memory.py                  # 2,000 keywords
+#   python benchmarks/records_memory.py --keywords 200 --json
+#   python benchmarks/records_memory.py --detailed
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processing.models import load_data  # noqa: E402
+from processing.article_store import ArticleStore  # noqa: E402
+
+DEFAULT_KEYWORDS = 2000
+
+# A research run keeps five books and up to 20 news articles per keyword.
+BOOKS_PER_KEYWORD = 5
+ARTICLES_PER_KEYWORD = 20
+
+# A full Wikipedia article is tens of kilobytes of text; a summary is a paragraph.
+SUMMARY_REPEAT = 20
+ARTICLE_REPEAT = 600
+
+
+# This function builds the JSON text of a synthetic session.
+def make_json(keywords, detailed=False):
+    repeat = ARTICLE_REPEAT if detailed else SUMMARY_REPEAT
+    data = {}
+    for i in range(keywords):
+        data[f"Topic {i}"] = {
+            "wiki": {
+                "is_detailed": detailed,
+                "data": {
+                    "title": f"Topic {i}",
+                    "content": f"Topic {i} is a subject of some interest. " * repeat,
+                    "url": f"https://en.wikipedia.org/wiki/Topic_{i}",
+                },
+            },
+            "olib": [
+                {
+                    "title": f"A history of topic {i}, volume {j}",
+                    "author": "Jane Doe, John Roe",
+                    "first_publish_year": 1990 + j,
+                    "isbn": f"978{i:06d}{j:04d}",
+                    "link": f"https://openlibrary.org/works/OL{i}{j}W",
+                    "edition_link": f"https://openlibrary.org/books/OL{i}{j}M",
+                    "cover_image": f"https://covers.openlibrary.org/b/id/{i}{j}-L.jpg",
+                }
+                for j in range(BOOKS_PER_KEYWORD)
+            ],
+            "news": [
+                {
+                    "title": f"Topic {i} makes headlines ({j})",
+                    "description": "Researchers said the findings were significant.",
+                    "url": f"https://news.example.com/{i}/{j}",
+                    "source": "Example News",
+                    "publishedAt": "2025-11-28T10:00:00Z",
+                }
+                for j in range(ARTICLES_PER_KEYWORD)
+            ],
+        }
+    return json.dumps(data)
+
+
+# This function returns how many bytes the object built by 'build' keeps alive.
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+# This function loads the records and moves every article into 'store', like the fetch engine does.
+def load_spilled(text, store):
+    data = load_data(json.loads(text))
+    for result in data.values():
+        result.wiki = store.spill(result.wiki)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory of dict and record research data.")
+    parser.add_argument("--keywords", type=int, default=DEFAULT_KEYWORDS)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--detailed", action="store_true", help="use full-length articles and measure the article store")
+    args = parser.parse_args()
+
+    text = make_json(args.keywords, args.detailed)
+    dicts = retained(lambda: json.loads(text))
+    records = retained(lambda: load_data(json.loads(text)))
+
+    results = {
+        "keywords": args.keywords,
+        "items": args.keywords * (1 + BOOKS_PER_KEYWORD + ARTICLES_PER_KEYWORD),
+        "dicts_mb": round(dicts / (1024 * 1024), 2),
+        "records_mb": round(records / (1024 * 1024), 2),
+        "saved": round(1 - records / dicts, 3) if dicts else None,
+    }
+    if args.detailed:
+        with ArticleStore() as store:
+            spilled = retained(lambda: load_spilled(text, store))
+            results["spilled_mb"] = round(spilled / (1024 * 1024), 2)
+            results["store_mb"] = round(store.size / (1024 * 1024), 2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"{results['items']} items: dicts {results['dicts_mb']} MB, "
+            f"records {results['records_mb']} MB ({results['saved']:.0%} less)"
+        )
+        if args.detailed:
+            print(
+                f"with the articles in an article store: {results['spilled_mb']} MB "
+                f"in memory, {results['store_mb']} MB on disk"
+            )
+
+
+if __name__ == "__main__":
+    main()
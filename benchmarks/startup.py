@@ -0,0 +1,88 @@
+# This script is a startup-time regression benchmark for the sourcefolio CLI.
+# It runs 'python -X importtime -c "import main"' a few times in fresh interpreters,
+# reads the cumulative import time of main from the report, and checks it against a budget.
+# It also makes sure none of the heavy dependencies sneak back into the startup path.
+#
+# Usage (from the repository root):
+#   python benchmarks/startup.py            # prints a table, exits 1 if over budget
+#   python benchmarks/startup.py --json     # prints the measurements as JSON
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# These are the budgets in milliseconds. They are deliberately generous for slow CI machines;
+# the point is to catch a heavy import creeping back in, which costs hundreds of ms.
+BUDGET_MS = {
+    "import main": 150,
+    "sourcefolio --help": 600,
+}
+
+# None of these should be imported just to start the CLI.
+LAZY_MODULES = ("reportlab", "wikipedia", "bs4", "InquirerPy", "prompt_toolkit", "httpx")
+
+RUNS = 5
+
+
+# This function runs one interpreter with -X importtime and returns the parsed report
+# as a dict of {module: cumulative microseconds}.
+def import_report(statement):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    report = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            report[name.strip()] = int(cumulative)
+    return report
+
+
+# This function times a full CLI invocation in milliseconds.
+def time_command(args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    import_times = []
+    loaded = set()
+    for _ in range(RUNS):
+        report = import_report("import main")
+        import_times.append(report["main"] / 1000)
+        loaded |= {name.split(".")[0] for name in report}
+    help_times = [time_command(["main.py", "--help"]) for _ in range(RUNS)]
+
+    results = {
+        "import main": round(statistics.median(import_times), 1),
+        "sourcefolio --help": round(statistics.median(help_times), 1),
+    }
+    eager = sorted(m for m in LAZY_MODULES if m in loaded)
+
+    if "--json" in sys.argv:
+        print(json.dumps({"median_ms": results, "budget_ms": BUDGET_MS, "eager_heavy_modules": eager}, indent=2))
+    else:
+        for name, value in results.items():
+            status = "ok" if value <= BUDGET_MS[name] else "OVER BUDGET"
+            print(f"{name:<22} {value:>8.1f} ms  (budget {BUDGET_MS[name]} ms)  {status}")
+        if eager:
+            print(f"Heavy modules imported at startup: {', '.join(eager)}")
+
+    over = [name for name, value in results.items() if value > BUDGET_MS[name]]
+    return 1 if over or eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
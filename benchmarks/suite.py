@@ -0,0 +1,378 @@
+# This script is the benchmark suite for the fetchers, the fetch pipeline and the exporters.
+# Wikipedia, OpenLibrary and NewsAPI are replaced by a local HTTP server that replays the
+# responses in benchmarks/fixtures/, so the numbers measure our own code (HTTP client,
+# parsing, concurrency, layout) rather than the internet, and are comparable between runs.
+#
+# Every case runs at 10, 100 and 1,000 keywords. It's timed once as-is, then run again
+# under tracemalloc for its peak memory. The results are written as JSON, and a previous
+# results file can be passed with --compare to flag regressions.
+#
+# Usage (from the repository root):
+#   python benchmarks/suite.py                                   # everything, writes benchmarks/results/<time>.json
+#   python benchmarks/suite.py --sizes 10,100 --cases get_books,export_to_csv
+#   python benchmarks/suite.py --compare benchmarks/results/old.json --threshold 0.15
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(ROOT))
+
+# The NewsAPI key only has to be present; the stand-in server doesn't check it.
+os.environ.setdefault("SOURCEFOLIO_NEWS_API_KEY", "benchmark")
+
+SIZES = (10, 100, 1000)
+
+# These metrics are compared by --compare. Lower is better for all of them except throughput.
+COMPARED = {"seconds": "lower", "p95_ms": "lower", "peak_mb": "lower", "throughput": "higher"}
+
+
+# This function loads one fixture file.
+def load_fixture(name):
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# This class answers the requests the fetchers make, from the fixtures.
+# Wikipedia titles are echoed back (with MediaWiki's first-letter normalization) so batch
+# lookups and redirects resolve exactly as they would against the real API.
+class FixtureHandler(BaseHTTPRequestHandler):
+    wiki = load_fixture("wikipedia")
+    olib = load_fixture("openlibrary")
+    news = json.dumps(load_fixture("newsapi")).encode()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/w/api.php":
+            body = json.dumps(self.wiki_response(query)).encode()
+        elif url.path == "/search.json":
+            body = json.dumps(self.olib_response(query)).encode()
+        elif url.path == "/v2/everything":
+            body = self.news
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def wiki_response(self, query):
+        titles = query.get("titles", [""])[0].split("|")
+        normalized = []
+        pages = []
+        for title in titles:
+            canonical = title[:1].upper() + title[1:]
+            if canonical != title:
+                normalized.append({"fromencoded": False, "from": title, "to": canonical})
+            page = dict(self.wiki["page"])
+            page.update(
+                {
+                    "pageid": zlib.crc32(canonical.encode()),
+                    "title": canonical,
+                    "fullurl": "https://en.wikipedia.org/wiki/" + canonical.replace(" ", "_"),
+                }
+            )
+            if "links" in query.get("prop", [""])[0]:
+                page["links"] = []
+            else:
+                page["extract"] = self.wiki["intro"] if "exintro" in query else self.wiki["full"]
+            pages.append(page)
+        result = {"batchcomplete": True, "query": {"pages": pages}}
+        if normalized:
+            result["query"]["normalized"] = normalized
+        return result
+
+    # Like the real search API, this honours 'limit' and 'fields'.
+    def olib_response(self, query):
+        docs = self.olib["docs"]
+        if "limit" in query:
+            docs = docs[:int(query["limit"][0])]
+        if "fields" in query:
+            fields = query["fields"][0].split(",")
+            docs = [{k: v for k, v in doc.items() if k in fields} for doc in docs]
+        return {**self.olib, "docs": docs}
+
+    # I'm keeping the server quiet; the benchmark makes thousands of requests.
+    def log_message(self, format, *args):
+        pass
+
+
+# This function starts the stand-in server in a background thread and returns it.
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# This function points every fetcher at the stand-in server and turns the cache off,
+# so every call really goes through the HTTP client.
+def point_fetchers_at(base_url):
+    from fetchers import wikipedia_function, wikipedia_batch, openlibrary_api, news_api
+    from processing.cache import configure
+
+    wikipedia_function.API_URL = f"{base_url}/w/api.php"
+    wikipedia_batch.API_URL = f"{base_url}/w/api.php"
+    openlibrary_api.BASE_URL = f"{base_url}/search.json"
+    news_api.BASE_URL = f"{base_url}/v2/everything"
+    configure(enabled=False)
+
+
+# This function silences the progress bars and success messages while benchmarking.
+def quiet_consoles():
+    from processing import ui, pdf_exporter, csv_exporter
+
+    for module in (ui, pdf_exporter, csv_exporter):
+        console = getattr(module, "console", None)
+        if console is not None:
+            console.quiet = True
+
+
+# This function returns n distinct keywords.
+def make_keywords(n):
+    return [f"mars topic {i}" for i in range(n)]
+
+
+# This function collects research data for n keywords through the real pipeline.
+# The exporters are benchmarked on this data.
+def collect_data(n):
+    import main
+    from processing.fetch_engine import empty_entry
+
+    keywords = make_keywords(n)
+    data = {keyword: empty_entry(False) for keyword in keywords}
+    main.process_keywords(keywords, data)
+    return data
+
+
+# These are the cases. Each one gets the size and returns a function to time, plus
+# the per-call latencies it recorded (empty for cases that are one big call).
+def fetcher_case(fetch):
+    def prepare(n):
+        keywords = make_keywords(n)
+        latencies = []
+        # One untimed call first, so opening the connection isn't counted in the first sample.
+        fetch("warm up")
+
+        def run():
+            latencies.clear()
+            for keyword in keywords:
+                start = time.perf_counter()
+                fetch(keyword)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        return run, latencies
+
+    return prepare
+
+
+def pipeline_case(n):
+    import main
+    from processing.fetch_engine import empty_entry
+
+    keywords = make_keywords(n)
+
+    def run():
+        data = {keyword: empty_entry(False) for keyword in keywords}
+        main.process_keywords(keywords, data)
+
+    return run, []
+
+
+def exporter_case(export):
+    def prepare(n):
+        data = collect_data(n)
+        # Every run overwrites the same report, so nothing piles up in the temp directory.
+        path = os.path.join(tempfile.gettempdir(), "sourcefolio-benchmark-report")
+
+        def run():
+            export(data, path)
+
+        return run, []
+
+    return prepare
+
+
+def _get_wiki_data(keyword):
+    from fetchers.wikipedia_function import get_wiki_data
+
+    return get_wiki_data(keyword)
+
+
+def _get_books(keyword):
+    from fetchers.openlibrary_api import get_books
+
+    return get_books(keyword)
+
+
+def _get_news(keyword):
+    from fetchers.news_api import get_news
+
+    return get_news(keyword)
+
+
+def _export_to_pdf(data, path):
+    from processing.pdf_exporter import export_to_pdf
+
+    export_to_pdf(data, path + ".pdf", workers=1)
+
+
+def _export_to_csv(data, path):
+    from processing.csv_exporter import export_to_csv
+
+    export_to_csv(data, path + ".csv")
+
+
+CASES = {
+    "get_wiki_data": fetcher_case(_get_wiki_data),
+    "get_books": fetcher_case(_get_books),
+    "get_news": fetcher_case(_get_news),
+    "process_keyword": pipeline_case,
+    "export_to_pdf": exporter_case(_export_to_pdf),
+    "export_to_csv": exporter_case(_export_to_csv),
+}
+
+
+# This function runs one case at one size and returns its measurements.
+def measure(name, n):
+    run, latencies = CASES[name](n)
+
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+
+    # The memory run is separate, because tracemalloc itself slows everything down.
+    timed_latencies = list(latencies)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {
+        "keywords": n,
+        "seconds": round(seconds, 4),
+        "throughput": round(n / seconds, 2) if seconds else None,
+        "peak_mb": round(peak / (1024 * 1024), 2),
+    }
+    if timed_latencies:
+        ordered = sorted(timed_latencies)
+        result["p50_ms"] = round(statistics.median(ordered), 3)
+        result["p95_ms"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+        result["max_ms"] = round(ordered[-1], 3)
+    return result
+
+
+# This function describes the code and machine the results came from.
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    try:
+        from importlib.metadata import version
+
+        package_version = version("sourcefolio")
+    except Exception:
+        package_version = None
+    return {
+        "version": package_version,
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+# This function compares two results files and returns the regressions.
+# A regression is a metric that got worse by more than 'threshold' (0.1 = 10%).
+def compare(baseline, current, threshold):
+    rows = []
+    regressions = []
+    for key, now in current["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if not before:
+            continue
+        for metric, better in COMPARED.items():
+            if before.get(metric) in (None, 0) or now.get(metric) is None:
+                continue
+            change = (now[metric] - before[metric]) / before[metric]
+            worse = change > threshold if better == "lower" else change < -threshold
+            rows.append((key, metric, before[metric], now[metric], change, worse))
+            if worse:
+                regressions.append(f"{key} {metric}")
+    for key, metric, before, now, change, worse in rows:
+        flag = "  REGRESSION" if worse else ""
+        print(f"{key:<28} {metric:<11} {before:>12} -> {now:<12} {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetchers, the pipeline and the exporters.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Comma-separated keyword counts.")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated case names.")
+    parser.add_argument("--out", help="Where to write the results (default: benchmarks/results/<time>.json).")
+    parser.add_argument("--compare", help="A previous results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging (0.10 = 10%%).")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    server = start_server()
+    point_fetchers_at(f"http://127.0.0.1:{server.server_address[1]}")
+    quiet_consoles()
+
+    report = {"schema": 1, "environment": environment(), "results": {}}
+    try:
+        for name in cases:
+            for n in sizes:
+                result = measure(name, n)
+                report["results"][f"{name}[{n}]"] = result
+                print(
+                    f"{name:<16} {n:>5} keywords  {result['seconds']:>9.3f} s  "
+                    f"{result['throughput']:>9} /s  peak {result['peak_mb']:>7} MB"
+                )
+    finally:
+        server.shutdown()
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+# This script is the one HTTP client every fetcher goes through.
+# It keeps a pooled, keep-alive requests.Session per process so we stop paying for a fresh
+# TCP and TLS handshake on every call, and it retries rate-limited or failing requests
+# with exponential backoff and jitter before giving up.
+# Requests to the APIs are paced by the per-source rate limiters in rate_limit.py.
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from processing import metrics
+from fetchers import rate_limit
+
+# These are the statuses worth retrying: rate limiting and temporary server errors.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# I'm retrying up to 3 times, waiting roughly 0.5s, 1s, 2s (plus jitter) in between.
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+MAX_BACKOFF = 30
+
+# Each API host gets its own connection pool, sized for the fetch engine's per-source limits.
+POOL_SIZES = {
+    "https://en.wikipedia.org/": 8,
+    "https://openlibrary.org/": 8,
+    "https://newsapi.org/": 4,
+}
+DEFAULT_POOL_SIZE = 10
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "SourceFolio (https://github.com/shakeelsaga/SourceFolio)",
+}
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+
+# This is when the current job has to be done by (a time.monotonic() value), if it has a deadline.
+_deadline = contextvars.ContextVar("sourcefolio_deadline", default=None)
+
+
+# This is the error every fetcher raises when a request finally fails.
+# It keeps the HTTP status (if there was one) so callers can tell a 401 from a dropped connection.
+class FetchError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# This is the error raised when a source's daily allowance is used up.
+# Nothing is sent; the fetch can simply be done again once the allowance resets.
+class QuotaExceeded(FetchError):
+    def __init__(self, source):
+        super().__init__(f"Daily request limit for {source} reached. Try again tomorrow.", 429)
+        self.source = source
+
+
+# These connection classes time how long it takes to open a connection (DNS lookup,
+# TCP and TLS handshakes) and report it to the fetch metrics. Reused keep-alive
+# connections don't connect again, so they add nothing.
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        metrics.note_connect((time.perf_counter() - start) * 1000)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        metrics.note_connect((time.perf_counter() - start) * 1000)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+# This adapter is a regular HTTPAdapter whose pools use the timed connections.
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+# This context manager gives everything fetched inside it 'seconds' in total, retries and
+# backoff included. The fetch engine puts each job in one, so a slow source can't hold a
+# worker for the full timeout of every retry. Pages fetched in copies of the context
+# (like the NewsAPI pages) share the deadline.
+@contextmanager
+def deadline(seconds):
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+# This function returns the seconds left before the deadline (None without one), and
+# raises the timeout error once it's passed.
+def time_left():
+    end = _deadline.get()
+    if end is None:
+        return None
+    left = end - time.monotonic()
+    if left <= 0:
+        raise FetchError("Request timed out (server took too long).")
+    return left
+
+
+# This function waits before a retry, unless the deadline would pass in the meantime.
+def _backoff(delay):
+    left = time_left()
+    if left is not None and delay >= left:
+        raise FetchError("Request timed out (server took too long).")
+    time.sleep(delay)
+
+
+# This function returns the shared session, creating it on first use.
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                # I'm turning off urllib3's own retries since the loop below handles them.
+                default_adapter = TimedHTTPAdapter(
+                    pool_connections=len(POOL_SIZES) + 1, pool_maxsize=DEFAULT_POOL_SIZE, max_retries=0
+                )
+                session.mount("https://", default_adapter)
+                session.mount("http://", default_adapter)
+                for prefix, size in POOL_SIZES.items():
+                    session.mount(prefix, TimedHTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=0))
+                _session = session
+    return _session
+
+
+# This function works out how long to wait before the next attempt.
+# A server-provided Retry-After (in seconds or as an HTTP date) always wins.
+def backoff_delay(attempt, response=None):
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(wait, 0), MAX_BACKOFF)
+                except (TypeError, ValueError):
+                    pass
+    delay = min(BACKOFF_BASE * (2 ** attempt), MAX_BACKOFF)
+    # Full jitter, so parallel workers don't all retry in lockstep.
+    return random.uniform(0, delay)
+
+
+# This function feeds a response back into the source's rate limiter: a 429 slows every
+# request to that source down, anything else lets the rate recover.
+def pace(limiter, response, attempt):
+    if limiter is None:
+        return
+    if response.status_code == 429:
+        limiter.penalize(backoff_delay(attempt, response))
+    elif response.status_code < 500:
+        limiter.reward()
+
+
+# This is the main function. It sends a GET through the shared session and retries
+# connection errors and retryable statuses. The last response is returned as-is, so
+# callers can still look at a final 401 or 429 themselves.
+def get(url, params=None, headers=None, timeout=10, retries=MAX_RETRIES, retry_statuses=RETRY_STATUSES):
+    session = get_session()
+    limiter = rate_limit.limiter_for(url)
+    attempt = 0
+    while True:
+        if limiter is not None and not limiter.acquire():
+            raise QuotaExceeded(limiter.source)
+        # No single attempt may run past the job's deadline.
+        left = time_left()
+        attempt_timeout = timeout if left is None else min(timeout, left)
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=attempt_timeout)
+        except requests.exceptions.RequestException as e:
+            metrics.note_failure(e)
+            if attempt >= retries:
+                raise FetchError(f"Network error: {e}")
+            metrics.note_retry()
+            _backoff(backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        # 'elapsed' runs from sending the request until the headers were parsed.
+        metrics.note_response(
+            response.status_code, len(response.content), response.elapsed.total_seconds() * 1000
+        )
+        pace(limiter, response, attempt)
+        if response.status_code in retry_statuses and attempt < retries:
+            metrics.note_retry()
+            _backoff(backoff_delay(attempt, response))
+            attempt += 1
+            continue
+        return response
+
+
+# This function fetches a URL and returns its JSON body, raising FetchError for any failure.
+def get_json(url, params=None, headers=None, timeout=10, **kwargs):
+    response = get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+    if response.status_code != 200:
+        raise FetchError(f"Request to {url} failed: {response.status_code}", response.status_code)
+    try:
+        return response.json()
+    except ValueError as e:
+        raise FetchError(f"Invalid JSON from {url}: {e}", response.status_code)
+
+
+# httpx is only needed for the async fetch path, so it's an optional dependency
+# (pip install "sourcefolio[async]") and is imported the first time it's used.
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise FetchError("The async fetch path needs httpx. Install it with: pip install \"sourcefolio[async]\"")
+    return httpx
+
+
+# This function returns the async client, creating it on first use.
+# An httpx client belongs to the event loop it was created in, so the async
+# orchestrator closes it with close_async_client() when its loop finishes.
+def get_async_client():
+    global _async_client
+    httpx = _httpx()
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            limits=httpx.Limits(
+                max_connections=sum(POOL_SIZES.values()) + DEFAULT_POOL_SIZE,
+                max_keepalive_connections=DEFAULT_POOL_SIZE,
+            ),
+        )
+    return _async_client
+
+
+# This function closes the async client at the end of an event loop.
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.aclose()
+
+
+# This function returns an httpx trace callback that reports connection set-up time and
+# time to first byte to the fetch metrics, plus a dict the first-byte time ends up in.
+def _async_trace():
+    started = time.perf_counter()
+    timings = {}
+
+    async def trace(event, info):
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            timings["connect"] = now
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            metrics.note_connect((now - timings.pop("connect", now)) * 1000)
+            timings["connect"] = now
+        elif event.endswith("receive_response_headers.complete"):
+            timings["first_byte_ms"] = (now - started) * 1000
+
+    return trace, timings
+
+
+# This is the async version of get(). It uses the same retry and backoff rules,
+# but waits with asyncio.sleep so a cancelled task stops immediately.
+async def get_async(url, params=None, headers=None, timeout=10, retries=MAX_RETRIES, retry_statuses=RETRY_STATUSES):
+    client = get_async_client()
+    limiter = rate_limit.limiter_for(url)
+    attempt = 0
+    while True:
+        if limiter is not None and not await limiter.acquire_async():
+            raise QuotaExceeded(limiter.source)
+        trace, timings = _async_trace()
+        try:
+            response = await client.get(
+                url, params=params, headers=headers, timeout=timeout, extensions={"trace": trace}
+            )
+        except _httpx().HTTPError as e:
+            metrics.note_failure(e)
+            if attempt >= retries:
+                raise FetchError(f"Network error: {e}")
+            metrics.note_retry()
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        metrics.note_response(response.status_code, len(response.content), timings.get("first_byte_ms"))
+        pace(limiter, response, attempt)
+        if response.status_code in retry_statuses and attempt < retries:
+            metrics.note_retry()
+            await asyncio.sleep(backoff_delay(attempt, response))
+            attempt += 1
+            continue
+        return response
+
+
+# This is the async version of get_json().
+async def get_json_async(url, params=None, headers=None, timeout=10, **kwargs):
+    response = await get_async(url, params=params, headers=headers, timeout=timeout, **kwargs)
+    if response.status_code != 200:
+        raise FetchError(f"Request to {url} failed: {response.status_code}", response.status_code)
+    try:
+        return response.json()
+    except ValueError as e:
+        raise FetchError(f"Invalid JSON from {url}: {e}", response.status_code)
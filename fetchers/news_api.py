@@ -1,32 +1,55 @@
 # This script is responsible for fetching news articles from the NewsAPI.
 # It provides functions to validate the API key and fetch news based on a keyword.
 
-import requests
+import asyncio
+import concurrent.futures
+import contextvars
+import math
+from fetchers import http_client, rate_limit
+from fetchers.http_client import FetchError, QuotaExceeded
 from datetime import datetime, timedelta
-from processing.config import get_api_key
+from processing.config import get_api_key, get_setting
+from processing.cache import cached
+from processing.models import NewsArticle
 
 # I'm setting the base URL for the NewsAPI.
 BASE_URL = "https://newsapi.org/v2/everything"
 
+# NewsAPI only answers 429 once the plan's daily allowance is gone, so retrying it is pointless.
+NO_RETRY_ON_429 = http_client.RETRY_STATUSES - {429}
+
+# After the first page, up to this many of the remaining pages are fetched at once.
+MAX_CONCURRENT_PAGES = 4
+
+# The free plan never returns more than the first 100 results of a search; asking for a
+# page beyond that is an error. It can be raised with NEWS_MAX_RESULTS for paid plans.
+DEFAULT_MAX_RESULTS = 100
+
 # This function validates the NewsAPI key.
 # It makes a test request to the API and checks the response status code.
 def validate_api_key(api_key):
     if not api_key:
         return False
-    url = f"{BASE_URL}?q=test&apiKey={api_key}"
+    # A 429 here still means the key is valid, so I'm only retrying server errors.
+    # If the connection fails, the FetchError tells main.py that there is a connection error.
     try:
-        response = requests.get(url, timeout=5)
-        
-        # This checks for any invalid keys
-        if response.status_code == 401:
-            return False
-            
-        # Keys are valid
-        return response.status_code in [200, 429]
-        
-    except requests.exceptions.RequestException as e:
-        # This tells main.py that there is a connection error
-        raise Exception(f"Connection failed: {e}")
+        response = http_client.get(
+            BASE_URL,
+            params={"q": "test"},
+            headers={"X-Api-Key": api_key},
+            timeout=5,
+            retry_statuses=NO_RETRY_ON_429,
+        )
+    except QuotaExceeded:
+        # Today's requests are used up, so I can't check the key; it will be checked next time.
+        return True
+
+    # This checks for any invalid keys
+    if response.status_code == 401:
+        return False
+
+    # Keys are valid
+    return response.status_code in [200, 429]
 
 # This function returns a default date range for the news search.
 # It defaults to the last 7 days.
@@ -35,60 +58,141 @@ def default_date_range(days=7):
     to_date = datetime.now().strftime("%Y-%m-%d")
     return from_date, to_date
 
+# This function builds the query parameters for one page of results.
+# They're passed as 'params', so keywords like "c++" or "AT&T" are encoded properly.
+def page_params(keyword, from_date, to_date, page_size, page):
+    return {
+        "q": keyword,
+        "from": from_date,
+        "to": to_date,
+        "sortBy": "publishedAt",
+        "pageSize": page_size,
+        "page": page,
+        "language": "en",
+    }
+
+# This function sends the API key as a header, so it never shows up in URLs or logs.
+def auth_headers(api_key):
+    return {"X-Api-Key": api_key}
+
+# This function works out how many pages there are to fetch, given page 1's totalResults.
+def page_count(data, page_size, max_pages):
+    total = min(data.get("totalResults") or 0, get_setting("NEWS_MAX_RESULTS", DEFAULT_MAX_RESULTS))
+    return max(1, min(max_pages, math.ceil(total / page_size)))
+
+# This function drops articles whose URL was already seen, keeping the first one.
+# It de-duplicates the pages of one search; across keywords, that's done in dedup.py.
+def unique_articles(articles):
+    seen = set()
+    unique = []
+    for article in articles:
+        url = article.url
+        if url:
+            if url in seen:
+                continue
+            seen.add(url)
+        unique.append(article)
+    return unique
+
+# This function checks a NewsAPI response and returns its parsed body.
+def check_response(response):
+    if response.status_code == 429:
+        # I'm marking today's allowance as used up, so the other news jobs don't even try.
+        rate_limit.limiter("news").exhaust()
+        raise QuotaExceeded("news")
+    if response.status_code != 200:
+        raise FetchError(f"NewsAPI request failed: {response.status_code}", response.status_code)
+
+    # An outage can answer with an HTML page instead of JSON.
+    try:
+        data = response.json()
+    except ValueError as e:
+        raise FetchError(f"Invalid response from NewsAPI: {e}", response.status_code)
+    if data.get("status") != "ok":
+        raise FetchError(f"NewsAPI error: {data.get('message', 'Unknown error')}")
+    return data
+
+# This function extracts the relevant information from each article in a response.
+def parse_articles(data):
+    return [
+        NewsArticle(
+            title=article.get("title") or "No title available",
+            description=article.get("description")
+            or "No description available",
+            url=article.get("url"),
+            source=(article.get("source") or {}).get("name") or "Unknown",
+            published_at=article.get("publishedAt"),
+        )
+        for article in data.get("articles", [])
+    ]
+
 # This is the main function that fetches news articles for a given keyword.
+# Results are cached on disk, but only for a few minutes since news goes stale quickly.
+@cached("news")
 def get_news(keyword, page_size=20, max_pages=1, days=7):
     # I'm getting the API key from the config file.
     API_KEY = get_api_key("NEWS_API_KEY")
     if not API_KEY:
-        raise Exception("NewsAPI key not found. Please configure it first.")
+        raise FetchError("NewsAPI key not found. Please configure it first.")
 
     # I'm setting the date range for the search.
     from_date, to_date = default_date_range(days)
-    articles = []
-
-    # I'm paginating through the results to get more articles if needed.
-    for page in range(1, max_pages + 1):
-        url = (
-            f"{BASE_URL}?q={keyword}"
-            f"&from={from_date}&to={to_date}"
-            f"&sortBy=publishedAt&pageSize={page_size}&page={page}"
-            f"&language=en&apiKey={API_KEY}"
+
+    # The shared client paces the requests, retries server errors with backoff, and
+    # raises FetchError on connection problems. Always add a timeout! (10 seconds)
+    def fetch_page(page):
+        response = http_client.get(
+            BASE_URL,
+            params=page_params(keyword, from_date, to_date, page_size, page),
+            headers=auth_headers(API_KEY),
+            timeout=10,
+            retry_statuses=NO_RETRY_ON_429,
         )
-        try:
-            # Always add a timeout! (10 seconds)
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 429:
-                raise Exception("Rate limit exceeded. Try again later.")
-            if response.status_code != 200:
-                raise Exception(f"NewsAPI request failed: {response.status_code}")
-                
-            data = response.json()
-            if data.get("status") != "ok":
-                raise Exception(f"NewsAPI error: {data.get('message', 'Unknown error')}")
-
-        except requests.exceptions.RequestException as e:
-            # This catches ConnectionError, Timeout, etc.
-            raise Exception(f"Network error: {e}")
-
-        # I'm extracting the relevant information from each article and adding it to the list.
-        for article in data.get("articles", []):
-            articles.append(
-                {
-                    "title": article.get("title") or "No title available",
-                    "description": article.get("description")
-                    or "No description available",
-                    "url": article.get("url"),
-                    "source": article.get("source", {}).get("name") or "Unknown",
-                    "publishedAt": article.get("publishedAt"),
-                }
+        return check_response(response)
+
+    # Page 1 tells me how many results there are; the other pages are then fetched together.
+    first = fetch_page(1)
+    articles = parse_articles(first)
+    pages = range(2, page_count(first, page_size, max_pages) + 1)
+    if pages:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(pages), MAX_CONCURRENT_PAGES)) as executor:
+            # Each page runs in a copy of this thread's context, so the fetch metrics still
+            # count its request towards this keyword's record.
+            futures = [executor.submit(contextvars.copy_context().run, fetch_page, page) for page in pages]
+            # I'm collecting them in page order, so the newest articles still come first.
+            for future in futures:
+                articles.extend(parse_articles(future.result()))
+
+    return unique_articles(articles)
+
+# This is the async version of get_news, used by the async orchestrator.
+@cached("news")
+async def get_news_async(keyword, page_size=20, max_pages=1, days=7):
+    API_KEY = get_api_key("NEWS_API_KEY")
+    if not API_KEY:
+        raise FetchError("NewsAPI key not found. Please configure it first.")
+
+    from_date, to_date = default_date_range(days)
+    limit = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+    async def fetch_page(page):
+        async with limit:
+            response = await http_client.get_async(
+                BASE_URL,
+                params=page_params(keyword, from_date, to_date, page_size, page),
+                headers=auth_headers(API_KEY),
+                timeout=10,
+                retry_statuses=NO_RETRY_ON_429,
             )
+        return check_response(response)
 
-        # I'm breaking the loop if there are no more articles to fetch.
-        if len(data.get("articles", [])) < page_size:
-            break
+    first = await fetch_page(1)
+    articles = parse_articles(first)
+    pages = range(2, page_count(first, page_size, max_pages) + 1)
+    for data in await asyncio.gather(*(fetch_page(page) for page in pages)):
+        articles.extend(parse_articles(data))
 
-    return articles
+    return unique_articles(articles)
 
 
 from rich.console import Console
@@ -114,10 +218,10 @@ if __name__ == "__main__":
         for i, article in enumerate(results, start=1):
             table.add_row(
                 str(i),
-                article["title"],
-                article["source"],
-                article["publishedAt"] or "N/A",
-                article["description"] or "N/A",
+                article.title,
+                article.source,
+                article.published_at or "N/A",
+                article.description or "N/A",
             )
 
         console.print(table)
@@ -1,59 +1,85 @@
 # This script is responsible for fetching book information from the OpenLibrary API.
 # It provides a function to get a list of books based on a keyword.
 
-import requests
+from fetchers import http_client
 from rich.console import Console
 from rich.table import Table
+from processing.cache import cached
+from processing.models import Book
 
 # I'm setting the base URL for the OpenLibrary API.
 BASE_URL = "https://openlibrary.org/search.json"
 
-# This function fetches a list of books for a given keyword.
-def get_books(keyword, limit=5):
-    url = f"{BASE_URL}?q={keyword}"
-    try:
-        # I'm making a GET request to the OpenLibrary API.
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        # I'm handling potential errors from the API.
-        raise Exception(f"OpenLibrary request failed: {e}")
+# This is how many books are kept per keyword. It can be changed with BOOK_LIMIT in the
+# config, or per run with 'sourcefolio run --books N'.
+DEFAULT_LIMIT = 5
 
-    data = response.json()
+# These are the only fields parse_books() reads. Without 'fields', every doc comes back
+# with dozens of fields (editions, languages, publishers, subjects...) we never use.
+FIELDS = "title,author_name,first_publish_year,isbn,key,cover_edition_key,cover_i"
+
+# This function builds the query parameters, so the server only sends 'limit' rows
+# with just the fields we need, instead of a default page of 100 full docs.
+def search_params(keyword, limit):
+    return {"q": keyword, "limit": limit, "fields": FIELDS}
+
+# This function turns an OpenLibrary search response into our list of Book records.
+def parse_books(data, limit=DEFAULT_LIMIT):
     docs = data.get("docs", [])
 
     books = []
     # I'm extracting the relevant information for each book and adding it to the list.
     for doc in docs[:limit]:
         books.append(
-            {
-                "title": doc.get("title"),
-                "author": (
+            Book(
+                title=doc.get("title"),
+                author=(
                     ", ".join(doc.get("author_name", []))
                     if doc.get("author_name")
                     else "Unknown"
                 ),
-                "first_publish_year": doc.get("first_publish_year"),
-                "isbn": doc.get("isbn", ["N/A"])[0],
-                "link": (
+                first_publish_year=doc.get("first_publish_year"),
+                isbn=doc.get("isbn", ["N/A"])[0],
+                link=(
                     f"https://openlibrary.org{doc.get('key')}"
                     if doc.get("key")
                     else None
                 ),
-                "edition_link": (
+                edition_link=(
                     f"https://openlibrary.org/books/{doc.get('cover_edition_key')}"
                     if doc.get("cover_edition_key")
                     else None
                 ),
-                "cover_image": (
+                cover_image=(
                     f"https://covers.openlibrary.org/b/id/{doc.get('cover_i')}-L.jpg"
                     if doc.get("cover_i")
                     else None
                 ),
-            }
+            )
         )
     return books
 
+# This function fetches a list of books for a given keyword.
+# Successful results are cached on disk for a week.
+@cached("olib")
+def get_books(keyword, limit=DEFAULT_LIMIT):
+    try:
+        # I'm making a GET request to the OpenLibrary API through the shared client.
+        data = http_client.get_json(BASE_URL, params=search_params(keyword, limit))
+    except http_client.FetchError as e:
+        # I'm handling potential errors from the API.
+        raise http_client.FetchError(f"OpenLibrary request failed: {e}", e.status)
+    return parse_books(data, limit)
+
+# This is the async version of get_books, used by the async orchestrator.
+@cached("olib")
+async def get_books_async(keyword, limit=DEFAULT_LIMIT):
+    try:
+        data = await http_client.get_json_async(BASE_URL, params=search_params(keyword, limit))
+    except http_client.FetchError as e:
+        raise http_client.FetchError(f"OpenLibrary request failed: {e}", e.status)
+    return parse_books(data, limit)
+
 # This block is for testing the script directly.
 if __name__ == "__main__":
     console = Console()
@@ -68,10 +94,10 @@ if __name__ == "__main__":
         table.add_column("ISBN", style="yellow")
         for b in books:
             table.add_row(
-                b["title"] or "N/A",
-                b["author"] or "Unknown",
-                str(b["first_publish_year"] or "N/A"),
-                b["isbn"] or "N/A",
+                b.title or "N/A",
+                b.author or "Unknown",
+                str(b.first_publish_year or "N/A"),
+                b.isbn or "N/A",
             )
         console.print(table)
     except Exception as e:
@@ -0,0 +1,174 @@
+# This script paces the requests we send to each API, so a parallel research session
+# doesn't run straight into 429s.
+#
+# Every API host gets a token bucket: it refills at 'rate' requests per second and holds
+# at most 'burst' tokens, and every request takes one token (waiting for it if needed).
+# The bucket adapts to what the server tells us: a 429 halves the rate and makes every
+# thread wait out the Retry-After, and each success creeps the rate back up again.
+#
+# Some APIs also have a daily allowance (NewsAPI's free plan gives 100 requests a day).
+# That count is kept in ~/.sourcefolio/quota.json so it survives between runs, and once
+# it's used up, the HTTP client fails requests straight away with QuotaExceeded instead
+# of sending them.
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from processing.config import CONFIG_DIR, ConfigStore, get_setting
+
+QUOTA_FILE = CONFIG_DIR / "quota.json"
+
+# These are the API hosts we pace, and the source each belongs to.
+SOURCE_HOSTS = {
+    "en.wikipedia.org": "wiki",
+    "openlibrary.org": "olib",
+    "newsapi.org": "news",
+}
+
+# These are the default limits. 'rate' is requests per second, 'burst' how many can go out
+# at once after a quiet spell, and 'daily' the number of requests allowed per (UTC) day.
+# They can be changed per source with "RATE_LIMITS" in config.json,
+# e.g. {"news": {"daily": 1000}} for a paid NewsAPI plan.
+DEFAULT_RATE_LIMITS = {
+    "wiki": {"rate": 10, "burst": 10, "daily": None},
+    # OpenLibrary asks identified clients to stay at or below about 3 requests a second.
+    "olib": {"rate": 3, "burst": 6, "daily": None},
+    "news": {"rate": 2, "burst": 4, "daily": 100},
+}
+
+# A 429 never pushes the rate below this fraction of the configured rate, and each
+# success adds this fraction of it back.
+MIN_RATE_FACTOR = 0.1
+RECOVERY_FACTOR = 0.05
+
+
+# This class keeps the per-day request counts on disk.
+# I'm using the config store for it, which already handles caching and atomic writes.
+class DailyQuota:
+    def __init__(self, path=QUOTA_FILE):
+        self.store = ConfigStore(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def today():
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    # This returns how many requests 'source' has made today.
+    def used(self, source):
+        entry = self.store.get(source) or {}
+        return entry.get("used", 0) if entry.get("day") == self.today() else 0
+
+    # This returns how many requests are left today out of 'limit'.
+    def remaining(self, source, limit):
+        return max(limit - self.used(source), 0)
+
+    # This counts one request. It returns False (and counts nothing) if none are left.
+    def take(self, source, limit):
+        with self._lock:
+            used = self.used(source)
+            if used >= limit:
+                return False
+            self.store.update(source, {"day": self.today(), "used": used + 1})
+            return True
+
+    # This marks the allowance as used up, for when the server says so before we counted it.
+    def exhaust(self, source, limit):
+        with self._lock:
+            self.store.update(source, {"day": self.today(), "used": max(limit, self.used(source))})
+
+
+quota = DailyQuota()
+
+
+# This class is the token bucket for one source. Its state is guarded by a plain lock and
+# the waiting happens outside of it, so the same bucket works for threads and coroutines.
+class RateLimiter:
+    def __init__(self, source, rate, burst, daily=None):
+        self.source = source
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.daily = daily
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    # This takes a token and returns how long the caller has to wait before sending,
+    # or None if today's allowance is used up. The token may be borrowed from the future,
+    # which is what queues callers up fairly.
+    def _reserve(self):
+        if self.daily and not quota.take(self.source, self.daily):
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    # This waits for a token in a worker thread. It returns False if the daily allowance is used up.
+    def acquire(self):
+        wait = self._reserve()
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    # This waits for a token in a coroutine. It returns False if the daily allowance is used up.
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    # This is called when the server answered 429: halve the rate and hold everyone back
+    # for 'delay' seconds (the Retry-After, or our own backoff).
+    def penalize(self, delay):
+        with self._lock:
+            self.rate = max(self.rate / 2, self.max_rate * MIN_RATE_FACTOR)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    # This is called after every successful response, to win the rate back gradually.
+    def reward(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_FACTOR)
+
+    # This returns how many requests are left today, or None if there's no daily limit.
+    def remaining_today(self):
+        return quota.remaining(self.source, self.daily) if self.daily else None
+
+    # This marks today's allowance as used up.
+    def exhaust(self):
+        if self.daily:
+            quota.exhaust(self.source, self.daily)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+# This function returns the limiter for a source, creating it from the settings on first use.
+def limiter(source):
+    if source not in _limiters:
+        with _limiters_lock:
+            if source not in _limiters:
+                settings = dict(DEFAULT_RATE_LIMITS.get(source, {"rate": 10, "burst": 10, "daily": None}))
+                settings.update((get_setting("RATE_LIMITS", {}) or {}).get(source) or {})
+                _limiters[source] = RateLimiter(
+                    source, settings["rate"], settings["burst"], settings.get("daily")
+                )
+    return _limiters[source]
+
+
+# This function returns the limiter for a URL, or None if it's not one of the APIs we pace.
+def limiter_for(url):
+    source = SOURCE_HOSTS.get(urlsplit(url).hostname or "")
+    return limiter(source) if source else None
@@ -0,0 +1,166 @@
+# This script resolves a whole list of keywords against Wikipedia in as few requests as possible.
+# The action API accepts up to 50 titles per query, so instead of one or two calls per keyword
+# a 50 keyword run only needs a handful.
+
+from fetchers import http_client
+from fetchers.wikipedia_function import API_URL, clean_keyword, _page_result
+from processing.cache import cache
+
+# This is the most titles the API accepts in one query.
+MAX_TITLES = 50
+
+# Intro extracts are capped at 20 pages per response, so summary chunks are kept at that size.
+MAX_EXTRACTS = 20
+
+# Full-page extracts come back one page per response no matter what, so batching them would
+# only line the pages up one continuation after another. Detailed titles are asked for one at
+# a time instead, and the fetch engine runs those requests in parallel.
+MAX_DETAILED = 1
+
+
+# This function returns how many titles go into one fetch at the given detail level.
+def batch_size(is_detailed):
+    return MAX_DETAILED if is_detailed else MAX_TITLES
+
+
+# This function runs a query and follows every "continue" token until the API is done.
+# Pages from each response are merged by title, and the normalization/redirect steps
+# are collected so every title can be traced back to what we asked for.
+def _query_all(params):
+    pages, normalized, redirects = {}, {}, {}
+    cont = {}
+    while True:
+        payload = http_client.get_json(API_URL, params={**params, **cont})
+        query = payload.get("query", {})
+
+        for item in query.get("normalized", []):
+            normalized[item["from"]] = item["to"]
+        for item in query.get("redirects", []):
+            redirects[item["from"]] = item["to"]
+        for page in query.get("pages", []):
+            merged = pages.setdefault(page["title"], {})
+            for field, value in page.items():
+                if isinstance(value, list):
+                    merged.setdefault(field, []).extend(value)
+                else:
+                    merged[field] = value
+
+        if "continue" not in payload:
+            return pages, normalized, redirects
+        cont = payload["continue"]
+
+
+# This function follows a title through normalization and redirects to its final page title.
+def _resolve(title, normalized, redirects):
+    title = normalized.get(title, title)
+    seen = set()
+    while title in redirects and title not in seen:
+        seen.add(title)
+        title = redirects[title]
+    return title
+
+
+# This function fetches the link lists of several disambiguation pages at once.
+def _disambiguation_options(titles):
+    options = {}
+    titles = list(titles)
+    for start in range(0, len(titles), MAX_TITLES):
+        pages, _, _ = _query_all(
+            {
+                "action": "query",
+                "format": "json",
+                "formatversion": 2,
+                "titles": "|".join(titles[start:start + MAX_TITLES]),
+                "prop": "links",
+                "plnamespace": 0,
+                "pllimit": "max",
+            }
+        )
+        for title, page in pages.items():
+            options[title] = [link["title"] for link in page.get("links", [])]
+    return options
+
+
+# This is the main function. It takes a list of keywords and returns a dict mapping every
+# original keyword to the same thing get_wiki_data would give for it: a WikiEntry, or a
+# PageError (no such page) or DisambiguationError (ambiguous keyword), returned rather than
+# raised so one keyword doesn't throw away the whole batch. A keyword with nothing left to
+# look up once it's cleaned gets None.
+def get_wiki_batch(keywords, is_detailed=False):
+    import wikipedia
+
+    results = {}
+    params = {"is_detailed": is_detailed}
+
+    # I'm serving what I can from the response cache first, and grouping the rest by cleaned title.
+    wanted = {}
+    for keyword in keywords:
+        found, value = cache.get("wiki", keyword, params)
+        if found:
+            results[keyword] = value
+            continue
+        title = clean_keyword(keyword)
+        if not title:
+            results[keyword] = None
+            continue
+        wanted.setdefault(title, []).append(keyword)
+
+    titles = list(wanted)
+    chunk_size = MAX_DETAILED if is_detailed else MAX_EXTRACTS
+    ambiguous = {}
+    try:
+        for start in range(0, len(titles), chunk_size):
+            chunk = titles[start:start + chunk_size]
+            query = {
+                "action": "query",
+                "format": "json",
+                "formatversion": 2,
+                "titles": "|".join(chunk),
+                "redirects": 1,
+                "prop": "extracts|info|pageprops",
+                "inprop": "url",
+                "ppprop": "disambiguation",
+                "explaintext": 1,
+                "exlimit": "max",
+            }
+            if not is_detailed:
+                query["exintro"] = 1
+            pages, normalized, redirects = _query_all(query)
+
+            for title in chunk:
+                page = pages.get(_resolve(title, normalized, redirects))
+                if not page or page.get("missing") or page.get("invalid"):
+                    result = wikipedia.exceptions.PageError(title)
+                elif "disambiguation" in page.get("pageprops", {}):
+                    ambiguous[title] = page["title"]
+                    continue
+                else:
+                    result = _page_result(page)
+                for keyword in wanted[title]:
+                    results[keyword] = result
+                    if not isinstance(result, Exception) and result.content:
+                        cache.set("wiki", keyword, params, result)
+
+        # The ambiguous titles get their options in one extra (batched) lookup.
+        if ambiguous:
+            options = _disambiguation_options(set(ambiguous.values()))
+            for title, page_title in ambiguous.items():
+                for keyword in wanted[title]:
+                    results[keyword] = wikipedia.exceptions.DisambiguationError(
+                        page_title, options.get(page_title, [])
+                    )
+    except http_client.FetchError as e:
+        raise http_client.FetchError(f"Wikipedia connection failed: {e}", e.status)
+
+    return results
+
+
+# This block is for testing the script directly.
+if __name__ == "__main__":
+    for keyword, result in get_wiki_batch(["Python", "Halo (game)", "Mars", "hgacjhgs"]).items():
+        if hasattr(result, "options"):
+            print(f"{keyword}: ambiguous ({len(result.options)} options)")
+        elif result and not isinstance(result, Exception):
+            print(f"{keyword}: {result.title} -> {result.url}")
+        else:
+            print(f"{keyword}: no page")
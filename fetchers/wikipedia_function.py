@@ -2,48 +2,128 @@
 # It provides functions to clean the search keyword and fetch data from Wikipedia.
 
 import re
-import requests
-import wikipedia
+from fetchers import http_client
+from processing.cache import cached
+from processing.models import WikiEntry
 
 # This function cleans the keyword by removing special characters.
 # This helps to avoid errors when searching on Wikipedia.
 def clean_keyword(keyword):
     return re.sub(r'[^a-zA-Z0-9\s\(\)\+\-]', '', keyword).strip()
 
+# I'm talking to the MediaWiki action API directly instead of going through
+# wikipedia.summary() + wikipedia.page(), which needed two round trips and
+# downloaded the whole article just to read its title and URL.
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+# This function builds the query for the title, canonical URL and plain-text extract of a page.
+# In summary mode only the intro section is returned.
+def page_params(term, is_detailed=False):
+    params = {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "titles": term,
+        "redirects": 1,
+        "prop": "extracts|info|pageprops",
+        "inprop": "url",
+        "ppprop": "disambiguation",
+        "explaintext": 1,
+    }
+    if not is_detailed:
+        params["exintro"] = 1
+    return params
+
+# This function builds the query for the articles a disambiguation page links to.
+def links_params(title):
+    return {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "titles": title,
+        "prop": "links",
+        "plnamespace": 0,
+        "pllimit": "max",
+    }
+
+# This function pulls the single page out of a query response.
+def _first_page(payload):
+    pages = payload.get("query", {}).get("pages", [])
+    return pages[0] if pages else None
+
+# This function checks a page and tells whether it's a disambiguation page.
+# I'm raising the same PageError the wikipedia library did, so callers don't change.
+def _is_disambiguation(page, term):
+    import wikipedia
+
+    if not page or page.get("missing") or page.get("invalid"):
+        raise wikipedia.exceptions.PageError(term)
+    return "disambiguation" in page.get("pageprops", {})
+
+# This function turns a page into the record the rest of the app expects.
+def _page_result(page):
+    return WikiEntry(page["title"], page.get("extract", "").strip(), page.get("fullurl"))
+
+# This function fetches a page's title, URL and extract in one request.
+def query_page(term, is_detailed=False):
+    return _first_page(http_client.get_json(API_URL, params=page_params(term, is_detailed)))
+
+# This function lists the articles a disambiguation page links to.
+# It's only called in the (rare) ambiguous case, so the common path stays at one request.
+def disambiguation_options(title):
+    page = _first_page(http_client.get_json(API_URL, params=links_params(title)))
+    return [link["title"] for link in (page or {}).get("links", [])]
+
 # This function fetches data from Wikipedia for a given term.
 # It can fetch either a summary or the full page content.
+# Successful results are cached on disk for a few days.
+@cached("wiki")
 def get_wiki_data(term, is_detailed=False):
+    # I'm importing the wikipedia package (and BeautifulSoup with it) only when fetching,
+    # since all we need from it are the error classes.
+    import wikipedia
+
     term = clean_keyword(term)
     try:
-        # If is_detailed is True, I'm fetching the full page content.
-        if is_detailed:
-            page = wikipedia.page(term, auto_suggest=False)
-            return {
-                "title": page.title,
-                "content": page.content,
-                "url": page.url
-            }
-        # Otherwise, I'm just fetching the summary.
-        else:
-            summary = wikipedia.summary(term, auto_suggest=False)
-            page = wikipedia.page(term, auto_suggest=False)
-            return {
-                "title": page.title,
-                "content": summary,
-                "url": page.url
-            }
-    # Explicitly catch network issues so the UI knows it's a connection failure
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Wikipedia connection failed: {e}")
-
-    # I'm handling potential errors from the Wikipedia library.
-    except wikipedia.exceptions.PageError:
+        page = query_page(term, is_detailed)
+        if _is_disambiguation(page, term):
+            raise wikipedia.exceptions.DisambiguationError(
+                page["title"], disambiguation_options(page["title"])
+            )
+        return _page_result(page)
+
+    # Explicitly pass network issues on so the UI knows it's a connection failure
+    except http_client.FetchError as e:
+        raise http_client.FetchError(f"Wikipedia connection failed: {e}", e.status)
+
+    # A missing page raises PageError and an ambiguous one DisambiguationError, for the
+    # caller to handle. A page without a title is treated as no page.
+    except KeyError:
         return None
-        
-    except wikipedia.exceptions.DisambiguationError as e:
-        raise e
-        
-    except (KeyError, Exception):
+
+# This is the async version of get_wiki_data, used by the async orchestrator.
+# It behaves exactly the same and shares the same cache entries.
+@cached("wiki")
+async def get_wiki_data_async(term, is_detailed=False):
+    import wikipedia
+
+    term = clean_keyword(term)
+    try:
+        payload = await http_client.get_json_async(API_URL, params=page_params(term, is_detailed))
+        page = _first_page(payload)
+        if _is_disambiguation(page, term):
+            links = _first_page(
+                await http_client.get_json_async(API_URL, params=links_params(page["title"]))
+            )
+            raise wikipedia.exceptions.DisambiguationError(
+                page["title"], [link["title"] for link in (links or {}).get("links", [])]
+            )
+        return _page_result(page)
+
+    except http_client.FetchError as e:
+        raise http_client.FetchError(f"Wikipedia connection failed: {e}", e.status)
+
+    except KeyError:
         return None
 
 # This block is for testing the script directly.
@@ -1,15 +1,10 @@
 # This is the main script that orchestrates the entire research process.
 # It brings together all the different modules to fetch, process, and export data.
 
-from fetchers import (
-    wikipedia_function as wiki,
-    openlibrary_api as olib,
-    news_api as news,
-)
-from processing import pdf_exporter as pd, csv_exporter as cd
-from processing import utils
+# The heavy modules (the PDF engine, the fetchers and the prompt library) are imported
+# inside the functions that need them, so '--help' and batch runs start quickly.
+
 import warnings
-import wikipedia as wp
 import sys
 import os 
 from processing.ui import (
@@ -19,22 +14,29 @@ from processing.ui import (
     preview_selection,
     console,
     exit_message,
+    run_exit_hooks,
+    on_exit,
+    install_tracebacks,
+    inquirer,
+    app,
 )
-from InquirerPy import inquirer
+import typer
 from datetime import datetime
 from processing.config import get_api_key, save_api_key
-from fetchers.news_api import validate_api_key
+from processing.cache import cache as response_cache, configure as configure_cache
+from processing.metrics import metrics as fetch_metrics, report as report_metrics
+from processing.profiler import phase
+from processing.models import KeywordResult
 
 # I'm ignoring a specific warning from BeautifulSoup that is not relevant to the user.
-try:
-    from bs4 import GuessedAtParserWarning
-    warnings.filterwarnings("ignore", category=GuessedAtParserWarning)
-except ImportError:
-    pass
+# Matching on the message means bs4 doesn't have to be imported just to silence it.
+warnings.filterwarnings("ignore", message="No parser was explicitly specified")
 
 # This function checks for a NewsAPI key and prompts the user to enter one if it's not found.
 # It includes robust retry loops so the user isn't stuck if their internet connection drops.
 def check_and_prompt_for_api_key():
+    from fetchers.news_api import validate_api_key
+
     existing_key = get_api_key("NEWS_API_KEY")
 
     if existing_key:
@@ -127,264 +129,294 @@ def check_and_prompt_for_api_key():
         if validation_success:
             break
 
-# This function processes a single keyword. It fetches data from Wikipedia, OpenLibrary, and NewsAPI.
-# It relies on the robust 'fetch_with_progress' utility to handle network interruptions.
-def process_keyword(keyword, data):
-    current_keyword = keyword
+# These are the prompts shown when a fetch needs a decision from the user.
+# They are only asked once the parallel fetch phase is over.
+REFINE_PROMPTS = {
+    "ambiguous": "Please refine the keyword or enter an option's number (or leave blank to skip):",
+    "not_found": "Enter a different keyword (or leave blank to skip):",
+    "empty": "Enter a more specific keyword (or leave blank to skip):",
+}
+EMPTY_MESSAGES = {
+    "wiki": "No definitive Wikipedia page found for '{}'.",
+    "olib": "Could not find any book for '{}'.",
+    "news": "Could not find any News article for '{}'.",
+}
+SKIP_MESSAGES = {
+    "wiki": "Skipping fetching Wikipedia for this term.",
+    "olib": "Skipping fetching books for this term.",
+    "news": "Skipping fetching news for this term.",
+}
 
-    # --- Wikipedia ---
-    # I'm fetching data from Wikipedia. If the keyword is ambiguous, I'm asking the user to refine it.
-    while True:
-        try:
-            wiki_data = utils.fetch_with_progress(
-                f"Gathering Wikipedia data for '{current_keyword}'",
-                wiki.get_wiki_data,
-                current_keyword,
-                data[current_keyword]["wiki"]["is_detailed"],
-            )
-            if wiki_data and wiki_data.get("content"):
-                data[current_keyword]["wiki"]["data"] = wiki_data
-                break
+# This function processes a single keyword. It fetches data from Wikipedia, OpenLibrary, and NewsAPI.
+def process_keyword(keyword, data, engine=None):
+    process_keywords([keyword], data, engine)
+
+# This function processes a batch of keywords.
+# All the (keyword, source) fetches run at once through the fetch engine, and any
+# disambiguation or "refine keyword" prompts are handled afterwards.
+# When resuming a session, 'jobs' holds only the fetches that are still missing.
+def process_keywords(keywords, data, engine=None, jobs=None):
+    if engine is None:
+        from processing.fetch_engine import FetchEngine
+
+        engine = FetchEngine()
+    issues = engine.run(data, engine.jobs_for(keywords) if jobs is None else jobs)
+    resolve_issues(issues, data, engine)
+    console.print("\n")
 
-            # If we get here, it means no data was found (but no crash occurred).
-            console.print(
-                f"\n[warn]No definitive Wikipedia page found for '{current_keyword}'.[/warn]"
-            )
-            new_kw = (
-                inquirer.text(
-                    message="Enter a more specific keyword (or leave blank to skip):"
-                )
-                .execute()
-                .strip()
-            )
-            if new_kw:
-                data[new_kw] = data.pop(current_keyword)
-                console.print(
-                    f"[info]Keyword updated:[/info] '{current_keyword}' → '{new_kw}'\n"
+# This function walks through the issues left over from the parallel phase.
+# Refined keywords are fetched again (again in parallel) until nothing is left to ask.
+# The options of ambiguous keywords are ranked and fetched ahead while the user reads
+# them, so picking one of them doesn't have to wait for a fresh fetch.
+def resolve_issues(issues, data, engine):
+    from processing.prefetch import DisambiguationPrefetcher, rank_options
+
+    # I'm remembering renames so later issues for the same keyword follow the new name.
+    renames = {}
+    prefetcher = DisambiguationPrefetcher(engine)
+
+    def current(keyword):
+        while keyword in renames:
+            keyword = renames[keyword]
+        return keyword
+
+    while issues:
+        retry_jobs = []
+        # These are the issues of options answered from the prefetch; they're asked about next round.
+        warm_issues = []
+
+        # I'm starting the prefetch for every ambiguous keyword before the first prompt.
+        for issue in issues:
+            keyword = current(issue["keyword"])
+            if issue["kind"] == "ambiguous" and keyword in data:
+                issue["options"] = rank_options(keyword, issue["options"])
+                prefetcher.start(issue["options"], data[keyword].is_detailed)
+
+        # Connection problems are handled together so the user is asked only once.
+        failed = [i for i in issues if i["kind"] == "error"]
+        if failed:
+            console.print(f"\n[warn]⚠️  {len(failed)} fetch(es) failed: connection lost.[/warn]")
+            action = inquirer.select(
+                message="Connection lost. What would you like to do?",
+                choices=[
+                    {"name": "Retry Connection", "value": "retry"},
+                    {"name": "Skip failed sources", "value": "skip"},
+                    {"name": "Exit Application", "value": "exit"},
+                ],
+                default="retry",
+            ).execute()
+            if action == "retry":
+                console.print("[cyan]Retrying...[/cyan]")
+                retry_jobs.extend(
+                    (current(i["keyword"]), i["source"])
+                    for i in failed
+                    if current(i["keyword"]) in data
                 )
-                current_keyword = new_kw
-                continue
-            else:
-                console.print(
-                    "[secondary]Skipping fetching Wikipedia for this term.[/secondary]\n"
-                )
-                break 
-
-        except wp.DisambiguationError as e:
-            from rich.table import Table
+            elif action == "exit":
+                exit_message()
+                os._exit(0)
 
+        # Fetches held back by a used-up daily allowance are left for a later resume.
+        deferred = [i for i in issues if i["kind"] == "deferred"]
+        if deferred:
             console.print(
-                f"\n[warn]The keyword '{current_keyword}' is ambiguous. Some possible options:[/warn]"
-            )
-            table = Table(title="Possible options")
-            table.add_column("Suggestions", style="cyan")
-            for option in e.options[:8]:
-                table.add_row(option)
-            console.print(table)
-            new_kw = (
-                inquirer.text(
-                    message="Please refine the keyword and re-enter (or leave blank to skip):"
-                )
-                .execute()
-                .strip()
+                f"\n[warn]{len(deferred)} fetch(es) skipped: a daily request limit was reached.[/warn]"
             )
-            if new_kw:
-                data[new_kw] = data.pop(current_keyword)
+            if engine.journal is not None:
                 console.print(
-                    f"[info]Keyword updated:[/info] '{current_keyword}' → '{new_kw}'\n"
+                    f"[secondary]Resume tomorrow to fetch them: sourcefolio --resume {engine.journal.session_id}[/secondary]"
                 )
-                current_keyword = new_kw
-                continue
-            else:
-                console.print(
-                    "[secondary]Skipping fetching Wikipedia for this term.[/secondary]\n"
-                )
-                break
 
-        except wp.PageError:
-            console.print(
-                f"\n[warn]Could not find a Wikipedia page for '{current_keyword}'.[/warn]"
-            )
-            new_kw = (
-                inquirer.text(
-                    message="Enter a different keyword (or leave blank to skip):"
-                )
-                .execute()
-                .strip()
-            )
-            if new_kw:
-                data[new_kw] = data.pop(current_keyword)
-                console.print(
-                    f"[info]Keyword updated:[/info] '{current_keyword}' → '{new_kw}'\n"
-                )
-                current_keyword = new_kw
+        for issue in issues:
+            if issue["kind"] in ("error", "deferred"):
+                continue
+            keyword, source = current(issue["keyword"]), issue["source"]
+            if keyword not in data:
                 continue
-            else:
-                console.print(
-                    "[secondary]Skipping fetching Wikipedia for this term.[/secondary]\n"
-                )
-                break
 
-    # --- OpenLibrary ---
-    # I'm fetching book data from OpenLibrary using the same robust fetcher.
-    while True:
-        books = utils.fetch_with_progress(
-            f"Gathering book data for '{current_keyword}'",
-            olib.get_books,
-            current_keyword,
-        )
-        if books:
-            if current_keyword in data:
-                data[current_keyword]["olib"] = books
-            break
+            if issue["kind"] == "ambiguous":
+                from rich.table import Table
 
-        console.print(
-            f"\n[warn]Could not find any book for '{current_keyword}'.[/warn]"
-        )
-        new_kw = (
-            inquirer.text(message="Enter a different keyword (or leave blank to skip):")
-            .execute()
-            .strip()
-        )
-        if new_kw:
-            if current_keyword in data:
-                data[new_kw] = data.pop(current_keyword)
                 console.print(
-                    f"[info]Keyword updated:[/info] '{current_keyword}' → '{new_kw}'\n"
+                    f"\n[warn]The keyword '{keyword}' is ambiguous. Some possible options:[/warn]"
+                )
+                shown = issue["options"][:8]
+                table = Table(title="Possible options")
+                table.add_column("#", style="secondary", justify="right")
+                table.add_column("Suggestions", style="cyan")
+                for number, option in enumerate(shown, 1):
+                    table.add_row(str(number), option)
+                console.print(table)
+            elif issue["kind"] == "not_found":
+                console.print(
+                    f"\n[warn]Could not find a Wikipedia page for '{keyword}'.[/warn]"
                 )
             else:
-                data[new_kw] = {
-                    "wiki": {"is_detailed": None, "data": {}},
-                    "news": [],
-                    "olib": [],
-                }
-            current_keyword = new_kw
-            continue
-        else:
-            console.print(
-                "[secondary]Skipping fetching books for this term.[/secondary]\n"
-            )
-            break
-
-    # --- News API ---
-    # I'm fetching news data, but only if we successfully configured an API key.
-    if get_api_key("NEWS_API_KEY"):
-        while True:
-            news_data = utils.fetch_with_progress(
-                f"Gathering news data for '{current_keyword}'",
-                news.get_news,
-                current_keyword,
-            )
-            if news_data:
-                if current_keyword in data:
-                    data[current_keyword]["news"] = news_data
-                break
+                console.print(f"\n[warn]{EMPTY_MESSAGES[source].format(keyword)}[/warn]")
 
-            console.print(
-                f"\n[warn]Could not find any News article for '{current_keyword}'.[/warn]"
-            )
             new_kw = (
-                inquirer.text(message="Enter a different keyword (or leave blank to skip):")
+                inquirer.text(message=REFINE_PROMPTS[issue["kind"]])
                 .execute()
                 .strip()
             )
-            if new_kw:
-                if current_keyword in data:
-                    data[new_kw] = data.pop(current_keyword)
-                    console.print(
-                        f"[info]Keyword updated:[/info] '{current_keyword}' → '{new_kw}'\n"
-                    )
-                else:
-                    data[new_kw] = {
-                        "wiki": {"is_detailed": None, "data": {}},
-                        "news": [],
-                        "olib": [],
-                    }
-                current_keyword = new_kw
+            if not new_kw:
+                console.print(f"[secondary]{SKIP_MESSAGES[source]}[/secondary]\n")
                 continue
-            else:
-                console.print(
-                    "[secondary]Skipping fetching news for this term.[/secondary]\n"
-                )
-                break
-
-    console.print("\n")
+            if issue["kind"] == "ambiguous":
+                # An option can be picked by its number, and typing one takes its exact title.
+                if new_kw.isdigit() and 1 <= int(new_kw) <= len(shown):
+                    new_kw = shown[int(new_kw) - 1]
+                else:
+                    new_kw = next((o for o in issue["options"] if o.casefold() == new_kw.casefold()), new_kw)
+
+            # I'm moving everything already fetched for this keyword over to the new one,
+            # and only fetching the source that needed the refinement again.
+            data[new_kw] = data.pop(keyword)
+            console.print(f"[info]Keyword updated:[/info] '{keyword}' → '{new_kw}'\n")
+            if new_kw != keyword:
+                renames[keyword] = new_kw
+                if engine.journal is not None:
+                    engine.journal.rename(keyword, new_kw)
+
+            # If the new keyword is an option that was fetched ahead, its result is used as it is.
+            if source == "wiki":
+                warm, result = prefetcher.get(new_kw, data[new_kw].is_detailed)
+                if warm:
+                    warm_issue = engine.store_result(data, new_kw, source, result)
+                    if warm_issue:
+                        warm_issues.append(warm_issue)
+                    continue
+            retry_jobs.append((new_kw, source))
+
+        issues = warm_issues + engine.run(data, retry_jobs)
+
+    prefetcher.close()
+
+# This function asks for the keywords and the Wikipedia mode of a new research session.
+# It returns the initialized data structure, or None if the user wants to start over.
+def start_session():
+    # I'm prompting the user to enter keywords.
+    list_of_keys = prompt_keywords()
+
+    # If no keywords are entered, I'm asking the user if they want to try again.
+    if not list_of_keys:
+        console.print("\n[warn]⚠️ No keywords entered.[/warn]")
+        if not inquirer.confirm(message="Do you want to try again?", default=True).execute():
+            exit_message()
+            os._exit(0)
+        return None
+
+    # I'm initializing the data structure for the keywords.
+    data = {keyword: KeywordResult() for keyword in list_of_keys}
+
+    # I'm prompting the user to select the Wikipedia data mode (summary or full details).
+    choice = prompt_mode()
+
+    if choice == 1:
+        for keyword in list_of_keys:
+            data[keyword].is_detailed = False
+    elif choice == 2:
+        for keyword in list_of_keys:
+            data[keyword].is_detailed = True
+    else:
+        # If the user chooses manual mode, I'm asking for the detail level for each keyword.
+        console.print("\n[secondary]For each keyword, choose detail level.[/secondary]\n")
+        for keyword in list_of_keys:
+            ans = inquirer.select(
+                message=f"{keyword}:",
+                choices=[
+                    {"name": "Summary", "value": False},
+                    {"name": "Detailed", "value": True},
+                ],
+                default=False,
+            ).execute()
+            data[keyword].is_detailed = ans
+
+    # I'm showing a preview of the selected keywords and their detail level.
+    console.rule("[primary]Preview[/primary]")
+    for key, value in data.items():
+        status = "Detailed" if value.is_detailed else "Summary"
+        console.print(f"[secondary]Keyword:[/secondary] {key} → [primary]{status}[/primary]")
+    console.rule()
+
+    console.print("\n[primary]Starting data collection...[/primary]\n")
+    return data
 
 # This is the main function of the application.
 # It guides the user through the process of entering keywords, selecting options, and exporting the data.
-def main():
+# With 'resume', it picks up a saved session instead of asking for new keywords.
+def main(use_async=False, resume=None, metrics_path=None):
+    from processing.fetch_engine import FetchEngine
+    from processing.async_engine import AsyncFetchEngine
+    from processing.journal import SessionJournal, missing_jobs
+    from processing.article_store import ArticleStore
+    from processing.search_index import active_index
+    from processing.dedup import dedupe
+
+    # Detailed articles are kept in a scratch file per session (see article_store.py).
+    # It's replaced at the start of every session and deleted on the way out.
+    articles = None
+    on_exit(lambda: articles is not None and articles.close())
+
+    install_tracebacks()
     try:
         while True:
             # I'm displaying the splash screen.
             splash()
-
-            # I'm prompting the user to enter keywords.
-            list_of_keys = prompt_keywords()
-
-            # If no keywords are entered, I'm asking the user if they want to try again.
-            if not list_of_keys:
-                console.print("\n[warn]⚠️ No keywords entered.[/warn]")
-                if not inquirer.confirm(message="Do you want to try again?", default=True).execute():
-                    exit_message()
-                    os._exit(0)
-                else:
+            engine = AsyncFetchEngine() if use_async else FetchEngine()
+            if articles is not None:
+                articles.close()
+            articles = engine.articles = ArticleStore()
+
+            if resume:
+                # I'm reloading a saved session and only fetching what it's still missing.
+                journal = SessionJournal(resume)
+                resume = None
+                try:
+                    data, done = journal.load(articles)
+                except FileNotFoundError as e:
+                    console.print(f"[error]{e}[/error]\n")
                     continue
-
-            # I'm initializing the data structure for the keywords.
-            data = {
-                keyword: {"wiki": {"is_detailed": None, "data": {}}, "news": [], "olib": []}
-                for keyword in list_of_keys
-            }
-
-            # I'm prompting the user to select the Wikipedia data mode (summary or full details).
-            choice = prompt_mode()
-
-            if choice == 1:
-                for keyword in list_of_keys:
-                    data[keyword]["wiki"]["is_detailed"] = False
-            elif choice == 2:
-                for keyword in list_of_keys:
-                    data[keyword]["wiki"]["is_detailed"] = True
+                console.print(
+                    f"[info]Resuming session {journal.session_id}: "
+                    f"{len(data)} keywords, {len(done)} fetches already done.[/info]\n"
+                )
+                check_and_prompt_for_api_key()
+                jobs = missing_jobs(engine, data, done)
             else:
-                # If the user chooses manual mode, I'm asking for the detail level for each keyword.
-                console.print("\n[secondary]For each keyword, choose detail level.[/secondary]\n")
-                for keyword in list_of_keys:
-                    ans = inquirer.select(
-                        message=f"{keyword}:",
-                        choices=[
-                            {"name": "Summary", "value": False},
-                            {"name": "Detailed", "value": True},
-                        ],
-                        default=False,
-                    ).execute()
-                    data[keyword]["wiki"]["is_detailed"] = ans
-
-            # I'm showing a preview of the selected keywords and their detail level.
-            console.rule("[primary]Preview[/primary]")
-            for key, value in data.items():
-                status = "Detailed" if value["wiki"]["is_detailed"] else "Summary"
-                console.print(f"[secondary]Keyword:[/secondary] {key} → [primary]{status}[/primary]")
-            console.rule()
-
-            console.print("\n[primary]Starting data collection...[/primary]\n")
+                data = start_session()
+                if data is None:
+                    continue
 
-            # I'm checking for the NewsAPI key.
-            check_and_prompt_for_api_key()
+                # I'm checking for the NewsAPI key.
+                check_and_prompt_for_api_key()
 
-            # I'm processing each keyword to fetch the data.
-            for keyword in list(data.keys()):
-                if keyword in data:
-                    process_keyword(keyword, data)
+                # I'm starting a journal so this session can be resumed if it gets interrupted.
+                journal = SessionJournal()
+                journal.add_keywords(data)
+                console.print(
+                    f"[secondary]Session {journal.session_id} "
+                    f"(resume with: sourcefolio --resume {journal.session_id})[/secondary]\n"
+                )
+                jobs = None
+
+            # I'm fetching every keyword from every source at once.
+            # Each finished keyword is also added to the search index ('sourcefolio search').
+            engine.journal = journal
+            engine.index = active_index()
+            response_cache.reset_stats()
+            fetch_metrics.reset()
+            with phase("fetch"):
+                process_keywords(list(data.keys()), data, engine, jobs)
+            journal.close()
+            console.print(f"[secondary]Cache: {response_cache.summary()}[/secondary]")
+            report_metrics(console, metrics_path)
 
             # I'm checking if any data was collected.
-            has_data = False
-            if data:
-                for k in data:
-                    if (data[k].get("wiki", {}).get("data", {}).get("content")) or \
-                       data[k].get("olib") or \
-                       data[k].get("news"):
-                        has_data = True
-                        break
+            # Books and articles that several keywords found are kept once and referenced from the others.
+            with phase("process"):
+                dedupe(data)
+                has_data = any(entry.has_data() for entry in data.values())
             
             # If no data was collected, I'm asking the user if they want to perform another research.
             if not has_data:
@@ -400,27 +432,35 @@ def main():
                 # If data was collected, I'm showing a preview and prompting for export options.
                 console.print("\n[success]Data collection done![/success]")
                 
-                preview_selection(data)
+                with phase("process"):
+                    preview_selection(data)
                 console.rule("[primary]Export[/primary]")
-                console.print("\n[secondary]Data collection complete. Next step: export (PDF/CSV).[/secondary]\n")
+                console.print("\n[secondary]Data collection complete. Next step: export (PDF/CSV/JSONL).[/secondary]\n")
 
                 export_choice = inquirer.select(
                     message="Choose export format:",
-                    choices=["PDF", "CSV", "Both", "Skip"],
+                    choices=["PDF", "CSV", "JSONL", "Both", "Skip"],
                     default="PDF",
                 ).execute()
 
                 # I'm creating a timestamp for the output files.
                 ts = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-                if export_choice == "PDF":
-                    pd.export_to_pdf(data, f"research_output_{ts}.pdf")
-                elif export_choice == "CSV":
-                    cd.export_to_csv(data, f"research_output_{ts}.csv")
-                elif export_choice == "Both":
-                    pd.export_to_pdf(data, f"research_output_{ts}.pdf")
-                    cd.export_to_csv(data, f"research_output_{ts}.csv")
-                else:
+                # I'm only loading the exporter (and for PDF, ReportLab) that was picked.
+                with phase("export"):
+                    if export_choice in ("PDF", "Both"):
+                        from processing import pdf_exporter as pd
+
+                        pd.export_to_pdf(data, f"research_output_{ts}.pdf")
+                    if export_choice in ("CSV", "Both"):
+                        from processing import csv_exporter as cd
+
+                        cd.export_to_csv(data, f"research_output_{ts}.csv")
+                    if export_choice == "JSONL":
+                        from processing import jsonl_exporter as jd
+
+                        jd.export_to_jsonl(data, f"research_output_{ts}.jsonl")
+                if export_choice == "Skip":
                     console.print("\n[secondary]Export skipped. Thank you for using SourceFolio![/secondary]")
 
             # I'm asking the user if they want to perform another research.
@@ -434,8 +474,35 @@ def main():
     # I'm handling the KeyboardInterrupt exception to exit gracefully.
     except KeyboardInterrupt:
         console.print("\n\n[bold red]Program interrupted by user. Exiting.[/bold red]")
+        run_exit_hooks()
         os._exit(0)  
 
+# This is the command-line entry point.
+# Running 'sourcefolio' without a command starts the interactive session,
+# and 'sourcefolio run ...' starts the non-interactive batch mode.
+@app.callback(invoke_without_command=True)
+def cli(
+    ctx: typer.Context,
+    no_cache: bool = typer.Option(False, "--no-cache", help="Don't read or write the response cache."),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignore cached responses and fetch everything again."),
+    use_async: bool = typer.Option(False, "--async", help="Fetch in a single asyncio event loop (needs httpx)."),
+    resume: str = typer.Option(None, "--resume", help="Resume a saved session and only fetch what is missing."),
+    metrics_path: str = typer.Option(None, "--metrics", help="Write fetch timings to this file (.prom/.txt for OpenMetrics, otherwise JSON)."),
+    profile_path: str = typer.Option(None, "--profile", help="Profile the run and write collapsed stacks (for flame graphs) to this file."),
+):
+    configure_cache(enabled=not no_cache, refresh=refresh)
+    if profile_path:
+        from processing import profiler
+
+        # The profile is written when the app quits, whichever way it quits.
+        profiler.start()
+        on_exit(lambda: profiler.finish(profile_path, console))
+        ctx.call_on_close(run_exit_hooks)
+    # The subcommands (like 'run') read the shared options from here.
+    ctx.obj = {"use_async": use_async, "resume": resume, "metrics_path": metrics_path}
+    if ctx.invoked_subcommand is None:
+        main(use_async, resume, metrics_path)
+
 # This is the entry point of the script.
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app()
\ No newline at end of file
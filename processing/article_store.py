@@ -0,0 +1,149 @@
+# This script keeps full Wikipedia articles on disk instead of in memory.
+# In detailed mode, article text is most of a session's memory, and it just sits in the
+# data until export. So as each article arrives it's appended to a scratch file, and the
+# record only keeps a StoredText: the file, an offset and a length.
+#
+# The exporters read the text back through mmap, a paragraph at a time where they can,
+# so the operating system pages it in and out as needed and peak memory no longer grows
+# with the total size of the articles. A StoredText only holds a path and two numbers,
+# so it can be sent to the PDF worker processes, which map the same file.
+
+import atexit
+import mmap
+import os
+import tempfile
+import threading
+
+# These are the maps opened in this process, by file path. They're reopened when the
+# file has grown past what was mapped.
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+# This function returns a read-only map of the file that covers at least 'end' bytes.
+def _map(path, end):
+    with _maps_lock:
+        mapped = _maps.get(path)
+        if mapped is None or len(mapped) < end:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # I'm not closing the old map: slices of it may still be in use, and it's
+            # released once the last of them is gone.
+            _maps[path] = mapped
+        return mapped
+
+
+# This function forgets the map of a file that's about to be deleted.
+def _unmap(path):
+    with _maps_lock:
+        mapped = _maps.pop(path, None)
+    if mapped is not None:
+        try:
+            mapped.close()
+        except BufferError:
+            pass
+
+
+# This class is a piece of text in an article store. It stands in for the string
+# wherever WikiEntry.content would hold one: str() gives the text back, and it's falsy
+# when empty, so checks like "if wiki.content" keep working.
+class StoredText:
+    __slots__ = ("path", "offset", "length")
+
+    def __init__(self, path, offset, length):
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    # This returns the UTF-8 bytes of the text as a memoryview of the map, without copying.
+    def view(self):
+        end = self.offset + self.length
+        return memoryview(_map(self.path, end))[self.offset:end]
+
+    # This yields the text one paragraph at a time, splitting on 'separator'. Only the
+    # current paragraph is ever decoded into a string.
+    def paragraphs(self, separator="\n\n"):
+        end = self.offset + self.length
+        mapped = _map(self.path, end)
+        sep = separator.encode("utf-8")
+        start = self.offset
+        while start <= end:
+            stop = mapped.find(sep, start, end)
+            if stop == -1:
+                stop = end
+            yield mapped[start:stop].decode("utf-8")
+            start = stop + len(sep)
+
+    def __str__(self):
+        with self.view() as view:
+            return str(view, "utf-8")
+
+    def __bool__(self):
+        return self.length > 0
+
+    def __eq__(self, other):
+        if isinstance(other, StoredText):
+            return (self.path, self.offset, self.length) == (other.path, other.offset, other.length)
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"StoredText({self.path!r}, offset={self.offset}, length={self.length})"
+
+
+# This class is the append-only scratch file the articles go into.
+# It's a temporary file that's deleted by close(), or when the process exits normally;
+# one store belongs to one session.
+class ArticleStore:
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix="sourcefolio-articles-", suffix=".blob", dir=directory)
+        # Unbuffered, so everything appended is in the file before anyone maps it.
+        self._file = os.fdopen(fd, "ab", buffering=0)
+        self._lock = threading.Lock()
+        self.size = 0
+        atexit.register(self.close)
+
+    # This appends a text and returns where it went.
+    def append(self, text):
+        data = memoryview(text.encode("utf-8"))
+        with self._lock:
+            offset = self.size
+            written = 0
+            while written < len(data):
+                written += self._file.write(data[written:])
+            self.size += len(data)
+        return StoredText(self.path, offset, len(data))
+
+    # This returns a copy of a WikiEntry with its content moved into the store.
+    # Anything that isn't a non-empty string is returned as it is.
+    def spill(self, entry):
+        if entry is None or not isinstance(entry.content, str) or not entry.content:
+            return entry
+        return type(entry)(entry.title, self.append(entry.content), entry.url)
+
+    # This deletes the file. Anything still pointing into it can't be read afterwards.
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+        atexit.unregister(self.close)
+        _unmap(self.path)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# This function yields the paragraphs of a content value, whether it's a string or StoredText.
+def paragraphs(content, separator="\n\n"):
+    if isinstance(content, StoredText):
+        return content.paragraphs(separator)
+    return iter(content.split(separator))
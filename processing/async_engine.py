@@ -0,0 +1,109 @@
+# This script is the asyncio version of the fetch engine.
+# A whole research session runs in one event loop on top of the async fetchers, so there
+# are no worker threads to leak, a timed-out request is really cancelled, and a single
+# process can keep hundreds of requests in flight.
+
+import asyncio
+from collections import Counter
+from fetchers import (
+    wikipedia_function as wiki,
+    openlibrary_api as olib,
+    news_api as news,
+    http_client,
+)
+from processing.config import get_setting
+from processing.fetch_engine import FetchEngine
+from processing.metrics import metrics
+from processing.ui import console
+
+# Without threads, in-flight requests are cheap, so the global cap can be much higher.
+# The per-source limits from the fetch engine still apply on top of it.
+DEFAULT_MAX_IN_FLIGHT = 100
+
+
+# This class runs the same (keyword, source) jobs as FetchEngine, with the same
+# limits and the same issue format, but as coroutines instead of threads.
+class AsyncFetchEngine(FetchEngine):
+    def __init__(self, max_workers=None, source_limits=None, timeout=None, book_limit=None):
+        super().__init__(
+            max_workers or get_setting("ASYNC_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+            source_limits,
+            book_limit,
+            timeout,
+        )
+
+    # This runs one job under both semaphores and the per-job timeout.
+    # Any error is returned rather than raised, so one failure never cancels its siblings.
+    async def _run_job(self, keyword, source, is_detailed, limit, source_limits):
+        async with limit, source_limits[source]:
+            if source == "wiki":
+                coro = wiki.get_wiki_data_async(keyword, is_detailed)
+            elif source == "olib":
+                coro = olib.get_books_async(keyword, self.book_limit)
+            else:
+                coro = news.get_news_async(keyword)
+            with metrics.track(source, keyword) as record:
+                try:
+                    result = await asyncio.wait_for(coro, self.timeout)
+                except asyncio.TimeoutError:
+                    result = http_client.FetchError("Request timed out (server took too long).")
+                except Exception as e:
+                    result = e
+                if isinstance(result, http_client.FetchError):
+                    metrics.fail(record, result)
+        # As in the threaded engine, full articles go to the article store straight away.
+        if source == "wiki" and is_detailed and self.articles is not None:
+            result = self._spill(result)
+        return keyword, source, result
+
+    # This is the whole session inside the event loop.
+    async def run_async(self, data, jobs, progress=None, tasks=None, on_keyword_done=None):
+        # The semaphores are created here so they belong to the running loop.
+        limit = asyncio.Semaphore(self.max_workers)
+        source_limits = {
+            source: asyncio.Semaphore(max(1, int(n))) for source, n in self.source_limits.items()
+        }
+        # Each task leaves 'pending' once it's done, so its result isn't kept for the rest of the run.
+        pending = set()
+        for keyword, source in jobs:
+            task = asyncio.ensure_future(
+                self._run_job(
+                    keyword, source, bool(data[keyword].is_detailed), limit, source_limits
+                )
+            )
+            task.add_done_callback(pending.discard)
+            pending.add(task)
+        issues = []
+        remaining = Counter(keyword for keyword, _ in jobs)
+        try:
+            for next_done in asyncio.as_completed(pending):
+                keyword, source, result = await next_done
+                issue = self._store(data, keyword, source, result)
+                if issue:
+                    issues.append(issue)
+                else:
+                    self._record(data, keyword, source)
+                self._job_done(data, keyword, remaining, on_keyword_done)
+                if progress is not None:
+                    progress.advance(tasks[source])
+        finally:
+            # On Ctrl+C (or any other exit) I'm cancelling whatever is still running
+            # and waiting for it to unwind before closing the connection pool.
+            left = list(pending)
+            for task in left:
+                task.cancel()
+            await asyncio.gather(*left, return_exceptions=True)
+            await http_client.close_async_client()
+        return issues
+
+    # This is a drop-in replacement for FetchEngine.run(), so main.py can use either engine.
+    def run(self, data, jobs, on_keyword_done=None):
+        if not jobs:
+            return []
+        with self._progress() as progress:
+            tasks = self._progress_tasks(progress, jobs)
+            issues = asyncio.run(self.run_async(data, jobs, progress, tasks, on_keyword_done))
+
+        ok = len(jobs) - len(issues)
+        console.print(f"[success]Fetched {ok}/{len(jobs)} sources successfully.[/success]")
+        return issues
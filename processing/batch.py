@@ -0,0 +1,196 @@
+# This script runs a research session without any prompts, for scheduled jobs and scripts.
+# Keywords come from a file (or stdin), everything is fetched concurrently through the
+# fetch engine, reports are written to an output directory, and anything that would
+# normally need the user (ambiguous keyword, no results, connection problems) is written
+# to a machine-readable error list instead.
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from processing.fetch_engine import FetchEngine, empty_entry
+from processing.async_engine import AsyncFetchEngine
+from processing.journal import SessionJournal, missing_jobs
+from processing.article_store import ArticleStore
+from processing.cache import cache as response_cache
+from processing.search_index import active_index
+from processing.dedup import Deduplicator, dedupe
+from processing.metrics import metrics, report as report_metrics
+from processing.profiler import phase
+from processing.ui import console
+
+# These are the report formats the batch mode can write.
+# The ones in STREAM_FORMATS can also be written keyword by keyword while fetching.
+EXPORT_FORMATS = ("pdf", "csv", "jsonl")
+STREAM_FORMATS = ("csv", "jsonl")
+MODES = ("summary", "detailed")
+
+
+# This function reads keywords from a file, one per line, or from stdin when the path is "-".
+# Blank lines and lines starting with '#' are skipped, and duplicates are dropped.
+def read_keywords(path):
+    if str(path) == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+
+    keywords = []
+    seen = set()
+    for line in lines:
+        keyword = line.strip()
+        if not keyword or keyword.startswith("#") or keyword in seen:
+            continue
+        seen.add(keyword)
+        keywords.append(keyword)
+    return keywords
+
+
+# This function writes the reports in the requested formats and returns their paths.
+# 'pdf_workers' is the number of processes used to render the PDF (None means the config setting).
+def export_reports(data, formats, out_dir, stem, pdf_workers=None):
+    # I'm importing the exporters here so a batch run only loads what it actually writes.
+    paths = []
+    if "pdf" in formats:
+        from processing import pdf_exporter
+
+        path = out_dir / f"{stem}.pdf"
+        pdf_exporter.export_to_pdf(data, str(path), workers=pdf_workers)
+        paths.append(path)
+    if "csv" in formats:
+        from processing import csv_exporter
+
+        path = out_dir / f"{stem}.csv"
+        csv_exporter.export_to_csv(data, str(path))
+        paths.append(path)
+    if "jsonl" in formats:
+        from processing import jsonl_exporter
+
+        path = out_dir / f"{stem}.jsonl"
+        jsonl_exporter.export_to_jsonl(data, str(path))
+        paths.append(path)
+    return paths
+
+
+# This function opens a stream writer for every streamable format that was asked for.
+def open_stream_writers(formats, out_dir, stem):
+    writers = []
+    if "csv" in formats:
+        from processing.csv_exporter import CSVStreamWriter
+
+        writers.append(CSVStreamWriter(str(out_dir / f"{stem}.csv")))
+    if "jsonl" in formats:
+        from processing.jsonl_exporter import JSONLStreamWriter
+
+        writers.append(JSONLStreamWriter(str(out_dir / f"{stem}.jsonl")))
+    return writers
+
+
+# This function writes the issues from the fetch engine as a JSON error list.
+def write_errors(issues, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(issues, f, indent=2)
+
+
+# This is the main function of the batch mode. It never prompts: every keyword gets one
+# pass through the engine and whatever couldn't be resolved ends up in the error list.
+# With 'stream' on, CSV and JSONL rows are written as each keyword completes, and unless a
+# PDF was also requested the keyword is dropped from memory straight after, so memory
+# stays flat no matter how many keywords there are.
+# Every successful fetch goes into a session journal; with 'resume', the finished work of
+# that session is reloaded and only the missing fetches are made.
+# The cache hits and misses and a summary of the fetch timings are printed at the end, and
+# the timings are written to 'metrics_path' if given.
+# It returns the collected data (what's still in memory), the list of issues and the
+# number of keywords that had any data.
+def run_batch(keywords, mode="summary", formats=EXPORT_FORMATS, out_dir=".", use_async=False, engine=None, stream=False, resume=None, pdf_workers=None, metrics_path=None, book_limit=None):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    is_detailed = mode == "detailed"
+    stem = f"research_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    # Detailed articles go to a scratch file instead of memory; it's deleted when the process exits.
+    articles = ArticleStore()
+    journal = SessionJournal(resume)
+    data, done = journal.load(articles) if resume else ({}, set())
+    new_keywords = {k: empty_entry(is_detailed) for k in keywords if k not in data}
+    data.update(new_keywords)
+    if new_keywords:
+        journal.add_keywords(new_keywords)
+    console.print(f"[secondary]Session {journal.session_id} ({len(done)} fetches already done)[/secondary]")
+
+    engine = engine or (AsyncFetchEngine(book_limit=book_limit) if use_async else FetchEngine(book_limit=book_limit))
+    engine.journal = journal
+    engine.articles = articles
+    engine.index = active_index()
+    jobs = missing_jobs(engine, data, done)
+
+    writers = open_stream_writers(formats, out_dir, stem) if stream else []
+    keep_in_memory = not writers or "pdf" in formats
+    found_count = 0
+    # Streamed keywords are de-duplicated as they finish, in the order they're written.
+    # Only the owner of each book and article is remembered, so memory stays flat.
+    streamed = Deduplicator(keep_records=False)
+
+    def on_keyword_done(keyword, entry):
+        nonlocal found_count
+        if entry.has_data():
+            found_count += 1
+            if writers:
+                streamed.add(keyword, entry)
+            for writer in writers:
+                writer.write_keyword(keyword, entry)
+        if not keep_in_memory:
+            del data[keyword]
+
+    response_cache.reset_stats()
+    metrics.reset()
+    try:
+        # Keywords the journal already has in full are written out straight away.
+        pending = {keyword for keyword, _ in jobs}
+        with phase("fetch"):
+            for keyword in [k for k in data if k not in pending]:
+                on_keyword_done(keyword, data[keyword])
+            issues = engine.run(data, jobs, on_keyword_done)
+    finally:
+        # Closing in 'finally' means even an interrupted run leaves complete, flushed files.
+        for writer in writers:
+            writer.close()
+        journal.close()
+        console.print(f"[secondary]Cache: {response_cache.summary()}[/secondary]")
+        report_metrics(console, metrics_path)
+
+    with phase("process"):
+        errors_path = out_dir / f"{stem}_errors.json"
+        write_errors(issues, errors_path)
+        if issues:
+            console.print(f"[warn]{len(issues)} issue(s) recorded in {errors_path}[/warn]")
+        deferred = sum(issue["kind"] == "deferred" for issue in issues)
+        if deferred:
+            console.print(
+                f"[warn]{deferred} fetch(es) deferred because a daily request limit was reached. "
+                f"Fetch them later with: sourcefolio --resume {journal.session_id} run[/warn]"
+            )
+
+        # I'm leaving out keywords where nothing at all was found, so reports don't fill up with empty sections.
+        found = {keyword: entry for keyword, entry in data.items() if entry.has_data()}
+        # Books and articles that several keywords found are kept once and referenced from the others.
+        dedupe(found)
+        remaining_formats = [f for f in formats if not (writers and f in STREAM_FORMATS)]
+    if found and remaining_formats:
+        with phase("export"):
+            export_reports(found, remaining_formats, out_dir, stem, pdf_workers)
+    if not found_count:
+        console.print("[warn]No data was collected for any of the keywords.[/warn]")
+    return found, issues, found_count
+
+
+# This function exports a saved session straight from its journal, without touching the network.
+def export_session(session_id, formats=EXPORT_FORMATS, out_dir=".", pdf_workers=None):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    data, _ = SessionJournal(session_id).load(ArticleStore())
+    found = dedupe({keyword: entry for keyword, entry in data.items() if entry.has_data()})
+    if found:
+        with phase("export"):
+            export_reports(found, formats, out_dir, f"research_output_{session_id}", pdf_workers)
+    return found
@@ -0,0 +1,213 @@
+# This script is a small persistent cache for the responses of all three fetchers.
+# It lives next to the config file in ~/.sourcefolio/ so re-running a report for the
+# same topic doesn't have to go back to the network.
+
+import functools
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from processing.config import CONFIG_DIR, get_setting
+from processing.metrics import note_cache
+from processing.models import json_default, load_source
+
+CACHE_FILE = CONFIG_DIR / "cache.sqlite3"
+
+# Each source gets its own time-to-live in seconds.
+# Encyclopedia and book data barely change, but news goes stale within minutes.
+DEFAULT_TTLS = {
+    "wiki": 3 * 24 * 60 * 60,
+    "olib": 7 * 24 * 60 * 60,
+    "news": 15 * 60,
+}
+
+# Once the cache grows past this size, the least recently used entries are evicted.
+DEFAULT_MAX_MB = 50
+
+
+# These sources search case-insensitively, so "Mars", " mars " and "MARS" can share one entry.
+# Wikipedia titles are case-sensitive ("MIT" and "Mit" are different pages), so for them
+# only the spacing is normalized.
+CASE_INSENSITIVE_SOURCES = {"olib", "news"}
+
+
+# This function normalizes a keyword for the given source.
+def normalize_keyword(keyword, source=None):
+    keyword = " ".join(str(keyword).split())
+    return keyword.casefold() if source in CASE_INSENSITIVE_SOURCES else keyword
+
+
+# This class wraps a SQLite file that stores one JSON response per key.
+# SQLite is in the standard library and gives us atomic writes for free,
+# and a lock keeps it safe to use from the fetch engine's worker threads.
+class ResponseCache:
+    def __init__(self, path=CACHE_FILE, max_mb=None, ttls=None):
+        self.path = path
+        self.max_bytes = int((max_mb or get_setting("CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or get_setting("CACHE_TTLS", {}) or {})
+        self.enabled = True
+        self.refresh = False
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # I'm opening the database lazily, on the first lookup.
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " source TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+            )
+        return self._conn
+
+    # The key is made of the source, the normalized keyword and the other parameters.
+    @staticmethod
+    def make_key(source, keyword, params=None):
+        return json.dumps(
+            [source, normalize_keyword(keyword, source), params or {}], sort_keys=True, default=str
+        )
+
+    # This looks up a response. It returns (True, value) on a hit and (False, None) on a miss.
+    # Values are stored in their JSON shape and come back as records.
+    def get(self, source, keyword, params=None):
+        if not self.enabled or self.refresh:
+            return False, None
+        key = self.make_key(source, keyword, params)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttls.get(source, 0):
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    self.hits[source] += 1
+                    note_cache(True)
+                    return True, load_source(source, json.loads(row[0]))
+            except (sqlite3.Error, ValueError):
+                # A broken cache should never break a research session.
+                pass
+            self.misses[source] += 1
+            note_cache(False)
+            return False, None
+
+    # This stores a response and evicts old entries if the cache got too big.
+    def set(self, source, keyword, params, value):
+        if not self.enabled:
+            return
+        key = self.make_key(source, keyword, params)
+        payload = json.dumps(value, default=json_default)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, source, payload, len(payload), now, now),
+                )
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    # I'm dropping expired entries first, then the least recently used ones until we fit.
+    def _evict(self, conn, now):
+        for source, ttl in self.ttls.items():
+            conn.execute(
+                "DELETE FROM responses WHERE source = ? AND created_at < ?", (source, now - ttl)
+            )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    # This clears the counters at the start of a new research run.
+    def reset_stats(self):
+        self.hits.clear()
+        self.misses.clear()
+
+    # This returns a one-line summary of the hit/miss counters for each source.
+    def summary(self):
+        parts = []
+        for source in sorted(set(self.hits) | set(self.misses)):
+            parts.append(f"{source}: {self.hits[source]} hits / {self.misses[source]} misses")
+        return ", ".join(parts) or "no lookups"
+
+
+# This is the cache shared by all the fetchers.
+cache = ResponseCache()
+
+
+# This function applies the --no-cache / --refresh switches.
+def configure(enabled=True, refresh=False):
+    cache.enabled = enabled
+    cache.refresh = refresh
+
+
+# This decorator adds caching to a fetcher. The first argument is the keyword and
+# every other argument (including defaults) becomes part of the cache key.
+# Empty results and errors are never stored, so they are always retried.
+# It works for both the regular fetchers and their async variants, which share entries.
+def cached(source):
+    def decorator(fetch_func):
+        signature = inspect.signature(fetch_func)
+
+        def split_args(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            keyword = params.pop(next(iter(signature.parameters)))
+            return keyword, params
+
+        if inspect.iscoroutinefunction(fetch_func):
+            @functools.wraps(fetch_func)
+            async def async_wrapper(*args, **kwargs):
+                keyword, params = split_args(args, kwargs)
+                found, value = cache.get(source, keyword, params)
+                if found:
+                    return value
+                value = await fetch_func(*args, **kwargs)
+                if value:
+                    cache.set(source, keyword, params, value)
+                return value
+
+            return async_wrapper
+
+        @functools.wraps(fetch_func)
+        def wrapper(*args, **kwargs):
+            keyword, params = split_args(args, kwargs)
+            found, value = cache.get(source, keyword, params)
+            if found:
+                return value
+            value = fetch_func(*args, **kwargs)
+            if value:
+                cache.set(source, keyword, params, value)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -1,46 +1,152 @@
 # This script handles the configuration for the application,
 # like storing and retrieving API keys.
 # It creates a .sourcefolio directory in the user's home directory to store the config file.
+# The file is read once and kept in memory; it's only read again when its modification
+# time changes, and it's always rewritten atomically, so the fetch engine's worker threads
+# can ask for settings as often as they like.
 
 from pathlib import Path
 import json
+import os
+import tempfile
+import threading
 
 # I'm defining the directory and file for the configuration.
 # It's good practice to keep configuration files in a hidden directory in the user's home.
 CONFIG_DIR = Path.home() / ".sourcefolio"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
-# I'm creating the directory if it doesn't exist.
-CONFIG_DIR.mkdir(exist_ok=True)
+# Any setting can be overridden with an environment variable made of this prefix and the
+# setting's name, e.g. SOURCEFOLIO_NEWS_API_KEY or SOURCEFOLIO_MAX_WORKERS=24.
+# That way batch workers can be configured without ever touching the config file.
+ENV_PREFIX = "SOURCEFOLIO_"
+
+
+# This class keeps the parsed config file in memory.
+# Reads are served from memory as long as the file's mtime and size haven't changed,
+# and writes go to a temporary file that is renamed over the old one, so a reader can
+# never see a half-written file. One lock guards both.
+class ConfigStore:
+    def __init__(self, path=CONFIG_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data = {}
+        self._stamp = None
+
+    # This returns a (mtime, size) stamp for the file, or None if it doesn't exist.
+    def _file_stamp(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    # This re-reads the file if it changed since the last read. It must be called with the lock held.
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            # If the file is empty or corrupted, I'm treating it as an empty config.
+            except (OSError, json.JSONDecodeError):
+                data = {}
+        self._data = data if isinstance(data, dict) else {}
+        self._stamp = stamp
+
+    # This returns a copy of the whole config, so callers can't change the cached one by accident.
+    def load(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._data)
+
+    # This returns one value from the config file, or the default.
+    def get(self, name, default=None):
+        with self._lock:
+            self._refresh()
+            value = self._data.get(name)
+        return default if value is None else value
+
+    # This replaces the whole config and writes it to disk atomically.
+    def save(self, data):
+        with self._lock:
+            self._write(dict(data))
+
+    # This changes a single value (None removes it) and writes the config back.
+    def update(self, name, value):
+        with self._lock:
+            self._refresh()
+            data = dict(self._data)
+            if value is None:
+                data.pop(name, None)
+            else:
+                data[name] = value
+            self._write(data)
+
+    # I'm writing to a temporary file in the same directory and renaming it over the
+    # config file. The rename is atomic, so the file is always either old or new.
+    def _write(self, data):
+        # I'm creating the directory if it doesn't exist. This happens here rather than at
+        # import time, so just starting the app never touches the disk.
+        self.path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".config-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._data = data
+        self._stamp = self._file_stamp()
+
+
+# This is the config store shared by the whole application.
+store = ConfigStore()
+
+
+# This function returns the environment variable override for a setting, or None.
+def env_override(name):
+    value = os.environ.get(ENV_PREFIX + name)
+    return value if value not in (None, "") else None
+
 
 # This function saves the configuration data to the config file.
 def save_config(data):
-    # I'm opening the config file in write mode and saving the data in JSON format.
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    store.save(data)
 
 # This function loads the configuration data from the config file.
+# If the file doesn't exist or is corrupted, it returns an empty dictionary.
 def load_config():
-    # If the config file doesn't exist, I'm returning an empty dictionary.
-    if not CONFIG_FILE.exists():
-        return {}
-    # I'm opening the config file in read mode and loading the JSON data.
-    with open(CONFIG_FILE, "r") as f:
-        try:
-            return json.load(f)
-        # If the file is empty or corrupted, I'm returning an empty dictionary.
-        except json.JSONDecodeError:
-            return {}
+    return store.load()
 
 # This function retrieves an API key from the configuration.
+# An environment variable (e.g. SOURCEFOLIO_NEWS_API_KEY) wins over the config file.
 def get_api_key(service_name="NEWS_API_KEY"):
-    # I'm loading the configuration and getting the API key for the specified service.
-    config = load_config()
-    return config.get(service_name)
+    return env_override(service_name) or store.get(service_name)
 
 # This function saves an API key to the configuration.
+# Saving None removes the key.
 def save_api_key(key, service_name="NEWS_API_KEY"):
-    # I'm loading the configuration, adding the new API key, and saving the configuration.
-    config = load_config()
-    config[service_name] = key
-    save_config(config)
+    store.update(service_name, key)
+
+# This function retrieves a general setting (like concurrency limits) from the configuration.
+# Environment overrides are parsed as JSON when possible, so SOURCEFOLIO_MAX_WORKERS=24 is a
+# number and SOURCEFOLIO_SOURCE_LIMITS='{"news": 1}' is a dict.
+# If the setting isn't there, I'm returning the given default.
+def get_setting(name, default=None):
+    value = env_override(name)
+    if value is not None:
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return store.get(name, default)
@@ -1,69 +1,100 @@
 # This script is all about exporting the research data into a CSV file.
 # It takes the collected data and organizes it into a structured CSV format.
+# It can also stream rows to the file keyword by keyword, while the fetch is still running.
 
 import csv
+import io
 import processing.utils as util
+from processing.models import WikiEntry
+from processing.stream_writer import StreamWriter
 from rich.console import Console
 
 console = Console()
 
+# This is the header row of the CSV file.
+HEADER = [
+    "Keyword",
+    "Source",
+    "Title/Name",
+    "Author/Publisher",
+    "Description",
+    "Link",
+    "Published At",
+]
+
+# This stands in for a missing Wikipedia page; csv.writer writes its None fields as empty cells.
+EMPTY_WIKI = WikiEntry()
+
+# This is the Description of a book or article another keyword already lists in full.
+REFERENCE_NOTE = "See keyword: {keyword}"
+
+# This function yields all the CSV rows for one keyword.
+# A book or article another keyword already has is only written as its title and link,
+# with a note pointing to that keyword.
+def keyword_rows(keyword, content):
+    # First, I'm writing the Wikipedia data (an empty row if there's no page).
+    wiki = content.wiki or EMPTY_WIKI
+    # A stored article is read back here, one article at a time (csv.writer needs the whole cell).
+    text = str(wiki.content) if wiki.content is not None else None
+    yield [keyword, "Wikipedia", wiki.title, "", text, wiki.url, ""]
+    # Next, I'm writing the book data from OpenLibrary.
+    for i, book in enumerate(content.books):
+        owner = content.duplicate_of("olib", i)
+        if owner is not None:
+            yield [keyword, "Book", book.title, "", REFERENCE_NOTE.format(keyword=owner), book.link, ""]
+            continue
+        yield [
+            keyword,
+            "Book",
+            book.title,
+            util.format_author(book.author),
+            "",
+            book.link,
+            book.first_publish_year,
+        ]
+    # Finally, I'm writing the news data.
+    for i, news in enumerate(content.news):
+        owner = content.duplicate_of("news", i)
+        if owner is not None:
+            yield [keyword, "News", news.title, "", REFERENCE_NOTE.format(keyword=owner), news.url, ""]
+            continue
+        yield [
+            keyword,
+            "News",
+            news.title,
+            news.source,
+            news.description,
+            news.url,
+            news.published_at,
+        ]
+
 # This is the main function that takes the data and exports it to a CSV file.
 def export_to_csv(data, filename="research_output.csv"):
     # I'm opening the CSV file in write mode.
     with open(filename, mode="w", newline="", encoding="utf-8") as file:
         writer = csv.writer(file)
         # I'm writing the header row of the CSV file.
-        writer.writerow(
-            [
-                "Keyword",
-                "Source",
-                "Title/Name",
-                "Author/Publisher",
-                "Description",
-                "Link",
-                "Published At",
-            ]
-        )
+        writer.writerow(HEADER)
         # I'm looping through the data for each keyword.
         for keyword, content in data.items():
-            # First, I'm writing the Wikipedia data.
-            if "wiki" in content:
-                writer.writerow(
-                    [
-                        keyword,
-                        "Wikipedia",
-                        content["wiki"]["data"].get("title", ""),
-                        "",
-                        content["wiki"]["data"].get("content", ""),
-                        content["wiki"]["data"].get("url", ""),
-                        "",
-                    ]
-                )
-            # Next, I'm writing the book data from OpenLibrary.
-            for olib in content.get("olib", []):
-                writer.writerow(
-                    [
-                        keyword,
-                        "Book",
-                        olib.get("title", ""),
-                        util.format_author(olib.get("author", "")),
-                        "",
-                        olib.get("link", ""),
-                        olib.get("first_publish_year", ""),
-                    ]
-                )
-            # Finally, I'm writing the news data.
-            for news in content.get("news", []):
-                writer.writerow(
-                    [
-                        keyword,
-                        "News",
-                        news.get("title", ""),
-                        news.get("source", ""),
-                        news.get("description", ""),
-                        news.get("url", ""),
-                        news.get("publishedAt", ""),
-                    ]
-                )
+            writer.writerows(keyword_rows(keyword, content))
     # I'm printing a success message to the console.
     console.print(f"[green]CSV exported successfully to {filename}[/green]\n")
+
+# This class writes a CSV file incrementally, one keyword's rows at a time.
+class CSVStreamWriter(StreamWriter):
+    label = "CSV"
+    newline = ""
+
+    def header(self):
+        return self._render([HEADER])
+
+    def render(self, keyword, content):
+        return self._render(keyword_rows(keyword, content))
+
+    # I'm using a throwaway csv.writer on a buffer so quoting is identical to export_to_csv.
+    @staticmethod
+    def _render(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
@@ -0,0 +1,271 @@
+# This script is the de-duplication stage that runs after fetching.
+# Overlapping keywords ("Mars", "Mars Rover", "NASA") bring back the same books and news
+# stories over and over. Here every book and article is matched against what the earlier
+# keywords already have, and a duplicate is replaced by the record that's already there:
+# it's stored once, and the later keyword only keeps a reference to it, which the PDF and
+# CSV exporters write as a short "see <keyword>" line instead of the whole entry again.
+#
+# Books are the same when they share an OpenLibrary work or an ISBN. News articles are the
+# same when their URLs are equal once tracking parameters and the like are stripped, or
+# when their titles are near-duplicates (the same wire story under a slightly different
+# headline). Near-duplicate titles are found with MinHash: each title is cut into
+# overlapping character shingles, and its signature keeps the smallest shingle hash in each
+# of SIGNATURE_SIZE bins. The share of equal bins estimates how similar two titles are, and
+# the signatures are split into bands, so only titles that share a band are compared.
+# A similar title alone isn't enough, though: "shares rise" and "shares fall" are one word
+# apart, so two titles also have to have the same numbers in them and may only differ in
+# small words or word endings. And since a near-duplicate is still another outlet's
+# article, it keeps its own record and only gets the reference; only exact matches share one.
+#
+# A streamed batch run writes each keyword out and forgets it, so there the stage only
+# remembers which keyword owns each key (and a small signature per title), never the
+# records themselves, and a duplicate's reference is built from its own record.
+
+import re
+import zlib
+from array import array
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Titles more similar than this (estimated Jaccard similarity of their shingles) can be duplicates.
+TITLE_THRESHOLD = 0.9
+
+# This is the shingle length, in characters.
+SHINGLE_SIZE = 4
+
+# The signature has SIGNATURE_SIZE bins, split into BANDS bands for the candidate lookup.
+SIGNATURE_SIZE = 32
+BANDS = 8
+
+# These query parameters only track where a click came from, so they're dropped from URLs
+# (along with every "utm_..." parameter).
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "cmpid", "ocid", "smid", "ref"}
+
+# These host prefixes point to the same site.
+HOST_PREFIXES = ("www.", "m.", "amp.")
+
+# These words can be added or dropped between two versions of one headline.
+MINOR_WORDS = {"a", "an", "the", "of", "to", "in", "on", "at", "for", "and", "by", "as"}
+
+_EMPTY = 1 << 32
+_WORD = re.compile(r"\w+")
+_POSSESSIVE = re.compile(r"['’]s\b|['’]")
+# A number, in digits or in Roman numerals ("Artemis II", "World War I").
+_NUMBER = re.compile(r"\d+|(?=[mdclxvi]+$)m{0,4}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})")
+
+
+# This function reduces a URL to what identifies the page: no scheme, no "www.", no
+# fragment, no tracking parameters, sorted query parameters and no trailing slash.
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (key.lower().startswith("utm_") or key.lower() in TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/")
+    return f"{host}{path}?{urlencode(query)}" if query else f"{host}{path}"
+
+
+# This function normalizes a headline for comparison: lower case, words only, no "'s", and
+# without the " - Publisher" suffix many outlets add.
+def normalize_title(title, source=None):
+    title = title or ""
+    if source:
+        for separator in (" - ", " | ", " — "):
+            suffix = separator + source
+            if title.lower().endswith(suffix.lower()):
+                title = title[: -len(suffix)]
+                break
+    return " ".join(_WORD.findall(_POSSESSIVE.sub("", title.lower())))
+
+
+# This function returns the numbers in a normalized title, in order.
+def title_numbers(text):
+    return [word for word in text.split() if _NUMBER.fullmatch(word)]
+
+
+# This function tells whether two words are forms of one word ("launch", "launches").
+def _same_word(a, b):
+    short, long = sorted((a, b), key=len)
+    return len(short) >= 3 and long.startswith(short) and len(long) - len(short) <= 2
+
+
+# This function tells whether two normalized titles only differ in small words or word
+# endings, so they can't say different things.
+def compatible_titles(a, b):
+    words_a, words_b = set(a.split()), set(b.split())
+    only_a, only_b = words_a - words_b, words_b - words_a
+    for words, others in ((only_a, only_b), (only_b, only_a)):
+        for word in words:
+            if word not in MINOR_WORDS and not any(_same_word(word, other) for other in others):
+                return False
+    return True
+
+
+# This function returns the MinHash signature of a normalized title.
+def signature(text):
+    text = f" {text} "
+    bins = [_EMPTY] * SIGNATURE_SIZE
+    for i in range(max(len(text) - SHINGLE_SIZE + 1, 1)):
+        h = zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8"))
+        slot = h % SIGNATURE_SIZE
+        if h < bins[slot]:
+            bins[slot] = h
+    return tuple(bins)
+
+
+# This function estimates how similar two titles are from their signatures.
+def similarity(a, b):
+    used = [(x, y) for x, y in zip(a, b) if x != _EMPTY or y != _EMPTY]
+    if not used:
+        return 1.0
+    return sum(x == y for x, y in used) / len(used)
+
+
+# This function returns the keys a book is known by: its OpenLibrary work and its ISBN.
+def book_keys(book):
+    keys = []
+    if book.link:
+        keys.append("work:" + urlsplit(book.link).path.rstrip("/"))
+    if book.isbn and book.isbn != "N/A":
+        keys.append("isbn:" + str(book.isbn).replace("-", ""))
+    return keys
+
+
+# This class finds near-duplicate titles among the ones it's been given.
+class TitleIndex:
+    def __init__(self):
+        self.buckets = {}
+        self.items = []
+
+    # This returns the value stored with the most similar title, if one is similar enough.
+    # Titles with different numbers in them ("part 1", "part 2", "Artemis II", "Artemis III")
+    # or with different words in them ("rise", "fall") are never duplicates.
+    def find(self, text):
+        sig = signature(text)
+        numbers = title_numbers(text)
+        rows = SIGNATURE_SIZE // BANDS
+        best, best_score = None, TITLE_THRESHOLD
+        checked = set()
+        for band in range(BANDS):
+            for index in self.buckets.get((band, sig[band * rows:(band + 1) * rows]), ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                other_sig, other_text, value = self.items[index]
+                if title_numbers(other_text) != numbers:
+                    continue
+                score = similarity(sig, other_sig)
+                if score > best_score and compatible_titles(text, other_text):
+                    best, best_score = value, score
+        return best, sig
+
+    # This adds a title (with the signature find() returned for it). The signature is kept
+    # as a packed array, which is a tenth of the size of a tuple of ints.
+    def add(self, text, sig, value):
+        index = len(self.items)
+        self.items.append((array("Q", sig), text, value))
+        rows = SIGNATURE_SIZE // BANDS
+        for band in range(BANDS):
+            self.buckets.setdefault((band, sig[band * rows:(band + 1) * rows]), []).append(index)
+
+
+# This class is the de-duplication stage. Keywords are added in the order they should
+# appear in; the first keyword to have a book or article owns it, and later keywords get
+# a reference to it (KeywordResult.duplicates). An exact duplicate is replaced by the
+# owner's record, and dropped if it's within one keyword; a near-duplicate keeps its own.
+# With keep_records=False only the owners are remembered, so an exact duplicate from another
+# keyword keeps its own record too, and each keyword must be added only once.
+class Deduplicator:
+    def __init__(self, keep_records=True):
+        self.keep_records = keep_records
+        self._owners = {}
+        self._records = {}
+        self._titles = TitleIndex()
+
+    # This de-duplicates one keyword's books and articles in place.
+    def add(self, keyword, entry):
+        entry.duplicates = {}
+        entry.books = self._dedupe(keyword, entry, "olib", entry.books, self._match_book)
+        entry.news = self._dedupe(keyword, entry, "news", entry.news, self._match_article)
+
+    def _dedupe(self, keyword, entry, source, records, match):
+        kept = []
+        kept_ids = set()
+        for record in records:
+            found = match(keyword, record)
+            if found is not None:
+                original, owner, exact = found
+                if owner == keyword:
+                    # An exact copy within the keyword is dropped. Its own records (when a
+                    # keyword is added twice) and near matches stay as they are.
+                    if exact and original is not record:
+                        continue
+                    found = None
+                elif original is not None:
+                    record = original
+            # Each record is listed (or referenced) once per keyword.
+            if id(record) in kept_ids:
+                continue
+            if found is not None:
+                entry.duplicates[(source, len(kept))] = owner
+            kept_ids.add(id(record))
+            kept.append(record)
+        return kept
+
+    # This returns (record, keyword, True) for a key that's already known. The record is None
+    # when records aren't kept.
+    def _match_key(self, key):
+        if key in self._owners:
+            return self._records.get(key), self._owners[key], True
+        return None
+
+    def _remember(self, key, keyword, record):
+        self._owners[key] = keyword
+        if self.keep_records:
+            self._records[key] = record
+
+    # These return (record, keyword, exact) for a book or article that's already known,
+    # or remember this one and return None. Near-duplicate titles never share a record.
+    def _match_book(self, keyword, book):
+        keys = book_keys(book)
+        for key in keys:
+            found = self._match_key(key)
+            if found is not None:
+                return found
+        for key in keys:
+            self._remember(key, keyword, book)
+        return None
+
+    def _match_article(self, keyword, article):
+        url = "url:" + normalize_url(article.url) if article.url else None
+        if url:
+            found = self._match_key(url)
+            if found is not None:
+                return found
+        title = normalize_title(article.title, article.source)
+        sig = None
+        if title:
+            owner, sig = self._titles.find(title)
+            if owner is not None:
+                return None, owner, False
+        if url:
+            self._remember(url, keyword, article)
+        if title:
+            self._titles.add(title, sig, keyword)
+        return None
+
+
+# This function de-duplicates a whole session's data, in the order of its keywords.
+def dedupe(data):
+    dedup = Deduplicator()
+    for keyword, entry in data.items():
+        dedup.add(keyword, entry)
+    return data
@@ -0,0 +1,265 @@
+# This script runs all the fetchers for a whole batch of keywords at the same time.
+# Every (keyword, source) pair becomes its own job, so a 40 keyword research session
+# no longer has to wait for ~120 round trips one after another.
+
+import threading
+import concurrent.futures
+from collections import Counter
+from rich.progress import (
+    Progress,
+    SpinnerColumn,
+    BarColumn,
+    TextColumn,
+    TimeElapsedColumn,
+)
+from fetchers import (
+    openlibrary_api as olib,
+    news_api as news,
+)
+from fetchers import http_client
+from fetchers.http_client import QuotaExceeded
+from fetchers.wikipedia_batch import get_wiki_batch, batch_size
+from processing.config import get_api_key, get_setting
+from processing.metrics import metrics
+from processing.models import KeywordResult, WikiEntry
+from processing.ui import console
+
+# These are the three sources in the order they show up in the reports.
+SOURCES = ("wiki", "olib", "news")
+
+# I'm using friendly names for the progress bar and the messages.
+SOURCE_NAMES = {"wiki": "Wikipedia", "olib": "OpenLibrary", "news": "NewsAPI"}
+
+# I'm keeping the defaults modest so we don't hammer any of the APIs.
+# They can be overridden with "MAX_WORKERS" and "SOURCE_LIMITS" in config.json.
+DEFAULT_MAX_WORKERS = 12
+DEFAULT_SOURCE_LIMITS = {"wiki": 6, "olib": 4, "news": 2}
+
+# Every job gets this many seconds (retries included) before it's given up on.
+# It can be overridden with "FETCH_TIMEOUT" in config.json, and applies to both engines.
+DEFAULT_TIMEOUT = 30
+
+
+# This function returns a fresh, empty entry for a keyword.
+def empty_entry(is_detailed=None):
+    return KeywordResult(is_detailed)
+
+
+# This class runs the (keyword, source) jobs in a thread pool.
+# A global limit caps the total number of requests in flight and a per-source
+# semaphore makes sure no single API gets more than its share.
+class FetchEngine:
+    def __init__(self, max_workers=None, source_limits=None, book_limit=None, timeout=None):
+        self.max_workers = max_workers or get_setting("MAX_WORKERS", DEFAULT_MAX_WORKERS)
+        self.book_limit = int(book_limit or get_setting("BOOK_LIMIT", olib.DEFAULT_LIMIT))
+        self.timeout = timeout or get_setting("FETCH_TIMEOUT", DEFAULT_TIMEOUT)
+        limits = dict(DEFAULT_SOURCE_LIMITS)
+        limits.update(source_limits or get_setting("SOURCE_LIMITS", {}) or {})
+        self.source_limits = limits
+        self._semaphores = {
+            source: threading.BoundedSemaphore(max(1, int(limit)))
+            for source, limit in limits.items()
+        }
+        # If a session journal is attached, every successful fetch is recorded in it.
+        self.journal = None
+        # If an article store is attached, detailed Wikipedia articles are moved into it
+        # as they arrive, so their text doesn't have to stay in memory.
+        self.articles = None
+        # If a search index is attached, each keyword's results are added to it once the keyword is done.
+        self.index = None
+
+    # This builds the job list for a set of keywords.
+    # News is only included when a NewsAPI key is configured.
+    def jobs_for(self, keywords, sources=SOURCES):
+        has_news_key = bool(get_api_key("NEWS_API_KEY"))
+        return [
+            (keyword, source)
+            for keyword in keywords
+            for source in sources
+            if source != "news" or has_news_key
+        ]
+
+    # This calls the right fetcher for a job while holding that source's semaphore.
+    # The timing and the job's deadline start once the semaphore is held, so they don't
+    # include queueing.
+    def _fetch(self, keyword, source):
+        with self._semaphores[source], metrics.track(source, keyword), http_client.deadline(self.timeout):
+            if source == "olib":
+                return olib.get_books(keyword, self.book_limit)
+            return news.get_news(keyword)
+
+    # Wikipedia jobs are resolved in batches of up to 50 titles per request.
+    # Full articles are moved to the article store right here in the worker, so the
+    # finished future (which may wait a while to be handled) never holds their text.
+    def _fetch_wiki_batch(self, keywords, is_detailed):
+        with self._semaphores["wiki"], metrics.track("wiki", keywords), http_client.deadline(self.timeout):
+            results = get_wiki_batch(keywords, is_detailed)
+        if self.articles is not None and is_detailed:
+            results = {keyword: self._spill(result) for keyword, result in results.items()}
+        return results
+
+    # This moves a detailed article's text to the article store. Anything that isn't a
+    # page (None, or an error) is returned as it is.
+    def _spill(self, result):
+        if isinstance(result, WikiEntry):
+            return self.articles.spill(result)
+        return result
+
+    # This fetches Wikipedia pages outside of run(), for the disambiguation prefetch.
+    # It returns {title: result}; if the request fails, the error is every title's result.
+    def fetch_wiki(self, titles, is_detailed):
+        try:
+            return self._fetch_wiki_batch(titles, is_detailed)
+        except Exception as e:
+            return {title: e for title in titles}
+
+    # This stores a result that was fetched outside of run() the way run() stores its own:
+    # into 'data', the journal and the search index. It returns the issue, if there is one.
+    def store_result(self, data, keyword, source, result):
+        issue = self._store(data, keyword, source, result)
+        if issue is None:
+            self._record(data, keyword, source)
+            if self.index is not None:
+                self.index.add(keyword, data[keyword])
+        return issue
+
+    # This submits every job to the executor. Wikipedia keywords are grouped by
+    # detail level and chunked (summaries 50 at a time, full articles one at a time),
+    # everything else gets one future per job.
+    def _submit(self, executor, data, jobs):
+        futures = {}
+        wiki_groups = {}
+        for keyword, source in jobs:
+            if source == "wiki":
+                is_detailed = bool(data[keyword].is_detailed)
+                wiki_groups.setdefault(is_detailed, []).append(keyword)
+            else:
+                futures[executor.submit(self._fetch, keyword, source)] = (source, [keyword])
+        for is_detailed, keywords in wiki_groups.items():
+            size = batch_size(is_detailed)
+            for start in range(0, len(keywords), size):
+                chunk = keywords[start:start + size]
+                future = executor.submit(self._fetch_wiki_batch, chunk, is_detailed)
+                futures[future] = ("wiki", chunk)
+        return futures
+
+    # This creates the progress display shown while the jobs run.
+    def _progress(self):
+        return Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed}/{task.total}"),
+            TimeElapsedColumn(),
+            console=console,
+            transient=True,
+        )
+
+    # This adds one progress bar per source that has jobs.
+    def _progress_tasks(self, progress, jobs):
+        tasks = {}
+        for source in SOURCES:
+            total = sum(1 for _, s in jobs if s == source)
+            if total:
+                tasks[source] = progress.add_task(
+                    f"Gathering {SOURCE_NAMES[source]} data", total=total
+                )
+        return tasks
+
+    # This runs every job concurrently and writes the results into 'data'.
+    # Nothing here ever prompts the user: anything that needs a decision
+    # (ambiguous keyword, no results, connection problem) is returned as an issue
+    # so the caller can handle it after the parallel phase.
+    # If 'on_keyword_done' is given, it's called with (keyword, entry) as soon as
+    # all of that keyword's jobs have finished, which is what streaming export hooks into.
+    def run(self, data, jobs, on_keyword_done=None):
+        issues = []
+        if not jobs:
+            return issues
+        remaining = Counter(keyword for keyword, _ in jobs)
+
+        with self._progress() as progress:
+            tasks = self._progress_tasks(progress, jobs)
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = self._submit(executor, data, jobs)
+                try:
+                    # Results are only ever written from this thread, so 'data' needs no lock.
+                    for future in concurrent.futures.as_completed(futures):
+                        # Each future is dropped once it's handled, so its result isn't kept
+                        # for the rest of the run.
+                        source, keywords = futures.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = e
+                        for keyword in keywords:
+                            # A Wikipedia batch returns one result per keyword.
+                            value = result
+                            if source == "wiki" and isinstance(result, dict):
+                                value = result.get(keyword)
+                            issue = self._store(data, keyword, source, value)
+                            if issue:
+                                issues.append(issue)
+                            else:
+                                self._record(data, keyword, source)
+                            self._job_done(data, keyword, remaining, on_keyword_done)
+                            progress.advance(tasks[source])
+                except KeyboardInterrupt:
+                    # I'm dropping the queued jobs so Ctrl+C doesn't wait for the whole batch.
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        ok = len(jobs) - len(issues)
+        console.print(f"[success]Fetched {ok}/{len(jobs)} sources successfully.[/success]")
+        return issues
+
+    # This writes a successful fetch to the session journal, if there is one.
+    def _record(self, data, keyword, source):
+        if self.journal is not None:
+            self.journal.record(keyword, source, data[keyword].get(source))
+
+    # This counts down a keyword's outstanding jobs and reports it once they're all in.
+    def _job_done(self, data, keyword, remaining, on_keyword_done):
+        remaining[keyword] -= 1
+        if remaining[keyword] == 0:
+            if self.index is not None:
+                self.index.add(keyword, data[keyword])
+            if on_keyword_done:
+                on_keyword_done(keyword, data[keyword])
+
+    # This stores a finished job in 'data', or turns it into an issue.
+    # Errors come in as exception objects so batch and single results are handled alike.
+    def _store(self, data, keyword, source, result):
+        # The wikipedia package is only needed for its error classes, so it's loaded on first use.
+        import wikipedia as wp
+
+        issue = {"keyword": keyword, "source": source, "kind": None, "options": [], "error": None}
+        if isinstance(result, wp.DisambiguationError):
+            issue.update(kind="ambiguous", options=list(result.options))
+            return issue
+        if isinstance(result, wp.PageError):
+            issue["kind"] = "not_found"
+            return issue
+        # A used-up daily allowance isn't a failure: the job is left for a later resume.
+        if isinstance(result, QuotaExceeded):
+            issue.update(kind="deferred", error=str(result))
+            return issue
+        if isinstance(result, Exception):
+            issue.update(kind="error", error=str(result))
+            return issue
+
+        if source == "wiki":
+            if result and result.content:
+                # The engines spill in their workers; this catches results stored any other way.
+                if self.articles is not None and data[keyword].is_detailed:
+                    result = self.articles.spill(result)
+                data[keyword].wiki = result
+                return None
+        elif result:
+            data[keyword].set(source, result)
+            return None
+
+        issue["kind"] = "empty"
+        return issue
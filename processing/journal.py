@@ -0,0 +1,110 @@
+# This script keeps a journal of every research session in ~/.sourcefolio/sessions/.
+# Each finished (keyword, source) result is appended to the session's file and synced to
+# disk straight away, so if a run dies (network drop, Ctrl+C, "Exit Application") the
+# next run can resume it and only fetch what is missing. A journal can also be exported
+# on its own, without touching the network.
+
+import json
+import os
+import threading
+from datetime import datetime
+from processing.config import CONFIG_DIR
+from processing.fetch_engine import empty_entry
+from processing.models import json_default, load_source
+
+SESSIONS_DIR = CONFIG_DIR / "sessions"
+
+
+# This function returns the path of a session's journal file.
+def session_path(session_id):
+    return SESSIONS_DIR / f"{session_id}.jsonl"
+
+
+# This function lists the saved sessions, newest first.
+def list_sessions():
+    if not SESSIONS_DIR.exists():
+        return []
+    return sorted((p.stem for p in SESSIONS_DIR.glob("*.jsonl")), reverse=True)
+
+
+# This class is an append-only journal for one session. The file is JSON Lines with
+# three kinds of records: "keywords" (the keywords and their detail level), "result"
+# (one finished fetch) and "rename" (a keyword the user refined).
+class SessionJournal:
+    def __init__(self, session_id=None):
+        self.session_id = session_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = session_path(self.session_id)
+        self._lock = threading.Lock()
+        self._file = None
+
+    # This appends one record and syncs it to disk.
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record, ensure_ascii=False, default=json_default) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    # This records the keywords of the session and whether each one is detailed.
+    def add_keywords(self, data):
+        self._append(
+            {
+                "type": "keywords",
+                "entries": {keyword: entry.is_detailed for keyword, entry in data.items()},
+            }
+        )
+
+    # This records one finished fetch.
+    def record(self, keyword, source, value):
+        self._append({"type": "result", "keyword": keyword, "source": source, "value": value})
+
+    # This records a keyword the user refined, so replaying moves its results over.
+    def rename(self, old, new):
+        self._append({"type": "rename", "from": old, "to": new})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # This replays the journal into a fresh 'data' dict. It returns the data and the set
+    # of (keyword, source) pairs that are already done. A half-written last line (from a
+    # crash mid-write) is simply skipped. With an article store, detailed Wikipedia
+    # articles are moved into it line by line, so a big session never sits in memory whole.
+    def load(self, articles=None):
+        data = {}
+        done = set()
+        if not self.path.exists():
+            raise FileNotFoundError(f"No saved session called '{self.session_id}'.")
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                kind = record.get("type")
+                if kind == "keywords":
+                    for keyword, is_detailed in record["entries"].items():
+                        data.setdefault(keyword, empty_entry(is_detailed))
+                elif kind == "result":
+                    keyword, source = record["keyword"], record["source"]
+                    entry = data.setdefault(keyword, empty_entry())
+                    value = load_source(source, record["value"])
+                    if source == "wiki" and articles is not None and entry.is_detailed:
+                        value = articles.spill(value)
+                    entry.set(source, value)
+                    done.add((keyword, source))
+                elif kind == "rename" and record["from"] in data:
+                    data[record["to"]] = data.pop(record["from"])
+                    done = {
+                        (record["to"] if k == record["from"] else k, s) for k, s in done
+                    }
+        return data, done
+
+
+# This function lists the jobs that still need fetching when resuming a session.
+def missing_jobs(engine, data, done):
+    return [job for job in engine.jobs_for(list(data)) if job not in done]
@@ -0,0 +1,29 @@
+# This script exports the research data as JSON Lines: one JSON object per keyword per line.
+# Every line is a complete record, which makes the format easy to stream, append to and
+# load back with any JSON tool, even if a run stopped halfway.
+
+import json
+from rich.console import Console
+from processing.models import json_default
+from processing.stream_writer import StreamWriter
+
+console = Console()
+
+# This function turns one keyword's data into a single JSON line.
+# The record has the same shape as keyword_data_structure.json, plus the keyword itself.
+def keyword_line(keyword, content):
+    return json.dumps({"keyword": keyword, **content.to_dict()}, ensure_ascii=False, default=json_default) + "\n"
+
+# This is the main function that takes the data and exports it to a JSONL file.
+def export_to_jsonl(data, filename="research_output.jsonl"):
+    with open(filename, mode="w", encoding="utf-8") as file:
+        for keyword, content in data.items():
+            file.write(keyword_line(keyword, content))
+    console.print(f"[green]JSONL exported successfully to {filename}[/green]\n")
+
+# This class writes a JSONL file incrementally, one keyword (one line) at a time.
+class JSONLStreamWriter(StreamWriter):
+    label = "JSONL"
+
+    def render(self, keyword, content):
+        return keyword_line(keyword, content)
@@ -0,0 +1,256 @@
+# This script records how every fetcher call went: which source and keyword it was for,
+# how long it took (connection set-up, time to first byte, total), how many bytes came
+# back, how often it was retried or timed out, and whether the cache answered it.
+# At the end of a run it prints a p50/p95/max summary per source, and it can dump the
+# whole thing as JSON or in the OpenMetrics text format for dashboards to scrape.
+#
+# The fetch engines open a record around each job with track(). The HTTP client and the
+# cache add to "the current record" through a context variable, so they never need to
+# know which job they're working for; this works the same in worker threads and in
+# asyncio tasks.
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# These are the quantiles shown in the summary and exported.
+QUANTILES = (0.5, 0.95)
+
+_current = contextvars.ContextVar("sourcefolio_fetch_record", default=None)
+
+
+# This function returns the value at quantile q of a sorted list.
+def quantile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+# This function tells whether an exception was a timeout.
+def is_timeout(error):
+    if isinstance(error, TimeoutError):
+        return True
+    name = type(error).__name__
+    return "Timeout" in name or "timed out" in str(error)
+
+
+# This class collects one record per fetcher call. All methods are thread-safe.
+class FetchMetrics:
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    # This clears the records at the start of a new research run.
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    # This opens a record for one fetcher call. A Wikipedia batch is one call for many keywords.
+    # An exception leaving the block marks the record as an error (or a timeout).
+    @contextmanager
+    def track(self, source, keywords):
+        record = {
+            "source": source,
+            "keywords": list(keywords) if isinstance(keywords, (list, tuple)) else [keywords],
+            "started_at": time.time(),
+            "total_ms": None,
+            "connect_ms": 0.0,
+            "first_byte_ms": None,
+            "bytes": 0,
+            "requests": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "status": None,
+            "outcome": "ok",
+        }
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            self.fail(record, e)
+            raise
+        finally:
+            record["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            _current.reset(token)
+            with self._lock:
+                self.records.append(record)
+
+    # This marks a record as failed, for callers that get errors back as values.
+    @staticmethod
+    def fail(record, error):
+        record["outcome"] = "timeout" if is_timeout(error) else "error"
+
+    # This returns the per-source summary: counts and total-time percentiles.
+    def summary(self):
+        with self._lock:
+            records = list(self.records)
+        by_source = {}
+        for record in records:
+            by_source.setdefault(record["source"], []).append(record)
+
+        summary = {}
+        for source, group in sorted(by_source.items()):
+            totals = sorted(r["total_ms"] for r in group)
+            first_bytes = sorted(r["first_byte_ms"] for r in group if r["first_byte_ms"] is not None)
+            summary[source] = {
+                "calls": len(group),
+                "keywords": sum(len(r["keywords"]) for r in group),
+                "errors": sum(r["outcome"] == "error" for r in group),
+                "timeouts": sum(r["outcome"] == "timeout" for r in group) + sum(r["timeouts"] for r in group),
+                "requests": sum(r["requests"] for r in group),
+                "retries": sum(r["retries"] for r in group),
+                "cache_hits": sum(r["cache_hits"] for r in group),
+                "cache_misses": sum(r["cache_misses"] for r in group),
+                "bytes": sum(r["bytes"] for r in group),
+                "connect_ms": round(sum(r["connect_ms"] for r in group), 3),
+                "total_ms_sum": round(sum(totals), 3),
+                "p50_ms": quantile(totals, 0.5),
+                "p95_ms": quantile(totals, 0.95),
+                "max_ms": totals[-1],
+                "first_byte_p50_ms": quantile(first_bytes, 0.5),
+            }
+        return summary
+
+    # This prints the summary as a table. TTFB is the median time to first byte,
+    # T/O the timeouts and Hits the cache hits.
+    def print_summary(self, console):
+        summary = self.summary()
+        if not summary:
+            return
+        # Rich's Table is only needed here, so it's imported here.
+        from rich.table import Table
+
+        table = Table(title="Fetch timings (ms)", title_style="secondary", header_style="bold")
+        for column in ("Source", "Calls", "p50", "p95", "Max", "TTFB", "KB", "Retry", "T/O", "Err", "Hits"):
+            table.add_column(column, justify="left" if column == "Source" else "right")
+        for source, s in summary.items():
+            table.add_row(
+                source,
+                str(s["calls"]),
+                _ms(s["p50_ms"]),
+                _ms(s["p95_ms"]),
+                _ms(s["max_ms"]),
+                _ms(s["first_byte_p50_ms"]),
+                f"{s['bytes'] / 1024:.0f}",
+                str(s["retries"]),
+                str(s["timeouts"]),
+                str(s["errors"]),
+                str(s["cache_hits"]),
+            )
+        console.print(table)
+
+    # This returns every record plus the summary as a JSON string.
+    def to_json(self):
+        with self._lock:
+            records = list(self.records)
+        return json.dumps({"summary": self.summary(), "records": records}, indent=2, ensure_ascii=False)
+
+    # This returns the summary in the OpenMetrics text format.
+    def to_openmetrics(self):
+        summary = self.summary()
+        lines = [
+            "# TYPE sourcefolio_fetch_duration_seconds summary",
+            "# UNIT sourcefolio_fetch_duration_seconds seconds",
+            "# HELP sourcefolio_fetch_duration_seconds Time taken by each fetcher call.",
+        ]
+        for source, s in summary.items():
+            with self._lock:
+                totals = sorted(r["total_ms"] for r in self.records if r["source"] == source)
+            for q in QUANTILES:
+                lines.append(
+                    f'sourcefolio_fetch_duration_seconds{{source="{source}",quantile="{q}"}} {quantile(totals, q) / 1000:.6f}'
+                )
+            lines.append(f'sourcefolio_fetch_duration_seconds_sum{{source="{source}"}} {s["total_ms_sum"] / 1000:.6f}')
+            lines.append(f'sourcefolio_fetch_duration_seconds_count{{source="{source}"}} {s["calls"]}')
+
+        counters = (
+            ("fetch_requests", "requests", "HTTP requests sent."),
+            ("fetch_retries", "retries", "HTTP requests retried after a failure or retryable status."),
+            ("fetch_timeouts", "timeouts", "Requests and fetcher calls that timed out."),
+            ("fetch_errors", "errors", "Fetcher calls that failed."),
+            ("fetch_response_bytes", "bytes", "Response body bytes received."),
+            ("fetch_cache_hits", "cache_hits", "Lookups answered by the response cache."),
+            ("fetch_cache_misses", "cache_misses", "Lookups the response cache couldn't answer."),
+        )
+        for name, key, help_text in counters:
+            lines.append(f"# TYPE sourcefolio_{name} counter")
+            lines.append(f"# HELP sourcefolio_{name} {help_text}")
+            for source, s in summary.items():
+                lines.append(f'sourcefolio_{name}_total{{source="{source}"}} {s[key]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    # This writes the dump. A path ending in .prom, .txt or .om gets OpenMetrics, anything else JSON.
+    def write(self, path):
+        path = str(path)
+        text = self.to_openmetrics() if path.endswith((".prom", ".txt", ".om")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+# This formats a time in milliseconds for the summary table.
+def _ms(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+# These are the metrics shared by the whole application.
+metrics = FetchMetrics()
+
+
+# The functions below are the hooks the HTTP client and the cache call.
+# Outside of a tracked fetcher call they do nothing.
+
+# This notes the time it took to open a new connection (DNS lookup, TCP and TLS).
+def note_connect(ms):
+    record = _current.get()
+    if record is not None:
+        record["connect_ms"] = round(record["connect_ms"] + ms, 3)
+
+
+# This notes one finished HTTP request.
+def note_response(status, size, first_byte_ms=None):
+    record = _current.get()
+    if record is None:
+        return
+    record["requests"] += 1
+    record["status"] = status
+    record["bytes"] += size
+    if first_byte_ms is not None and record["first_byte_ms"] is None:
+        record["first_byte_ms"] = round(first_byte_ms, 3)
+
+
+# This notes a request that failed before a response came back.
+def note_failure(error):
+    record = _current.get()
+    if record is None:
+        return
+    record["requests"] += 1
+    if is_timeout(error):
+        record["timeouts"] += 1
+
+
+# This notes that a request is being retried.
+def note_retry():
+    record = _current.get()
+    if record is not None:
+        record["retries"] += 1
+
+
+# This notes a cache lookup.
+def note_cache(hit):
+    record = _current.get()
+    if record is not None:
+        record["cache_hits" if hit else "cache_misses"] += 1
+
+
+# This prints the run summary and writes the dump if a path was given.
+def report(console, path=None):
+    metrics.print_summary(console)
+    if path:
+        metrics.write(path)
+        console.print(f"[secondary]Fetch metrics written to {path}[/secondary]")
@@ -0,0 +1,176 @@
+# This script defines the records the research data is made of.
+# A session used to be a dict of dicts of lists of dicts; at tens of thousands of books and
+# articles per run, all those small dicts (each with its own hash table) were most of the
+# memory. These classes use __slots__, so a record is a handful of pointers and nothing else.
+#
+# The JSON shape described in keyword_data_structure.json hasn't changed: every record can
+# be loaded from it with from_dict() and dumped back with to_dict(), and json_default()
+# lets json.dumps() write records anywhere it used to write the dicts (journal, cache, JSONL).
+
+from processing.article_store import StoredText
+
+
+# This is the base class of the small records. Each subclass lists its attributes in
+# __slots__ and the matching JSON keys, in the same order, in FIELDS.
+class Record:
+    __slots__ = ()
+    FIELDS = ()
+
+    # This builds a record from its JSON dict. Missing keys become None.
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*map(data.get, cls.FIELDS))
+
+    # This builds a list of records from a list of JSON dicts.
+    @classmethod
+    def from_list(cls, items):
+        return [cls.from_dict(item) for item in items or ()]
+
+    # This returns the record as its JSON dict.
+    def to_dict(self):
+        return {key: getattr(self, name) for name, key in zip(self.__slots__, self.FIELDS)}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+# This is a Wikipedia page: its title, the extract (summary or full text) and its URL.
+# For detailed pages the extract may live in an article store, in which case 'content'
+# is a StoredText rather than a string (see article_store.py).
+class WikiEntry(Record):
+    __slots__ = ("title", "content", "url")
+    FIELDS = ("title", "content", "url")
+
+    def __init__(self, title=None, content=None, url=None):
+        self.title = title
+        self.content = content
+        self.url = url
+
+
+# This is one book from OpenLibrary.
+class Book(Record):
+    __slots__ = ("title", "author", "first_publish_year", "isbn", "link", "edition_link", "cover_image")
+    FIELDS = __slots__
+
+    def __init__(self, title=None, author=None, first_publish_year=None, isbn=None, link=None, edition_link=None, cover_image=None):
+        self.title = title
+        self.author = author
+        self.first_publish_year = first_publish_year
+        self.isbn = isbn
+        self.link = link
+        self.edition_link = edition_link
+        self.cover_image = cover_image
+
+
+# This is one news article from NewsAPI. 'published_at' is "publishedAt" in JSON, like in the API.
+class NewsArticle(Record):
+    __slots__ = ("title", "description", "url", "source", "published_at")
+    FIELDS = ("title", "description", "url", "source", "publishedAt")
+
+    def __init__(self, title=None, description=None, url=None, source=None, published_at=None):
+        self.title = title
+        self.description = description
+        self.url = url
+        self.source = source
+        self.published_at = published_at
+
+
+# These are the attributes of KeywordResult that hold each source's results.
+SOURCE_ATTRIBUTES = {"wiki": "wiki", "olib": "books", "news": "news"}
+
+
+# This is everything collected for one keyword: the Wikipedia page (or None), the books
+# and the news articles, plus whether the Wikipedia page was fetched in full.
+# 'duplicates' is filled in by the de-duplication stage (see dedup.py): it maps a
+# (source, position) in this keyword's lists to the keyword that already lists the same
+# book or article. It's not part of the JSON shape.
+class KeywordResult:
+    __slots__ = ("is_detailed", "wiki", "books", "news", "duplicates")
+
+    def __init__(self, is_detailed=None, wiki=None, books=None, news=None, duplicates=None):
+        self.is_detailed = is_detailed
+        self.wiki = wiki
+        self.books = books if books is not None else []
+        self.news = news if news is not None else []
+        self.duplicates = duplicates if duplicates is not None else {}
+
+    # These get and set a source's results by source name ("wiki", "olib" or "news").
+    def get(self, source):
+        return getattr(self, SOURCE_ATTRIBUTES[source])
+
+    def set(self, source, value):
+        setattr(self, SOURCE_ATTRIBUTES[source], value)
+
+    # This returns the keyword that already lists the book or article at 'index' of
+    # 'source' ("olib" or "news"), or None if it's listed here first.
+    def duplicate_of(self, source, index):
+        return self.duplicates.get((source, index))
+
+    # This tells whether anything at all was found for the keyword.
+    def has_data(self):
+        return bool((self.wiki is not None and self.wiki.content) or self.books or self.news)
+
+    # This builds a result from the JSON shape in keyword_data_structure.json.
+    @classmethod
+    def from_dict(cls, data):
+        wiki = data.get("wiki") or {}
+        return cls(
+            wiki.get("is_detailed"),
+            load_source("wiki", wiki.get("data")),
+            load_source("olib", data.get("olib")),
+            load_source("news", data.get("news")),
+        )
+
+    # This returns the result in the JSON shape, with an empty dict when there's no page.
+    def to_dict(self):
+        return {
+            "wiki": {"is_detailed": self.is_detailed, "data": self.wiki.to_dict() if self.wiki else {}},
+            "news": [article.to_dict() for article in self.news],
+            "olib": [book.to_dict() for book in self.books],
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, KeywordResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (
+            f"KeywordResult(is_detailed={self.is_detailed!r}, wiki={self.wiki!r}, "
+            f"books={len(self.books)}, news={len(self.news)})"
+        )
+
+
+# This function turns one source's results from their JSON shape back into records.
+# It's what the cache and the session journal use to load what they stored.
+def load_source(source, value):
+    if source == "wiki":
+        return WikiEntry.from_dict(value) if value else None
+    if source == "olib":
+        return Book.from_list(value)
+    return NewsArticle.from_list(value)
+
+
+# This function is the 'default' hook for json.dumps(), so records are written as their dicts.
+def json_default(value):
+    if isinstance(value, (Record, KeywordResult)):
+        return value.to_dict()
+    if isinstance(value, StoredText):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# This function loads a whole session's data (keyword -> JSON dict) into records.
+def load_data(data):
+    return {keyword: KeywordResult.from_dict(entry) for keyword, entry in data.items()}
+
+
+# This function dumps a whole session's data back into its JSON shape.
+def dump_data(data):
+    return {keyword: result.to_dict() for keyword, result in data.items()}
@@ -1,25 +1,190 @@
 # Hey there! This script is all about turning the research data into a neat PDF report.
 # I'm using the reportlab library, which is a powerful tool for creating PDFs in Python.
+#
+# The report is laid out in a single pass. ReportLab's usual way of making a table of
+# contents (multiBuild) lays the whole document out at least twice, because the TOC
+# needs page numbers that are only known once everything after it has been placed.
+# Here the TOC lines are laid out straight away (their size doesn't depend on the page
+# numbers), and each page number is drawn through a PDF form that is only filled in
+# once the body is done. The body itself is fed to ReportLab one keyword at a time,
+# so memory stays proportional to one section instead of the whole report.
+#
+# For big reports, the sections can also be rendered in a pool of processes and
+# stitched together with pypdf (pip install "sourcefolio[parallel]").
 
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import (
     BaseDocTemplate,
     PageTemplate,
     Frame,
+    Flowable,
+    HRFlowable,
     Paragraph,
     Spacer,
     PageBreak,
     ListFlowable,
     ListItem,
 )
-from reportlab.platypus.tableofcontents import TableOfContents
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
+from reportlab.lib.utils import simpleSplit
 from processing import utils
+from processing.article_store import paragraphs
+from processing.config import get_setting
 from rich.console import Console
 
 console = Console()
 
+# The sample stylesheet is built once and shared by every document (and every section).
+STYLES = getSampleStyleSheet()
+
+# These are the styles for the two levels of the table of contents.
+TOC_LEVEL_STYLES = [
+    ParagraphStyle(
+        name="TOCHeading1",
+        fontName="Times-Bold",
+        fontSize=14,
+        leftIndent=20,
+        firstLineIndent=-20,
+        spaceBefore=5,
+    ),
+    ParagraphStyle(
+        name="TOCHeading2",
+        fontSize=12,
+        leftIndent=40,
+        firstLineIndent=-20,
+        spaceBefore=0,
+    ),
+]
+
+TOC_HEADING_STYLE = ParagraphStyle(
+    name="TOCMainHeading",
+    fontSize=16,
+    leading=20,
+    alignment=0,
+    fontName="Helvetica-Bold",
+    spaceAfter=6,
+)
+
+# This is how much room is kept on the right of every TOC line for its page number.
+TOC_NUMBER_WIDTH = 36
+
+# Dot leaders are drawn from this TOC level on, like ReportLab's own TableOfContents.
+TOC_DOTS_MIN_LEVEL = 1
+
+# This is how many processes render a PDF. 1 means everything happens in this process;
+# 0 means one per CPU core. It can be set as PDF_WORKERS in the config file.
+DEFAULT_PDF_WORKERS = 1
+
+
+# This is one line of the table of contents. The text is drawn right away, but the dots
+# and the page number go into a PDF form (named after the entry) that is only defined
+# after the body has been laid out. PDF allows referencing a form before it's defined.
+class TOCLine(Flowable):
+    def __init__(self, text, level, index):
+        super().__init__()
+        self.style = TOC_LEVEL_STYLES[level]
+        self.para = Paragraph(text, self.style)
+        self.level = level
+        self.index = index
+        # These are filled in by draw() and used when the form is rendered.
+        self.text_end = 0
+        self.form_width = 0
+
+    @property
+    def form_name(self):
+        return f"toc_entry_{self.index}"
+
+    def wrap(self, availWidth, availHeight):
+        self.avail_width = availWidth
+        self.width, self.height = self.para.wrap(availWidth - TOC_NUMBER_WIDTH, availHeight)
+        return availWidth, self.height
+
+    def getSpaceBefore(self):
+        return self.style.spaceBefore
+
+    # This works out where the text of the last line ends, so the dots can start there.
+    def _last_line_end(self):
+        lines = self.para.blPara.lines
+        last = lines[-1]
+        extra = last.extraSpace if hasattr(last, "extraSpace") else last[0]
+        indent = self.style.leftIndent + (self.style.firstLineIndent if len(lines) == 1 else 0)
+        line_width = self.para.width - self.style.leftIndent - self.style.rightIndent
+        if len(lines) == 1:
+            line_width -= self.style.firstLineIndent
+        return indent + line_width - extra, len(lines)
+
+    def draw(self):
+        self.para.drawOn(self.canv, 0, 0)
+        self.text_end, line_count = self._last_line_end()
+        self.form_width = max(self.avail_width - self.text_end, TOC_NUMBER_WIDTH)
+        baseline = self.height - self.style.fontSize - (line_count - 1) * self.style.leading
+        self.canv.saveState()
+        self.canv.translate(self.text_end, baseline)
+        self.canv.doForm(self.form_name)
+        self.canv.restoreState()
+
+    # This defines the form with the dots and the page number, once the page is known.
+    def render_number(self, canv, page):
+        style = self.style
+        width = self.form_width
+        canv.beginForm(self.form_name, lowerx=0, lowery=-style.fontSize, upperx=width, uppery=style.fontSize * 2)
+        canv.setFont(style.fontName, style.fontSize)
+        number = str(page)
+        number_width = canv.stringWidth(number, style.fontName, style.fontSize)
+        if self.level >= TOC_DOTS_MIN_LEVEL:
+            dot = " . "
+            dot_width = canv.stringWidth(dot, style.fontName, style.fontSize)
+            count = int((width - number_width - 4) / dot_width) if dot_width else 0
+            if count > 0:
+                canv.drawRightString(width - number_width - 2, 0, dot * count)
+        canv.drawRightString(width, 0, number)
+        canv.endForm()
+
+
+# This is a cheap flowable for long plain-text bodies like Wikipedia extracts.
+# A Paragraph parses its text as markup and builds objects for every word, which is most
+# of the cost of a detailed report. This one just splits the text into lines by font
+# metrics and draws them, and it can be split across pages line by line.
+class PlainText(Flowable):
+    def __init__(self, text, style, lines=None):
+        super().__init__()
+        self.text = text
+        self.style = style
+        self.lines = lines
+        self._wrap_width = None
+
+    def wrap(self, availWidth, availHeight):
+        if self.lines is None or self._wrap_width != availWidth:
+            self.lines = simpleSplit(self.text, self.style.fontName, self.style.fontSize, availWidth)
+            self._wrap_width = availWidth
+        self.width = availWidth
+        self.height = len(self.lines) * self.style.leading
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        self.wrap(availWidth, availHeight)
+        fits = int(availHeight // self.style.leading)
+        if fits <= 0:
+            return []
+        if fits >= len(self.lines):
+            return [self]
+        first = PlainText(None, self.style, self.lines[:fits])
+        rest = PlainText(None, self.style, self.lines[fits:])
+        first._wrap_width = rest._wrap_width = availWidth
+        return [first, rest]
+
+    def draw(self):
+        text = self.canv.beginText(0, self.height - self.style.fontSize)
+        text.setFont(self.style.fontName, self.style.fontSize, self.style.leading)
+        for line in self.lines:
+            text.textLine(line)
+        self.canv.drawText(text)
+
 
 # This is my custom document template. I'm inheriting from BaseDocTemplate
 # to create a structure for my report with a consistent footer.
@@ -33,20 +198,17 @@ class ReportDocTemplate(BaseDocTemplate):
         )
         # I'm adding a page template with my frame and a footer.
         self.addPageTemplates([PageTemplate("Normal", frame, onPage=self._add_footer)])
-        self.styles = getSampleStyleSheet()
-        self.current_keyword = None
+        self.styles = STYLES
+        # These are the TOC lines, and the page each TOC entry ended up on.
+        self.toc_lines = []
+        self.toc_pages = {}
 
     # This method is called for every flowable (like a paragraph) that's added to the document.
-    # I'm using it to build my table of contents.
+    # Headings carry the index of their TOC entry, so I just note the page they landed on.
     def afterFlowable(self, flowable):
-        if isinstance(flowable, Paragraph):
-            text = flowable.getPlainText()
-            style_name = flowable.style.name
-            # If it's a Heading1 or Heading2, I add it to the TOC.
-            if style_name == "Heading1":
-                self.notify("TOCEntry", (0, text, self.page))
-            elif style_name == "Heading2":
-                self.notify("TOCEntry", (1, text, self.page))
+        index = getattr(flowable, "toc_index", None)
+        if index is not None:
+            self.toc_pages.setdefault(index, self.page)
 
     # This method adds a footer to each page.
     def _add_footer(self, canvas, doc):
@@ -56,53 +218,75 @@ class ReportDocTemplate(BaseDocTemplate):
         canvas.drawRightString(self.pagesize[0] - cm, cm / 2, footer_text)
         canvas.restoreState()
 
+    # This lays out a list of flowables, the same way build() does internally.
+    def add_flowables(self, flowables):
+        while flowables:
+            self.clean_hanging()
+            self.handle_flowable(flowables)
 
-# This is the main function that takes my data and spits out a PDF.
-def export_to_pdf(data, filename="research_output.pdf"):
-    # I'm creating an instance of my custom document template.
-    doc = ReportDocTemplate(filename, pagesize=A4)
-    styles = doc.styles
-    h1 = styles["Heading1"]
-    h2 = styles["Heading2"]
-    normal = styles["Normal"]
+    # This lays the document out in one pass: the front matter first, then each section
+    # as it's produced by the 'sections' iterator, and finally the TOC page numbers.
+    # 'resolve_pages', if given, is called with the number of pages laid out and returns
+    # the pages of TOC entries that live in other documents (used when rendering in parallel).
+    def build_sections(self, front_matter, sections, resolve_pages=None):
+        self._startBuild(self.filename)
+        # I'm saving the file myself, after the TOC forms have been defined.
+        self._doSave = 0
+        canv = self.canv
+        canv._doctemplate = self
+        try:
+            self.add_flowables(front_matter)
+            for section in sections:
+                self.add_flowables(section)
+        finally:
+            del canv._doctemplate
+        self._endBuild()
+        if resolve_pages:
+            self.toc_pages.update(resolve_pages(self.page))
+        for line in self.toc_lines:
+            line.render_number(canv, self.toc_pages.get(line.index, ""))
+        canv.save()
 
-    # The 'story' is a list of all the elements that will go into my PDF.
-    story = []
 
-    # I'll create a table of contents.
-    toc = TableOfContents()
-    # And here's how I style it.
-    toc.levelStyles = [
-        ParagraphStyle(
-            name="TOCHeading1",
-            fontName="Times-Bold",
-            fontSize=14,
-            leftIndent=20,
-            firstLineIndent=-20,
-            spaceBefore=5,
-        ),
-        ParagraphStyle(
-            name="TOCHeading2",
-            fontSize=12,
-            leftIndent=40,
-            firstLineIndent=-20,
-            spaceBefore=0,
-        ),
-    ]
-    toc_heading_style = ParagraphStyle(
-        name="TOCMainHeading",
-        fontSize=16,
-        leading=20,
-        alignment=0,
-        fontName="Helvetica-Bold",
-        spaceAfter=6,
-    )
-    story.append(Paragraph("Table of Contents", toc_heading_style))
-    doc.notify("TOCEntry", (0, "Table of Contents", 1))
-    from reportlab.platypus import HRFlowable
+# This function returns a heading paragraph tagged with the index of its TOC entry.
+def toc_heading(text, style, index):
+    heading = Paragraph(text, style)
+    heading.toc_index = index
+    return heading
+
+
+# This function escapes a value for use inside Paragraph markup. Every field from the
+# APIs goes through it exactly once, so a stray '&' or '<' can't break the layout.
+def markup(value):
+    return escape(str(value))
+
+
+# This function escapes a URL for use inside an href="..." attribute.
+def href(url):
+    return escape(str(url), {'"': "&quot;"})
+
+
+# This function returns the escaped section title of a keyword.
+def section_title(key, sections):
+    return markup((sections.wiki.title if sections.wiki else None) or key)
+
 
+# This function returns the TOC entries (level, text) for the whole report, in order.
+# They're known up front because every section has the same headings.
+def toc_entries(data):
+    entries = [(0, "Table of Contents")]
+    for i, (key, sections) in enumerate(data.items(), start=1):
+        entries.append((0, f"{i}. {section_title(key, sections)}"))
+        entries.append((1, "Full Details" if sections.is_detailed else "Summary"))
+        entries.append((1, "Books to Refer"))
+        entries.append((1, "Recent News"))
+    return entries
+
+
+# This function builds the flowables for the table of contents page(s).
+def toc_flowables(doc, data):
+    story = [toc_heading("Table of Contents", TOC_HEADING_STYLE, 0)]
     # A horizontal line for some visual separation.
-    line_width = doc.width
     story.append(
         HRFlowable(
             width="99%",
@@ -113,109 +297,224 @@ def export_to_pdf(data, filename="research_output.pdf"):
             spaceAfter=10,
         )
     )
-    story.append(toc)
+    doc.toc_lines = [
+        TOCLine(text, level, index) for index, (level, text) in enumerate(toc_entries(data))
+    ]
+    story.extend(doc.toc_lines)
     story.append(PageBreak())
+    return story
 
-    # Now, I loop through my data and add it to the story.
-    for i, (key, sections) in enumerate(data.items(), start=1):
-        doc.current_keyword = key
-        # This is the main title for each section.
-        # Use the wiki title if it exists, otherwise fall back to the keyword
-        title = sections["wiki"]["data"].get("title", key)
-        story.append(Paragraph(f"{i}. {title}", h1))
-        story.append(Spacer(1, 6))
-
-        # This is the subtitle for the Wikipedia section.
+
+# These are the markup templates for one book and one news article.
+BOOK_MARKUP = "<b>{title}</b> by {author} ({year})"
+NEWS_MARKUP = "<b>{headline}</b> ({source})"
+# A book or article another keyword already lists in full is only a reference to it.
+REFERENCE_MARKUP = "<b>{title}</b> (see {keyword})"
+LINK_MARKUP = '<link href="{href}">{text}</link>'
+
+
+# This function builds the flowables for one keyword. 'toc_index' is the index of the
+# section's first TOC entry; its headings take that one and the three after it.
+def section_flowables(i, key, sections, styles, toc_index):
+    h1 = styles["Heading1"]
+    h2 = styles["Heading2"]
+    normal = styles["Normal"]
+    story = []
+
+    # This is the main title for each section.
+    # Use the wiki title if it exists, otherwise fall back to the keyword
+    story.append(toc_heading(f"{i}. {section_title(key, sections)}", h1, toc_index))
+    story.append(Spacer(1, 6))
+
+    # This is the subtitle for the Wikipedia section.
+    story.append(
+        toc_heading(
+            "Full Details" if sections.is_detailed else "Summary", h2, toc_index + 1
+        )
+    )
+    # I'll add the Wikipedia content.
+    if sections.wiki:
+        wiki = sections.wiki
+        content = wiki.content
+        if content:
+            # I'm splitting the content into paragraphs. The extracts are plain text,
+            # so they go into the cheap PlainText flowable instead of a Paragraph.
+            # Articles in an article store are read back one paragraph at a time.
+            for para in paragraphs(content):
+                para = para.strip()
+                if para:
+                    story.append(PlainText(para, normal))
+                    story.append(Spacer(1, 6))
+        else:
+            story.append(Paragraph("N/A", normal))
+        url = wiki.url or "N/A"
+        # And a link to the Wikipedia page.
         story.append(
             Paragraph(
-                f"Full Details" if sections["wiki"]["is_detailed"] else "Summary", h2
+                "<b>Page Link:</b> " + LINK_MARKUP.format(href=href(url), text=markup(url)), normal
             )
         )
-        # I'll add the Wikipedia content.
-        if sections["wiki"]["data"]:
-            wiki = sections["wiki"]["data"]
-            content = wiki.get("content", "N/A")
-            if content and isinstance(content, str):
-                # I'm splitting the content into paragraphs and adding them to the story.
-                for para in content.split("\n\n"):
-                    para = para.strip().replace("\n", "<br/>")
-                    if para:
-                        story.append(Paragraph(para, normal))
-                        story.append(Spacer(1, 6))
+    else:
+        story.append(Paragraph("No Wikipedia data available.", normal))
+    story.append(Spacer(1, 12))
+
+    # Now for the books section.
+    story.append(toc_heading("Books to Refer", h2, toc_index + 2))
+    if sections.books:
+        books_list = []
+        # I'm taking the top 5 books.
+        for index, b in enumerate(sections.books[:5]):
+            book_link = b.edition_link or b.link
+            owner = sections.duplicate_of("olib", index)
+            if owner is not None:
+                book_text = REFERENCE_MARKUP.format(title=markup(b.title), keyword=markup(owner))
             else:
-                story.append(Paragraph("N/A", normal))
-            url = wiki.get("url", "N/A")
-            # And a link to the Wikipedia page.
-            story.append(
-                Paragraph(
-                    f'\n<b>Page Link:</b> <link href="{url}">{url}</link>', normal
+                book_text = BOOK_MARKUP.format(
+                    title=markup(b.title),
+                    author=markup(utils.format_author(b.author)),
+                    year=markup(b.first_publish_year),
                 )
+
+            # If there's a link, let's make the text clickable.
+            if book_link:
+                book_text = LINK_MARKUP.format(href=href(book_link), text=book_text)
+
+            books_list.append(ListItem(Paragraph(book_text, normal)))
+
+        # I'm creating a numbered list of books.
+        story.append(
+            ListFlowable(
+                books_list,
+                bulletType="1",
+                bulletFormat="%s.",
+                bulletFontSize=normal.fontSize,
             )
-        else:
-            story.append(Paragraph("No Wikipedia data available.", normal))
-        story.append(Spacer(1, 12))
-
-        # Now for the books section.
-        story.append(Paragraph("Books to Refer", h2))
-        if sections["olib"]:
-            books_list = []
-            # I'm taking the top 5 books.
-            for b in sections["olib"][:5]:
-                book_link = b.get("edition_link") or b.get("link", "")
-                book_text = f"<b>{b.get('title')}</b> by {utils.format_author(b.get('author'))} ({b.get('first_publish_year')})"
-
-                # If there's a link, let's make the text clickable.
-                if book_link:
-                    book_text = f'<link href="{book_link}">{book_text}</link>'
-
-                books_list.append(ListItem(Paragraph(book_text, normal)))
-
-            # I'm creating a numbered list of books.
-            story.append(
-                ListFlowable(
-                    books_list,
-                    bulletType="1",
-                    bulletFormat="%s.",
-                    bulletFontSize=normal.fontSize,
+        )
+    else:
+        story.append(Paragraph("No books found.", normal))
+    story.append(Spacer(1, 12))
+
+    # And finally, the news section.
+    story.append(toc_heading("Recent News", h2, toc_index + 3))
+    if sections.news:
+        news_list = []
+        # I'm taking the top 5 news articles.
+        for index, a in enumerate(sections.news[:5]):
+            desc = a.description
+            news_url = a.url
+
+            owner = sections.duplicate_of("news", index)
+            if owner is not None:
+                text = REFERENCE_MARKUP.format(title=markup(a.title or "N/A"), keyword=markup(owner))
+            else:
+                text = NEWS_MARKUP.format(
+                    headline=markup(a.title or "N/A"), source=markup(a.source or "Unknown")
                 )
-            )
-        else:
-            story.append(Paragraph("No books found.", normal))
-        story.append(Spacer(1, 12))
-
-        # And finally, the news section.
-        story.append(Paragraph("Recent News", h2))
-        if sections["news"]:
-            news_list = []
-            # I'm taking the top 5 news articles.
-            for a in sections["news"][:5]:
-                headline = a.get("title", "N/A")
-                source = a.get("source", "Unknown")
-                desc = a.get("description", "")
-                news_url = a.get("url", "")
-
-                text = f"<b>{headline}</b> ({source})"
                 if desc:
-                    text += f" - {desc}"
-
-                # If there's a link, let's make the text clickable.
-                if news_url:
-                    text = f'<link href="{news_url}">{text}</link>'
-
-                news_list.append(ListItem(Paragraph(text, normal)))
-            # I'm creating a lettered list of news articles.
-            story.append(
-                ListFlowable(
-                    news_list,
-                    bulletType="a",
-                    bulletFormat="%s.",
-                    bulletFontSize=normal.fontSize,
-                )
+                    text += " - " + markup(desc)
+
+            # If there's a link, let's make the text clickable.
+            if news_url:
+                text = LINK_MARKUP.format(href=href(news_url), text=text)
+
+            news_list.append(ListItem(Paragraph(text, normal)))
+        # I'm creating a lettered list of news articles.
+        story.append(
+            ListFlowable(
+                news_list,
+                bulletType="a",
+                bulletFormat="%s.",
+                bulletFontSize=normal.fontSize,
             )
-        else:
-            story.append(Paragraph("No news articles found.", normal))
-        story.append(PageBreak())
+        )
+    else:
+        story.append(Paragraph("No news articles found.", normal))
+    story.append(PageBreak())
+    return story
+
+
+# This function renders one keyword section as a standalone PDF in a worker process.
+# It returns the PDF bytes, the page of each of the section's TOC entries (counted from
+# the first page of the section) and the section's page count.
+def _render_section(args):
+    i, key, entry, toc_index = args
+    buffer = io.BytesIO()
+    doc = ReportDocTemplate(buffer, pagesize=A4)
+    doc.build_sections([], [section_flowables(i, key, entry, doc.styles, toc_index)])
+    return buffer.getvalue(), doc.toc_pages, doc.page
+
+
+# This function tells how many processes to use for a PDF, or 1 if it can't be parallel.
+def pdf_workers(workers, section_count):
+    workers = get_setting("PDF_WORKERS", DEFAULT_PDF_WORKERS) if workers is None else workers
+    workers = int(workers) or os.cpu_count() or 1
+    return max(1, min(workers, section_count))
+
+
+# This function renders the sections in a process pool and stitches the parts together.
+# The TOC is rendered last, in this process, once the global page of every entry is known.
+def _export_parallel(data, filename, workers):
+    from pypdf import PdfWriter
+
+    tasks = [
+        (i, key, entry, 1 + 4 * (i - 1))
+        for i, (key, entry) in enumerate(data.items(), start=1)
+    ]
+    parts = []
+    section_pages = {}
+    page = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pdf_bytes, pages, page_count in pool.map(_render_section, tasks):
+            # These are pages relative to the body; the TOC length is added below.
+            for index, relative in pages.items():
+                section_pages[index] = page + relative
+            page += page_count
+            parts.append(pdf_bytes)
+
+    toc_buffer = io.BytesIO()
+    doc = ReportDocTemplate(toc_buffer, pagesize=A4)
+    doc.build_sections(
+        toc_flowables(doc, data),
+        [],
+        lambda toc_page_count: {index: toc_page_count + p for index, p in section_pages.items()},
+    )
+
+    writer = PdfWriter()
+    for part in [toc_buffer.getvalue()] + parts:
+        writer.append(io.BytesIO(part))
+    with open(filename, "wb") as f:
+        writer.write(f)
+
+
+# This function lays the whole report out in this process.
+def _export_single(data, filename):
+    # I'm creating an instance of my custom document template.
+    doc = ReportDocTemplate(filename, pagesize=A4)
+
+    # The sections are produced one at a time while the document is being laid out,
+    # so only one keyword's flowables exist at any moment.
+    # Entry 0 of the TOC is the TOC itself, then every keyword has four entries.
+    sections = (
+        section_flowables(i, key, entry, doc.styles, 1 + 4 * (i - 1))
+        for i, (key, entry) in enumerate(data.items(), start=1)
+    )
+    doc.build_sections(toc_flowables(doc, data), sections)
+
+
+# This is the main function that takes my data and spits out a PDF.
+# With more than one worker (see PDF_WORKERS), the sections are rendered in parallel.
+def export_to_pdf(data, filename="research_output.pdf", workers=None):
+    workers = pdf_workers(workers, len(data))
+    if workers > 1:
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            console.print("[yellow]Parallel PDF rendering needs pypdf (pip install \"sourcefolio[parallel]\"), rendering in one process.[/yellow]")
+            workers = 1
 
     # This is where the magic happens. I'm building the PDF.
-    doc.multiBuild(story)
+    if workers > 1:
+        _export_parallel(data, filename, workers)
+    else:
+        _export_single(data, filename)
     console.print(f"[green]PDF exported successfully to {filename}[/green]\n")
@@ -0,0 +1,103 @@
+# This script fetches the options of an ambiguous keyword in the background.
+# When Wikipedia says a keyword is ambiguous, the session shows the options and waits for
+# the user to pick one or type a refinement, which used to start a fresh fetch from cold.
+# Now the options are ranked by how well they match the keyword, and the top ones are
+# fetched while the table is on screen, so picking one of them (or typing it exactly) is
+# answered from that warm result straight away.
+#
+# In summary mode all the options go out in one batched request. Full articles can't be
+# batched (the API returns one per request), so for detailed keywords only the top few
+# are fetched.
+
+import concurrent.futures
+import re
+from difflib import SequenceMatcher
+
+# This is how many of the ranked options are fetched ahead, per detail level.
+PREFETCH_SUMMARY = 8
+PREFETCH_DETAILED = 3
+
+_WORD = re.compile(r"\w+")
+
+
+# This function scores how well a disambiguation option matches the keyword: the share of
+# the keyword's words that appear in the option, plus how similar the two strings are,
+# plus a bonus when the option starts with the keyword ("Mercury (planet)" for "mercury").
+# Options that are disambiguation pages themselves are pushed down.
+def relevance(keyword, option):
+    keyword_text = keyword.casefold()
+    option_text = option.casefold()
+    words = set(_WORD.findall(keyword_text))
+    overlap = len(words & set(_WORD.findall(option_text))) / len(words) if words else 0.0
+    score = overlap + SequenceMatcher(None, keyword_text, option_text).ratio()
+    if option_text.startswith(keyword_text):
+        score += 0.5
+    if "disambiguation" in option_text:
+        score -= 1.0
+    return score
+
+
+# This function returns the options best match first. Ties keep Wikipedia's order.
+def rank_options(keyword, options):
+    return sorted(options, key=lambda option: relevance(keyword, option), reverse=True)
+
+
+# This class runs the background fetches and hands out their results.
+# Results are looked up by option title (ignoring case) and detail level.
+class DisambiguationPrefetcher:
+    def __init__(self, engine):
+        self.engine = engine
+        self._executor = None
+        self._futures = {}
+
+    # This starts fetching the top options (already ranked) in the background.
+    def start(self, options, is_detailed):
+        is_detailed = bool(is_detailed)
+        count = PREFETCH_DETAILED if is_detailed else PREFETCH_SUMMARY
+        titles = [title for title in options[:count] if (title.casefold(), is_detailed) not in self._futures]
+        if not titles:
+            return
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="sourcefolio-prefetch"
+            )
+        # A summary batch is one request; full articles are one request each anyway, so
+        # each gets its own future and can be used as soon as it's in.
+        groups = [titles] if not is_detailed else [[title] for title in titles]
+        for group in groups:
+            future = self._executor.submit(self.engine.fetch_wiki, group, is_detailed)
+            for title in group:
+                self._futures[(title.casefold(), is_detailed)] = (title, future)
+
+    # This returns (True, result) for an option that was fetched ahead, waiting for the
+    # fetch if it's still running, or (False, None) if it wasn't, or its request failed.
+    def get(self, title, is_detailed):
+        entry = self._futures.get((title.casefold(), bool(is_detailed)))
+        if entry is None:
+            return False, None
+        original, future = entry
+        try:
+            result = future.result().get(original)
+        except concurrent.futures.CancelledError:
+            return False, None
+        if isinstance(result, Exception) and not _is_wiki_answer(result):
+            return False, None
+        return True, result
+
+    # This drops the fetches nobody asked for yet. I'm cancelling them one by one, since
+    # shutdown(cancel_futures=True) needs Python 3.9.
+    def close(self):
+        for _, future in self._futures.values():
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._futures.clear()
+
+
+# This function tells whether an exception is Wikipedia's answer about a page (ambiguous or
+# missing), which is as good as a page, rather than a failed request.
+def _is_wiki_answer(error):
+    import wikipedia as wp
+
+    return isinstance(error, (wp.DisambiguationError, wp.PageError))
@@ -0,0 +1,203 @@
+# This script is the built-in profiler behind 'sourcefolio --profile'.
+# It's a sampling profiler: a background thread looks at the Python stack of every
+# thread a few hundred times a second, so it sees the fetch engine's worker threads as
+# well as the main thread, and costs far less than tracing every call.
+#
+# Each sample is tagged with the thread name and the current phase (fetch, process,
+# export), which main.py and the batch mode mark with phase(). At the end the samples
+# are written in the collapsed-stack format (one "frame;frame;frame count" line per stack)
+# that flamegraph.pl, speedscope and most flame graph viewers read, and a table of the
+# hottest functions is printed.
+
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+# I'm sampling every 5 ms by default; it can be changed with PROFILE_INTERVAL_MS in the config.
+DEFAULT_INTERVAL_MS = 5
+
+# This is how many functions the hotspot table shows.
+TOP_N = 20
+
+ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+# This function shortens a source path for display: paths inside the project or inside
+# site-packages are shown relative to it, anything else by file name.
+def short_path(filename):
+    filename = filename.replace("\\", "/")
+    if filename.startswith(ROOT.replace("\\", "/") + "/"):
+        return filename[len(ROOT) + 1:]
+    marker = "site-packages/"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return filename.rsplit("/", 1)[-1]
+
+
+# This function turns a frame into its label in the collapsed-stack file.
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+# These are the labels of threads that only wait: a thread-pool worker with no job (the
+# leaf frame) and Rich's progress bar refresher (anywhere in the stack). Their samples
+# would only push the real work down the hotspot table, so they're skipped.
+IDLE_LEAVES = ("_worker (thread.py:",)
+IDLE_THREADS = ("run (rich/live.py:",)
+
+
+# This function tells whether a stack (root first) belongs to an idle thread.
+def is_idle(stack):
+    if stack[-1].startswith(IDLE_LEAVES):
+        return True
+    return any(label.startswith(IDLE_THREADS) for label in stack)
+
+
+# This class samples every thread's stack until it's stopped.
+class SamplingProfiler:
+    def __init__(self, interval_ms=None):
+        if interval_ms is None:
+            from processing.config import get_setting
+
+            interval_ms = get_setting("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)
+        self.interval = max(float(interval_ms), 0.5) / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self.phase = "startup"
+        self.phase_times = Counter()
+        self._phase_started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self._started = self._phase_started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sourcefolio-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        now = time.perf_counter()
+        self.phase_times[self.phase] += now - self._phase_started
+        self.elapsed = now - self._started
+
+    # This is the sampling loop. It runs in its own thread and skips itself.
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            phase = self.phase
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                if not stack or is_idle(stack):
+                    continue
+                thread = names.get(ident, f"thread-{ident}")
+                self.stacks[";".join([thread, phase] + stack)] += 1
+                self.samples += 1
+
+    # This switches to a new phase and returns the previous one.
+    def set_phase(self, name):
+        now = time.perf_counter()
+        previous = self.phase
+        self.phase_times[previous] += now - self._phase_started
+        self._phase_started = now
+        self.phase = name
+        return previous
+
+    # This writes the samples in the collapsed-stack format.
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    # This returns the top functions as (label, self samples, total samples).
+    # 'Self' counts samples where the function was running; 'total' also counts the
+    # samples where it was further down the stack, waiting on something it called.
+    def hotspots(self, n=TOP_N):
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[2:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        return [(label, own[label], total[label]) for label, _ in own.most_common(n)]
+
+    # This prints the phase timings and the hotspot table.
+    def print_report(self, console, n=TOP_N):
+        from rich.table import Table
+
+        phases = Table(title="Time per phase", title_style="secondary", header_style="bold")
+        phases.add_column("Phase")
+        phases.add_column("Seconds", justify="right")
+        phases.add_column("Share", justify="right")
+        for name, seconds in self.phase_times.most_common():
+            share = seconds / self.elapsed if self.elapsed else 0
+            phases.add_row(name, f"{seconds:.2f}", f"{share:.0%}")
+        console.print(phases)
+
+        if not self.samples:
+            return
+        table = Table(title=f"Top {n} functions ({self.samples} samples)", title_style="secondary", header_style="bold")
+        table.add_column("Function", overflow="fold")
+        table.add_column("Self", justify="right")
+        table.add_column("Total", justify="right")
+        for label, own, total in self.hotspots(n):
+            table.add_row(label, f"{own / self.samples:.1%}", f"{total / self.samples:.1%}")
+        console.print(table)
+
+
+# This is the profiler of the current run, if --profile was given.
+_active = None
+
+
+# This function starts profiling the whole process.
+def start(interval_ms=None):
+    global _active
+    _active = SamplingProfiler(interval_ms)
+    _active.start()
+    return _active
+
+
+# This function stops the profiler, writes the collapsed stacks to 'path' and prints the report.
+# It's safe to call more than once; only the first call does anything.
+def finish(path, console):
+    global _active
+    profiler, _active = _active, None
+    if profiler is None:
+        return
+    profiler.stop()
+    profiler.write_collapsed(path)
+    profiler.print_report(console)
+    console.print(f"[secondary]Profile written to {path} (collapsed stacks, open it with speedscope or flamegraph.pl)[/secondary]")
+
+
+# This marks a phase of the run. Without an active profiler it does nothing.
+@contextmanager
+def phase(name):
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    previous = profiler.set_phase(name)
+    try:
+        yield
+    finally:
+        profiler.set_phase(previous)
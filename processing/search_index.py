@@ -0,0 +1,232 @@
+# This script keeps a full-text index of everything SourceFolio has fetched, in
+# ~/.sourcefolio/index.sqlite3, so past research can be searched offline.
+#
+# It uses SQLite's FTS5 extension: every Wikipedia page, book and news article is one row
+# in 'items' (with its record in JSON, so it can go straight into a report again), and
+# 'items_fts' indexes its title, text and keyword. Triggers keep the two in step.
+# A row is identified by its source and link, so fetching the same page or article again
+# updates it instead of adding a copy. The fetch engine adds each keyword's results as soon
+# as the keyword is done, in one transaction.
+
+import json
+import sqlite3
+import threading
+import time
+from processing.config import CONFIG_DIR, get_setting
+from processing.models import KeywordResult, json_default, load_source
+
+INDEX_FILE = CONFIG_DIR / "index.sqlite3"
+
+# This is how many hits a search returns unless asked for more.
+DEFAULT_LIMIT = 20
+
+# In the ranking, a match in the title counts more than one in the keyword, which counts
+# more than one in the text (the weights of bm25() for the three indexed columns).
+RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+# These mark the matched words in a snippet. They're control characters, so they can't
+# clash with anything in the text, and the UI swaps them for highlighting.
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS items ("
+    " id INTEGER PRIMARY KEY,"
+    " source TEXT NOT NULL,"
+    " ref TEXT NOT NULL,"
+    " keyword TEXT NOT NULL,"
+    " title TEXT,"
+    " body TEXT,"
+    " link TEXT,"
+    " detailed INTEGER,"
+    " value TEXT NOT NULL,"
+    " fetched_at REAL NOT NULL,"
+    " UNIQUE (source, ref))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+    " title, body, keyword, content='items', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN"
+    " INSERT INTO items_fts (rowid, title, body, keyword) VALUES (new.id, new.title, new.body, new.keyword);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN"
+    " INSERT INTO items_fts (items_fts, rowid, title, body, keyword) VALUES ('delete', old.id, old.title, old.body, old.keyword);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE ON items BEGIN"
+    " INSERT INTO items_fts (items_fts, rowid, title, body, keyword) VALUES ('delete', old.id, old.title, old.body, old.keyword);"
+    " INSERT INTO items_fts (rowid, title, body, keyword) VALUES (new.id, new.title, new.body, new.keyword);"
+    " END",
+)
+
+
+# This exception is raised when a search can't be run, e.g. because this SQLite has no FTS5.
+class SearchError(Exception):
+    pass
+
+
+# This function turns what the user typed into an FTS5 query. Every word is quoted, so
+# characters like '-', '+' or ':' are searched for instead of being read as query syntax,
+# and a row has to match all the words.
+def to_match_query(text):
+    words = text.split()
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+# This function returns the rows to index for one keyword's results: a tuple of
+# (source, ref, title, body, link, record) per Wikipedia page, book and article.
+def keyword_rows(result):
+    rows = []
+    wiki = result.wiki
+    if wiki is not None and wiki.content:
+        ref = wiki.url or wiki.title
+        rows.append(("wiki", ref, wiki.title, str(wiki.content), wiki.url, wiki))
+    for book in result.books:
+        ref = book.link or book.isbn or book.title
+        body = " ".join(str(part) for part in (book.author, book.first_publish_year) if part)
+        rows.append(("olib", ref, book.title, body, book.link, book))
+    for article in result.news:
+        ref = article.url or article.title
+        body = " ".join(part for part in (article.description, article.source) if part)
+        rows.append(("news", ref, article.title, body, article.url, article))
+    return [row for row in rows if row[1]]
+
+
+# This class is one hit from a search.
+class SearchHit:
+    __slots__ = ("source", "keyword", "title", "link", "snippet", "detailed", "record")
+
+    def __init__(self, source, keyword, title, link, snippet, detailed, record):
+        self.source = source
+        self.keyword = keyword
+        self.title = title
+        self.link = link
+        self.snippet = snippet
+        self.detailed = detailed
+        self.record = record
+
+
+# This class wraps the index file. Like the response cache, it's opened on first use,
+# guarded by a lock for the fetch engine's threads, and a broken index never breaks a
+# research session: errors while adding results are ignored.
+class SearchIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            # WAL lets a search read while a research run is writing.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # This adds (or updates) everything found for one keyword.
+    def add(self, keyword, result):
+        rows = keyword_rows(result)
+        if not rows:
+            return
+        now = time.time()
+        detailed = 1 if result.is_detailed else 0
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO items (source, ref, keyword, title, body, link, detailed, value, fetched_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (source, ref) DO UPDATE SET"
+                        " keyword = excluded.keyword, title = excluded.title, body = excluded.body,"
+                        " link = excluded.link, detailed = excluded.detailed, value = excluded.value,"
+                        " fetched_at = excluded.fetched_at",
+                        [
+                            (source, ref, keyword, title, body, link, detailed if source == "wiki" else None,
+                             json.dumps(record, ensure_ascii=False, default=json_default), now)
+                            for source, ref, title, body, link, record in rows
+                        ],
+                    )
+            except sqlite3.Error:
+                pass
+
+    # This returns the best hits for 'text', optionally from one source only.
+    def search(self, text, limit=DEFAULT_LIMIT, source=None):
+        query = to_match_query(text)
+        if not query:
+            return []
+        if not self.path.exists():
+            return []
+        sql = (
+            "SELECT items.source, items.keyword, items.title, items.link,"
+            " snippet(items_fts, 1, ?, ?, '…', 12), items.detailed, items.value"
+            " FROM items_fts JOIN items ON items.id = items_fts.rowid"
+            " WHERE items_fts MATCH ?"
+        )
+        params = [MATCH_START, MATCH_END, query]
+        if source:
+            sql += " AND items.source = ?"
+            params.append(source)
+        sql += f" ORDER BY bm25(items_fts, {', '.join(map(str, RANK_WEIGHTS))}) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            try:
+                rows = self._connect().execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                raise SearchError(f"The search index can't be read: {e}")
+        return [
+            SearchHit(source, keyword, title, link, snippet, bool(detailed), load_record(source, value))
+            for source, keyword, title, link, snippet, detailed, value in rows
+        ]
+
+    # This returns how many items are indexed per source.
+    def counts(self):
+        if not self.path.exists():
+            return {}
+        with self._lock:
+            try:
+                return dict(self._connect().execute("SELECT source, COUNT(*) FROM items GROUP BY source"))
+            except sqlite3.Error as e:
+                raise SearchError(f"The search index can't be read: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# This function turns one stored record back into a WikiEntry, Book or NewsArticle.
+def load_record(source, value):
+    record = json.loads(value)
+    if source == "wiki":
+        return load_source("wiki", record)
+    return load_source(source, [record])[0]
+
+
+# This function groups hits by the keyword they were found for, in the shape of a research
+# session, so a report can be written from them without going to the network.
+# Each keyword keeps its best Wikipedia page, and its books and articles in rank order.
+def hits_to_data(hits):
+    data = {}
+    for hit in hits:
+        entry = data.setdefault(hit.keyword, KeywordResult(False))
+        if hit.source == "wiki":
+            if entry.wiki is None:
+                entry.wiki = hit.record
+                entry.is_detailed = hit.detailed
+        else:
+            entry.get(hit.source).append(hit.record)
+    return data
+
+
+# This is the index shared by the interactive and batch modes.
+index = SearchIndex()
+
+
+# This function returns the shared index, or None when indexing is turned off
+# with "SEARCH_INDEX": false in the config.
+def active_index():
+    return index if get_setting("SEARCH_INDEX", True) else None
@@ -0,0 +1,64 @@
+# This script has the part the streaming exporters share: writing a report file one keyword
+# at a time while the fetch is still running. Each keyword is rendered to a string and
+# written with a single call, and the file is flushed every few keywords (or every second),
+# so a crashed run still leaves a valid partial file and only the current keyword has to be
+# held in memory. The CSV and JSONL writers only say how a keyword is rendered.
+
+import time
+from rich.console import Console
+
+console = Console()
+
+
+# This class is the base of the stream writers. Subclasses set 'label' (the format's name
+# for the messages) and implement render(), and can write a header first with header().
+class StreamWriter:
+    label = "Report"
+    # This is passed to open(); the CSV writer sets it to "" as the csv module wants.
+    newline = None
+
+    def __init__(self, filename, flush_every=20, flush_seconds=1.0):
+        self.filename = filename
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.count = 0
+        self._file = open(filename, mode="w", newline=self.newline, encoding="utf-8")
+        header = self.header()
+        if header:
+            self._file.write(header)
+            self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    # This returns what goes at the top of the file, if anything.
+    def header(self):
+        return ""
+
+    # This returns one keyword's part of the file as a string.
+    def render(self, keyword, content):
+        raise NotImplementedError
+
+    # This appends one keyword to the file.
+    def write_keyword(self, keyword, content):
+        self._file.write(self.render(keyword, content))
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+            console.print(f"[green]{self.label} streamed successfully to {self.filename}[/green]\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
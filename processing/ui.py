@@ -1,21 +1,11 @@
 # This script handles the user interface of the application.
 # It uses the rich and InquirerPy libraries to create a beautiful and interactive command-line interface.
 
-from typing import List, Dict, Any
 from rich.console import Console
 from typing import List, Dict, Any, Optional
 from rich.panel import Panel
 from rich.table import Table
-from rich.progress import (
-    Progress,
-    BarColumn,
-    SpinnerColumn,
-    TextColumn,
-    TimeElapsedColumn,
-)
 from rich.theme import Theme
-from rich.traceback import install as rich_tracebacks
-from InquirerPy import inquirer
 import typer
 
 # I'm creating a console object with a custom theme for styling the output.
@@ -31,8 +21,22 @@ console = Console(
     )
 )
 
-# I'm installing rich tracebacks for beautiful and readable error messages.
-rich_tracebacks(show_locals=False)
+# InquirerPy (and prompt_toolkit under it) takes a while to import, and batch runs or
+# '--help' never show a prompt, so I'm only loading it when the first prompt is shown.
+class _LazyInquirer:
+    def __getattr__(self, name):
+        from InquirerPy import inquirer as real_inquirer
+
+        return getattr(real_inquirer, name)
+
+inquirer = _LazyInquirer()
+
+# This function installs rich tracebacks for beautiful and readable error messages.
+# It's called when the interactive session starts, rather than on every import.
+def install_tracebacks():
+    from rich.traceback import install as rich_tracebacks
+
+    rich_tracebacks(show_locals=False)
 
 # I'm creating a typer application.
 app = typer.Typer(help="A CLI tool for collecting research data")
@@ -84,28 +88,180 @@ def prompt_mode() -> int:
     ).execute()
     return int(choice)
 
+# These callbacks run just before the app quits, like writing the profile for --profile.
+# The interactive mode quits with os._exit(), which skips atexit handlers, so it calls
+# run_exit_hooks() (through exit_message()) instead.
+_exit_hooks = []
+
+
+# This function registers a callback to run before the app quits.
+def on_exit(callback):
+    _exit_hooks.append(callback)
+
+
+# This function runs the registered exit callbacks, each one only once.
+def run_exit_hooks():
+    while _exit_hooks:
+        _exit_hooks.pop()()
+
+
 # This function displays a simple exit message.
 def exit_message():
+    run_exit_hooks()
     console.print("\n[bold cyan]Exiting. Thank you for using SourceFolio![/bold cyan]")
 
 # This function displays a preview of the collected data in a table.
-def preview_selection(data_model: Dict[str, Dict[str, Any]]):
+def preview_selection(data_model: Dict[str, Any]):
     table = Table("Keyword", "Wikipedia Title", "Books/News", show_lines=False)
     for key, sections in data_model.items():
-        title = sections["wiki"]["data"].get("title") or "—"
-        url = sections["wiki"]["data"].get("url")
+        wiki = sections.wiki
+        title = (wiki.title if wiki else None) or "—"
+        url = wiki.url if wiki else None
 
         # Create a clickable link if a URL exists
         title_display = f"[link={url}]{title}[/link]" if url and title != "—" else title
 
-        bn = f"{len(sections.get('olib', []))} books, {len(sections.get('news', []))} articles"
+        bn = f"{len(sections.books)} books, {len(sections.news)} articles"
         table.add_row(key, title_display, bn)
     console.print(Panel(table, title="[primary]Preview[/primary]", border_style="primary"))
 
-# This is the main command for the typer application.
-@app.command()
-def run():
-    splash()
+# This function splits a "--format pdf,csv" value and checks every format is supported.
+def parse_formats(formats: str, supported) -> List[str]:
+    wanted = [f.strip().lower() for f in formats.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in supported]
+    if unknown:
+        raise typer.BadParameter(f"unknown format(s): {', '.join(unknown)}", param_hint="--format")
+    return wanted
+
+# This is the non-interactive batch command, for scheduled jobs and scripts.
+# For example: sourcefolio run --keywords-file topics.txt --mode summary --format pdf,csv --out reports/
+@app.command(help="Research keywords from a file (or '-' for stdin) without any prompts.")
+def run(
+    ctx: typer.Context,
+    keywords_file: str = typer.Option(None, "--keywords-file", "-k", help="File with one keyword per line, or '-' to read stdin."),
+    mode: str = typer.Option("summary", "--mode", "-m", help="Wikipedia detail level: summary or detailed."),
+    formats: str = typer.Option("pdf,csv", "--format", "-f", help="Comma-separated report formats: pdf, csv, jsonl."),
+    out: str = typer.Option(".", "--out", "-o", help="Directory to write the reports and error list to."),
+    stream: bool = typer.Option(False, "--stream", help="Write CSV/JSONL rows as each keyword completes."),
+    pdf_workers: Optional[int] = typer.Option(None, "--pdf-workers", help="Processes used to render the PDF (0 = one per CPU core)."),
+    books: Optional[int] = typer.Option(None, "--books", min=1, help="Books to fetch per keyword (default 5, or BOOK_LIMIT in the config)."),
+):
+    # I'm importing the batch runner here so the interactive mode doesn't pay for it.
+    from processing import batch
+
+    if mode not in batch.MODES:
+        raise typer.BadParameter(f"mode must be one of: {', '.join(batch.MODES)}", param_hint="--mode")
+    wanted = parse_formats(formats, batch.EXPORT_FORMATS)
+
+    # A keywords file is optional when resuming, since the session already has its keywords.
+    options = ctx.obj or {}
+    resume = options.get("resume")
+    keywords = []
+    if keywords_file:
+        try:
+            keywords = batch.read_keywords(keywords_file)
+        except OSError as e:
+            raise typer.BadParameter(str(e), param_hint="--keywords-file")
+    if not keywords and not resume:
+        console.print("[error]No keywords to research.[/error]")
+        raise typer.Exit(code=1)
+
+    try:
+        _, _, found_count = batch.run_batch(
+            keywords, mode, wanted, out,
+            use_async=options.get("use_async", False), stream=stream, resume=resume,
+            pdf_workers=pdf_workers, metrics_path=options.get("metrics_path"), book_limit=books,
+        )
+    except FileNotFoundError as e:
+        console.print(f"[error]{e}[/error]")
+        raise typer.Exit(code=1)
+    if not found_count:
+        raise typer.Exit(code=1)
+
+
+# This command exports a saved session from its journal, without touching the network.
+# Without a session id, it lists the saved sessions.
+@app.command(help="Export a saved session without fetching anything. Lists sessions if none is given.")
+def export(
+    session: Optional[str] = typer.Argument(None, help="The session id, as printed when the session started."),
+    formats: str = typer.Option("pdf,csv", "--format", "-f", help="Comma-separated report formats: pdf, csv, jsonl."),
+    out: str = typer.Option(".", "--out", "-o", help="Directory to write the reports to."),
+    pdf_workers: Optional[int] = typer.Option(None, "--pdf-workers", help="Processes used to render the PDF (0 = one per CPU core)."),
+):
+    from processing import batch
+    from processing.journal import list_sessions
+
+    if not session:
+        sessions = list_sessions()
+        if not sessions:
+            console.print("[secondary]No saved sessions.[/secondary]")
+        for session_id in sessions:
+            console.print(session_id)
+        return
+
+    wanted = parse_formats(formats, batch.EXPORT_FORMATS)
+    try:
+        found = batch.export_session(session, wanted, out, pdf_workers)
+    except FileNotFoundError as e:
+        console.print(f"[error]{e}[/error]")
+        raise typer.Exit(code=1)
+    if not found:
+        console.print("[warn]This session has no data to export.[/warn]")
+        raise typer.Exit(code=1)
+
+
+# This command searches everything fetched so far, offline, through the local search index.
+# With --report, the hits are written as a new report instead of fetching anything.
+# For example: sourcefolio search "mars rover" --source news --report --format pdf
+@app.command(help="Search everything fetched so far, without going to the network.")
+def search(
+    query: str = typer.Argument(..., help="The words to look for (all of them must match)."),
+    limit: int = typer.Option(20, "--limit", "-n", min=1, help="How many hits to show."),
+    source: Optional[str] = typer.Option(None, "--source", "-s", help="Only search one source: wiki, olib or news."),
+    report: bool = typer.Option(False, "--report", help="Write the hits as a report instead of only listing them."),
+    formats: str = typer.Option("pdf,csv", "--format", "-f", help="Comma-separated report formats: pdf, csv, jsonl."),
+    out: str = typer.Option(".", "--out", "-o", help="Directory to write the report to."),
+    pdf_workers: Optional[int] = typer.Option(None, "--pdf-workers", help="Processes used to render the PDF (0 = one per CPU core)."),
+):
+    import time
+    from rich.markup import escape
+    from processing.search_index import MATCH_END, MATCH_START, SearchError, hits_to_data, index
+
+    if source is not None and source not in ("wiki", "olib", "news"):
+        raise typer.BadParameter("source must be one of: wiki, olib, news", param_hint="--source")
+
+    start = time.perf_counter()
+    try:
+        hits = index.search(query, limit, source)
+    except SearchError as e:
+        console.print(f"[error]{e}[/error]")
+        raise typer.Exit(code=1)
+    elapsed = (time.perf_counter() - start) * 1000
+    if not hits:
+        console.print(f"[warn]Nothing in the search index matches \"{escape(query)}\".[/warn]")
+        raise typer.Exit(code=1)
+
+    names = {"wiki": "Wikipedia", "olib": "OpenLibrary", "news": "NewsAPI"}
+    table = Table(title=f"{len(hits)} hit(s) in {elapsed:.1f} ms", title_style="secondary", show_lines=True)
+    table.add_column("Source", style="success", no_wrap=True)
+    table.add_column("Keyword", style="primary")
+    table.add_column("Title and match", style="white")
+    table.add_column("Link", style="secondary", overflow="fold")
+    for hit in hits:
+        snippet = escape(hit.snippet or "").replace(MATCH_START, "[bold]").replace(MATCH_END, "[/bold]")
+        table.add_row(names[hit.source], escape(hit.keyword), f"{escape(hit.title or '')}\n[dim]{snippet}[/dim]", escape(hit.link or ""))
+    console.print(table)
+
+    if report:
+        from datetime import datetime
+        from pathlib import Path
+        from processing import batch
+
+        wanted = parse_formats(formats, batch.EXPORT_FORMATS)
+        out_dir = Path(out)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"research_output_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        batch.export_reports(hits_to_data(hits), wanted, out_dir, stem, pdf_workers)
 
 
 if __name__ == "__main__":
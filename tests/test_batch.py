@@ -0,0 +1,93 @@
+# These tests run the batch mode end to end without the network: the fetchers are swapped
+# for stand-ins, and the journal goes to a temporary directory.
+
+import tracemalloc
+
+import pytest
+
+from fetchers import http_client, openlibrary_api
+from processing import batch, fetch_engine, journal
+from processing.models import Book, WikiEntry
+
+# Each stand-in article is this big, so holding on to them shows up in the peak.
+ARTICLE_SIZE = 200_000
+
+
+def fake_wiki_batch(keywords, is_detailed=False):
+    return {
+        keyword: WikiEntry(keyword, "x" * ARTICLE_SIZE, f"https://en.wikipedia.org/wiki/{keyword}")
+        for keyword in keywords
+    }
+
+
+def fake_books(keyword, limit=None):
+    return [Book(title=f"{keyword} book", author=["A. Author"], link=f"https://openlibrary.org/works/{keyword}")]
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    monkeypatch.setattr(fetch_engine, "get_wiki_batch", fake_wiki_batch)
+    monkeypatch.setattr(openlibrary_api, "get_books", fake_books)
+    monkeypatch.setattr(fetch_engine, "get_api_key", lambda name: None)
+    monkeypatch.setattr(journal, "SESSIONS_DIR", tmp_path / "sessions")
+    monkeypatch.setattr(batch, "active_index", lambda: None)
+    return tmp_path
+
+
+def streamed_peak(count, out_dir):
+    keywords = [f"topic {i}" for i in range(count)]
+    tracemalloc.start()
+    try:
+        _, issues, found = batch.run_batch(
+            keywords, mode="detailed", formats=("csv", "jsonl"), out_dir=out_dir, stream=True,
+            engine=fetch_engine.FetchEngine(max_workers=2),
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert issues == []
+    assert found == count
+    return peak
+
+
+# A streamed run without a PDF drops each keyword once it's written, so its peak memory
+# mustn't grow with the number of keywords. Holding every article would add 30 of them.
+def test_streamed_batch_memory_stays_flat(offline):
+    streamed_peak(2, offline / "warm-up")
+    small = streamed_peak(10, offline / "small")
+    large = streamed_peak(40, offline / "large")
+    assert large - small < 10 * ARTICLE_SIZE
+
+
+# A resumed run only fetches what the first run didn't get, and its report has everything.
+def test_resume_only_fetches_what_is_missing(offline, monkeypatch):
+    asked = []
+
+    def flaky_wiki_batch(keywords, is_detailed=False):
+        asked.extend(keywords)
+        return {
+            keyword: http_client.FetchError("Wikipedia connection failed") if keyword == "venus" else
+            WikiEntry(keyword, f"About {keyword}.", f"https://en.wikipedia.org/wiki/{keyword}")
+            for keyword in keywords
+        }
+
+    monkeypatch.setattr(fetch_engine, "get_wiki_batch", flaky_wiki_batch)
+    _, issues, _ = batch.run_batch(["mars", "venus"], formats=("jsonl",), out_dir=offline / "first")
+    assert [(issue["keyword"], issue["source"]) for issue in issues] == [("venus", "wiki")]
+
+    session = journal.list_sessions()[0]
+    asked.clear()
+
+    def wiki_batch(keywords, is_detailed=False):
+        asked.extend(keywords)
+        return fake_wiki_batch(keywords, is_detailed)
+
+    monkeypatch.setattr(fetch_engine, "get_wiki_batch", wiki_batch)
+    monkeypatch.setattr(openlibrary_api, "get_books", lambda *args: pytest.fail("books were already fetched"))
+    found, issues, _ = batch.run_batch([], formats=("jsonl",), out_dir=offline / "second", resume=session)
+
+    assert asked == ["venus"]
+    assert issues == []
+    assert list(found) == ["mars", "venus"]
+    assert found["mars"].wiki.content == "About mars."
+    assert found["venus"].wiki.title == "venus"
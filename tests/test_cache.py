@@ -0,0 +1,25 @@
+# These tests check the response cache's keys and its hit/miss counters.
+
+from processing.cache import ResponseCache
+from processing.models import Book, WikiEntry
+
+
+def test_wikipedia_keys_keep_their_case():
+    assert ResponseCache.make_key("wiki", "MIT") != ResponseCache.make_key("wiki", "Mit")
+    assert ResponseCache.make_key("wiki", "  Mars   rover ") == ResponseCache.make_key("wiki", "Mars rover")
+
+
+def test_book_and_news_keys_ignore_case_and_spacing():
+    for source in ("olib", "news"):
+        assert ResponseCache.make_key(source, " MARS  rover") == ResponseCache.make_key(source, "mars rover")
+
+
+def test_lookups_are_counted_per_source(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    cache.set("wiki", "MIT", {}, WikiEntry("Massachusetts Institute of Technology", "A university.", None))
+    cache.set("olib", "Cosmos", {}, [Book(title="Cosmos")])
+
+    assert cache.get("wiki", "MIT", {})[1].title == "Massachusetts Institute of Technology"
+    assert cache.get("wiki", "Mit", {}) == (False, None)
+    assert cache.get("olib", "cosmos", {})[1][0].title == "Cosmos"
+    assert cache.summary() == "olib: 1 hits / 0 misses, wiki: 1 hits / 1 misses"
@@ -0,0 +1,43 @@
+# These tests check that the config store reads the file once and notices changes to it.
+
+import json
+
+from processing.config import ConfigStore
+
+
+def test_file_is_read_once_until_it_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"NEWS_API_KEY": "first"}))
+    store = ConfigStore(path)
+    reads = []
+    real_refresh = store._refresh
+
+    def refresh():
+        stamp = store._stamp
+        real_refresh()
+        if store._stamp != stamp:
+            reads.append(store._stamp)
+
+    monkeypatch.setattr(store, "_refresh", refresh)
+    assert [store.get("NEWS_API_KEY") for _ in range(5)] == ["first"] * 5
+    assert len(reads) == 1
+
+    path.write_text(json.dumps({"NEWS_API_KEY": "second, and longer"}))
+    assert store.get("NEWS_API_KEY") == "second, and longer"
+    assert len(reads) == 2
+
+
+def test_update_writes_the_file_atomically(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(path)
+    store.update("MAX_WORKERS", 24)
+    store.update("NEWS_API_KEY", "key")
+    store.update("MAX_WORKERS", None)
+    assert json.loads(path.read_text()) == {"NEWS_API_KEY": "key"}
+    assert [p.name for p in tmp_path.iterdir()] == ["config.json"]
+
+
+def test_broken_file_reads_as_empty(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{not json")
+    assert ConfigStore(path).load() == {}
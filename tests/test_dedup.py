@@ -0,0 +1,85 @@
+# These tests check the de-duplication stage on headlines that look alike but aren't the
+# same story, and on ones that are.
+
+from processing.dedup import Deduplicator, dedupe, normalize_url
+from processing.models import Book, KeywordResult, NewsArticle
+
+
+def article(title, url, source="Reuters"):
+    return NewsArticle(title=title, url=url, source=source)
+
+
+def session(*keywords):
+    return dedupe({keyword: KeywordResult(False, news=list(news)) for keyword, news in keywords})
+
+
+def test_opposite_headlines_are_not_merged():
+    data = session(
+        ("apple", [article("Apple shares rise after strong earnings report", "https://a.com/1")]),
+        ("stocks", [article("Apple shares fall after strong earnings report", "https://b.com/2")]),
+    )
+    assert data["stocks"].duplicates == {}
+    assert data["stocks"].news[0].title.startswith("Apple shares fall")
+
+
+def test_roman_numerals_are_not_merged():
+    data = session(
+        ("artemis", [article("NASA prepares Artemis II launch", "https://a.com/1")]),
+        ("nasa", [article("NASA prepares Artemis III launch", "https://b.com/2")]),
+    )
+    assert data["nasa"].duplicates == {}
+
+
+def test_numbered_parts_are_not_merged():
+    data = session(
+        ("dune", [article("Dune part 1 review", "https://a.com/1"), article("Dune part 2 review", "https://a.com/2")]),
+    )
+    assert len(data["dune"].news) == 2
+    assert data["dune"].duplicates == {}
+
+
+def test_same_story_from_another_outlet_keeps_its_own_record():
+    first = article("NASA's rover finds water on Mars - Reuters", "https://reuters.com/mars")
+    second = article("NASA rover finds water on Mars", "https://apnews.com/mars", source="AP")
+    data = session(("mars", [first]), ("nasa", [second]))
+    assert data["nasa"].news == [second]
+    assert data["nasa"].duplicate_of("news", 0) == "mars"
+
+
+def test_same_url_shares_the_first_record():
+    first = article("Water found on Mars", "https://www.reuters.com/mars/?utm_source=feed")
+    second = article("Water found on Mars (updated)", "http://reuters.com/mars")
+    data = session(("mars", [first]), ("nasa", [second]))
+    assert data["nasa"].news == [first]
+    assert data["nasa"].duplicate_of("news", 0) == "mars"
+
+
+def test_exact_duplicate_within_a_keyword_is_dropped():
+    first = article("Water found on Mars", "https://reuters.com/mars")
+    copy = article("Water found on Mars", "https://reuters.com/mars?fbclid=abc")
+    data = session(("mars", [first, copy]))
+    assert data["mars"].news == [first]
+
+
+def test_books_are_matched_by_isbn():
+    first = Book(title="Cosmos", isbn="978-0345539434")
+    second = Book(title="Cosmos (Paperback)", isbn="9780345539434")
+    data = dedupe({"sagan": KeywordResult(False, books=[first]), "space": KeywordResult(False, books=[second])})
+    assert data["space"].books == [first]
+    assert data["space"].duplicate_of("olib", 0) == "sagan"
+
+
+def test_normalize_url_drops_tracking_parameters():
+    assert normalize_url("https://www.example.com/a/?b=2&utm_medium=x&a=1#top") == "example.com/a?a=1&b=2"
+
+
+def test_streaming_keeps_no_records():
+    dedup = Deduplicator(keep_records=False)
+    first = article("Water found on Mars", "https://reuters.com/mars")
+    second = article("Water found on Mars", "https://reuters.com/mars?utm_source=x")
+    dedup.add("mars", KeywordResult(False, news=[first]))
+    entry = KeywordResult(False, news=[second])
+    dedup.add("nasa", entry)
+    assert entry.news == [second]
+    assert entry.duplicate_of("news", 0) == "mars"
+    assert not dedup._records
@@ -0,0 +1,34 @@
+# These tests check that streaming a report keyword by keyword writes the same file as
+# exporting it in one go.
+
+from processing.csv_exporter import CSVStreamWriter, export_to_csv
+from processing.jsonl_exporter import JSONLStreamWriter, export_to_jsonl
+from processing.models import Book, KeywordResult, NewsArticle, WikiEntry
+
+DATA = {
+    "Mars": KeywordResult(
+        False,
+        WikiEntry("Mars", 'The "red" planet,\nfourth from the Sun.', "https://en.wikipedia.org/wiki/Mars"),
+        [Book(title="Cosmos", author=["Carl Sagan"], first_publish_year=1980, link="https://openlibrary.org/works/OL1W")],
+        [NewsArticle(title="Water on Mars", description="Found.", url="https://a.com/1", source="AP")],
+    ),
+    "Venus": KeywordResult(False, None, [], []),
+}
+
+
+def streamed(writer_class, path):
+    with writer_class(str(path)) as writer:
+        for keyword, content in DATA.items():
+            writer.write_keyword(keyword, content)
+    assert writer.count == len(DATA)
+    return path.read_bytes()
+
+
+def test_csv_stream_matches_export(tmp_path):
+    export_to_csv(DATA, str(tmp_path / "whole.csv"))
+    assert streamed(CSVStreamWriter, tmp_path / "stream.csv") == (tmp_path / "whole.csv").read_bytes()
+
+
+def test_jsonl_stream_matches_export(tmp_path):
+    export_to_jsonl(DATA, str(tmp_path / "whole.jsonl"))
+    assert streamed(JSONLStreamWriter, tmp_path / "stream.jsonl") == (tmp_path / "whole.jsonl").read_bytes()
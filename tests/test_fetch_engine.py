@@ -0,0 +1,116 @@
+# These tests check the fetch engines without the network: the fetchers are swapped for
+# stand-ins that answer straight away.
+
+import time
+import tracemalloc
+
+import requests
+
+from fetchers import http_client, openlibrary_api
+from processing import async_engine, fetch_engine
+from processing.article_store import ArticleStore
+from processing.async_engine import AsyncFetchEngine
+from processing.fetch_engine import FetchEngine
+from processing.models import KeywordResult, WikiEntry
+
+# Each stand-in article is this big, so holding on to them shows up in the peak.
+ARTICLE_SIZE = 200_000
+
+
+def article(keyword):
+    return WikiEntry(keyword, "x" * ARTICLE_SIZE, f"https://en.wikipedia.org/wiki/{keyword}")
+
+
+def fake_wiki_batch(keywords, is_detailed=False):
+    return {keyword: article(keyword) for keyword in keywords}
+
+
+async def fake_wiki_async(keyword, is_detailed=False):
+    return article(keyword)
+
+
+# This runs a detailed, streamed session of 'count' keywords, dropping each keyword as soon
+# as it's done like batch mode does, and returns the peak memory of the run.
+def streamed_peak(engine, count, tmp_path):
+    data = {f"topic {i}": KeywordResult(True) for i in range(count)}
+    jobs = [(keyword, "wiki") for keyword in data]
+
+    def on_keyword_done(keyword, entry):
+        assert entry.wiki.content
+        del data[keyword]
+
+    with ArticleStore(tmp_path) as store:
+        engine.articles = store
+        tracemalloc.start()
+        try:
+            issues = engine.run(data, jobs, on_keyword_done)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    assert issues == []
+    assert data == {}
+    return peak
+
+
+# Holding on to every article would add 30 of them to the peak between 10 and 40 keywords.
+# Only the few in flight at any time may be held, however many keywords there are.
+def assert_flat(small, large):
+    assert large - small < 10 * ARTICLE_SIZE
+
+
+def test_threaded_engine_memory_does_not_grow_with_batch_size(monkeypatch, tmp_path):
+    monkeypatch.setattr(fetch_engine, "get_wiki_batch", fake_wiki_batch)
+    # The first run loads a few modules, so it's left out of the comparison.
+    streamed_peak(FetchEngine(max_workers=4), 2, tmp_path)
+    small = streamed_peak(FetchEngine(max_workers=4), 10, tmp_path)
+    large = streamed_peak(FetchEngine(max_workers=4), 40, tmp_path)
+    assert_flat(small, large)
+
+
+def test_async_engine_memory_does_not_grow_with_batch_size(monkeypatch, tmp_path):
+    monkeypatch.setattr(async_engine.wiki, "get_wiki_data_async", fake_wiki_async)
+    streamed_peak(AsyncFetchEngine(max_workers=4), 2, tmp_path)
+    small = streamed_peak(AsyncFetchEngine(max_workers=4), 10, tmp_path)
+    large = streamed_peak(AsyncFetchEngine(max_workers=4), 40, tmp_path)
+    assert_flat(small, large)
+
+
+def test_detailed_articles_are_spilled_in_the_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(fetch_engine, "get_wiki_batch", fake_wiki_batch)
+    engine = FetchEngine(max_workers=2)
+    with ArticleStore(tmp_path) as store:
+        engine.articles = store
+        results = engine._fetch_wiki_batch(["Mars"], True)
+        assert not isinstance(results["Mars"].content, str)
+        assert str(results["Mars"].content) == "x" * ARTICLE_SIZE
+        # Summaries are small and stay in memory.
+        assert isinstance(engine._fetch_wiki_batch(["Mars"], False)["Mars"].content, str)
+
+
+# This stands in for the HTTP session of a server that never answers: every attempt
+# waits for its full timeout and fails.
+class HangingSession:
+    def __init__(self):
+        self.timeouts = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(timeout)
+        raise requests.exceptions.Timeout("read timed out")
+
+
+def test_threaded_engine_gives_up_on_a_job_at_its_deadline(monkeypatch):
+    session = HangingSession()
+    monkeypatch.setattr(http_client, "get_session", lambda: session)
+    monkeypatch.setattr(
+        openlibrary_api, "get_books", lambda keyword, limit=None: http_client.get_json("http://books.invalid/")
+    )
+    engine = FetchEngine(max_workers=2, timeout=0.3)
+    data = {"mars": KeywordResult(False)}
+    start = time.perf_counter()
+    issues = engine.run(data, [("mars", "olib")])
+    # Without the deadline, this is four 10 second attempts plus the waits between them.
+    assert time.perf_counter() - start < 2
+    assert issues[0]["kind"] == "error"
+    assert "timed out" in issues[0]["error"]
+    assert max(session.timeouts) <= 0.3
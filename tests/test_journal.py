@@ -0,0 +1,45 @@
+# These tests check that a session journal replays into the same data it recorded.
+
+import pytest
+
+from processing import journal
+from processing.journal import SessionJournal, missing_jobs
+from processing.models import Book, KeywordResult, WikiEntry
+
+
+@pytest.fixture
+def sessions(monkeypatch, tmp_path):
+    monkeypatch.setattr(journal, "SESSIONS_DIR", tmp_path)
+    return tmp_path
+
+
+class Engine:
+    def jobs_for(self, keywords):
+        return [(keyword, source) for keyword in keywords for source in ("wiki", "olib")]
+
+
+def test_replay_restores_results_renames_and_done_jobs(sessions):
+    log = SessionJournal("test")
+    log.add_keywords({"mars": KeywordResult(False), "mercury": KeywordResult(True)})
+    log.record("mars", "wiki", WikiEntry("Mars", "The fourth planet.", "https://en.wikipedia.org/wiki/Mars"))
+    log.record("mars", "olib", [Book(title="Cosmos")])
+    log.rename("mercury", "Mercury (planet)")
+    log.record("Mercury (planet)", "olib", [Book(title="Messenger")])
+    log.close()
+    # A crash in the middle of a write leaves half a line, which is skipped.
+    with open(log.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "result", "keyword": "mars", "sou')
+
+    data, done = SessionJournal("test").load()
+
+    assert list(data) == ["mars", "Mercury (planet)"]
+    assert data["mars"].wiki.title == "Mars"
+    assert data["mars"].books[0].title == "Cosmos"
+    assert data["Mercury (planet)"].is_detailed is True
+    assert done == {("mars", "wiki"), ("mars", "olib"), ("Mercury (planet)", "olib")}
+    assert missing_jobs(Engine(), data, done) == [("Mercury (planet)", "wiki")]
+
+
+def test_unknown_session_is_an_error(sessions):
+    with pytest.raises(FileNotFoundError):
+        SessionJournal("nope").load()
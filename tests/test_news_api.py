@@ -0,0 +1,31 @@
+# These tests check how NewsAPI responses are read.
+
+import pytest
+import requests
+
+from fetchers.http_client import FetchError
+from fetchers.news_api import check_response, unique_articles
+from processing.models import NewsArticle
+
+
+def response(status, body):
+    result = requests.Response()
+    result.status_code = status
+    result._content = body
+    return result
+
+
+def test_html_error_page_is_a_fetch_error():
+    with pytest.raises(FetchError):
+        check_response(response(200, b"<html><body>Service Unavailable</body></html>"))
+
+
+def test_api_error_is_a_fetch_error():
+    with pytest.raises(FetchError, match="apiKeyInvalid"):
+        check_response(response(200, b'{"status": "error", "message": "apiKeyInvalid"}'))
+
+
+def test_repeated_urls_are_dropped():
+    first = NewsArticle(title="One", url="https://a.com/1")
+    articles = [first, NewsArticle(title="One again", url="https://a.com/1"), NewsArticle(title="No link")]
+    assert unique_articles(articles) == [first, articles[2]]
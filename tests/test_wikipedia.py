@@ -0,0 +1,92 @@
+# These tests check the Wikipedia fetchers against a stand-in for the action API.
+
+import asyncio
+
+import pytest
+import wikipedia
+
+from fetchers import http_client
+from fetchers.wikipedia_batch import get_wiki_batch
+from fetchers.wikipedia_function import get_wiki_data, get_wiki_data_async
+from processing.cache import cache
+from processing.models import WikiEntry
+
+PAGES = {
+    "Mars": {"title": "Mars", "extract": "Mars is the fourth planet.", "fullurl": "https://en.wikipedia.org/wiki/Mars"},
+    "Mercury": {"title": "Mercury", "extract": "Mercury may refer to:", "pageprops": {"disambiguation": ""}},
+}
+REDIRECTS = {"Red Planet": "Mars"}
+OPTIONS = ["Mercury (planet)", "Mercury (element)"]
+
+
+# This answers a query the way the API does: titles are normalized (first letter upper
+# case), redirects are followed, and a title with no page comes back as "missing".
+def fake_api(url, params=None, **kwargs):
+    titles = params["titles"].split("|")
+    if params["prop"] == "links":
+        pages = [{"title": title, "links": [{"title": option} for option in OPTIONS]} for title in titles]
+        return {"query": {"pages": pages}}
+    normalized, redirects, pages = [], [], []
+    for title in titles:
+        canonical = title[:1].upper() + title[1:]
+        if canonical != title:
+            normalized.append({"from": title, "to": canonical})
+        target = REDIRECTS.get(canonical, canonical)
+        if target != canonical:
+            redirects.append({"from": canonical, "to": target})
+        pages.append(dict(PAGES.get(target, {"title": target, "missing": True})))
+    return {"batchcomplete": True, "query": {"normalized": normalized, "redirects": redirects, "pages": pages}}
+
+
+async def fake_api_async(url, params=None, **kwargs):
+    return fake_api(url, params)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    calls = []
+
+    def get_json(url, params=None, **kwargs):
+        calls.append(params)
+        return fake_api(url, params)
+
+    monkeypatch.setattr(http_client, "get_json", get_json)
+    monkeypatch.setattr(http_client, "get_json_async", fake_api_async)
+    monkeypatch.setattr(cache, "enabled", False)
+    return calls
+
+
+def test_batch_resolves_normalized_redirected_ambiguous_and_missing_titles(api):
+    results = get_wiki_batch(["mars", "Red Planet", "Mercury", "Atlantis"])
+
+    assert results["mars"] == WikiEntry("Mars", "Mars is the fourth planet.", "https://en.wikipedia.org/wiki/Mars")
+    assert results["Red Planet"].title == "Mars"
+    assert isinstance(results["Mercury"], wikipedia.exceptions.DisambiguationError)
+    assert results["Mercury"].options == OPTIONS
+    assert isinstance(results["Atlantis"], wikipedia.exceptions.PageError)
+    # One query for the pages and one for the ambiguous page's options.
+    assert len(api) == 2
+
+
+def test_batch_asks_for_full_articles_one_title_at_a_time(api):
+    get_wiki_batch(["Mars", "Red Planet"], is_detailed=True)
+    assert [params["titles"] for params in api] == ["Mars", "Red Planet"]
+    assert all("exintro" not in params for params in api)
+
+
+def test_missing_page_raises_page_error(api):
+    with pytest.raises(wikipedia.exceptions.PageError):
+        get_wiki_data("Atlantis")
+    with pytest.raises(wikipedia.exceptions.PageError):
+        asyncio.run(get_wiki_data_async("Atlantis"))
+
+
+def test_ambiguous_page_raises_disambiguation_error(api):
+    with pytest.raises(wikipedia.exceptions.DisambiguationError) as error:
+        get_wiki_data("Mercury")
+    assert error.value.options == OPTIONS
+
+
+def test_page_is_returned_with_its_canonical_title(api):
+    assert get_wiki_data("red Planet").title == "Mars"
+    assert asyncio.run(get_wiki_data_async("red Planet")).title == "Mars"